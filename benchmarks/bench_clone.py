@@ -0,0 +1,46 @@
+"""
+Cost of branching a lux.game.Game state: copy.deepcopy against
+Game.clone() and Game.restore(snapshot), per map size and backend, on
+late-game states.
+
+    python benchmarks/bench_clone.py
+"""
+import copy
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lux.array_map import ArrayGameMap  # noqa: E402
+from lux.game import Game  # noqa: E402
+from lux.game_map import GameMap  # noqa: E402
+
+from synthetic import MAP_SIZES, make_initial_messages, make_updates  # noqa: E402
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def measure(map_class, size, phase="late"):
+    game = Game(map_class=map_class)
+    game._initialize(make_initial_messages(size))
+    game._update(make_updates(size, phase))
+    snapshot = game.snapshot()
+    return (per_call(lambda: copy.deepcopy(game), 5),
+            per_call(game.clone, 200),
+            per_call(lambda: game.restore(snapshot), 200))
+
+
+def main():
+    print("%-5s %-13s %10s %10s %10s %8s" % ("size", "map", "deepcopy", "clone", "restore", "speedup"))
+    for size in MAP_SIZES:
+        for map_class in (GameMap, ArrayGameMap):
+            deep, clone, restore = measure(map_class, size)
+            print("%-5d %-13s %8.0fus %8.0fus %8.0fus %7.0fx" % (size, map_class.__name__, deep * 1e6,
+                                                                clone * 1e6, restore * 1e6, deep / clone))
+
+
+if __name__ == "__main__":
+    main()
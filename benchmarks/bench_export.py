@@ -0,0 +1,92 @@
+"""
+Per-turn latency of an agent written by multilux.export.export_agent, as
+JSON: parsing the turn's messages, rendering the observations, the forward
+passes and the action encoding, on synthetic late-game states.
+
+The policies have random weights of RLlib's default model size (two hidden
+layers of 256), for the units and the citytiles. The exported main.py is
+loaded from the export directory in a fresh interpreter, so the timings
+include nothing that a submission would not import.
+
+    python benchmarks/bench_export.py [--size 32] [--turns 200] [--radius 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lux.action_masks import CITYTILE_ACTIONS, UNIT_ACTIONS  # noqa: E402
+from multilux.export import export_agent  # noqa: E402
+from multilux.observation import CHANNELS  # noqa: E402
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+# run in the export directory: only main.py and what it bundles are importable
+TIMER = """
+import json, sys, time
+sys.path.insert(0, %(benchmarks)r)
+from synthetic import make_initial_messages, make_updates
+import main
+
+size, turns = %(size)d, %(turns)d
+main.agent({"step": 0, "player": 0, "updates": make_initial_messages(size) + make_updates(size, "late", seed=0)}, {})
+states = [make_updates(size, "late", seed=seed) for seed in range(1, 11)]
+times, commands = [], 0
+for step in range(1, turns + 1):
+    observation = {"step": step, "player": 0, "updates": states[step %% len(states)]}
+    start = time.perf_counter()
+    actions = main.agent(observation, {})
+    times.append(time.perf_counter() - start)
+    commands += len(actions)
+print(json.dumps({"times": times, "commands": commands,
+                  "heavy_imports": sorted(m for m in ("ray", "gym", "torch", "tensorflow") if m in sys.modules)}))
+"""
+
+
+def random_policy(actions, radius, hiddens=(256, 256), seed=0):
+    """torch-style get_weights() of an RLlib fully connected model"""
+    rng = np.random.default_rng(seed)
+    sizes = (len(CHANNELS) * (2 * radius + 1) ** 2,) + hiddens + (len(actions),)
+    weights = {}
+    for i, (n_in, n_out) in enumerate(zip(sizes[:-1], sizes[1:])):
+        prefix = "_logits" if i == len(hiddens) else f"_hidden_layers.{i}"
+        weights[f"{prefix}._model.0.weight"] = rng.normal(0, n_in ** -0.5, (n_out, n_in)).astype(np.float32)
+        weights[f"{prefix}._model.0.bias"] = np.zeros(n_out, dtype=np.float32)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--radius", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        export_agent(path, random_policy(UNIT_ACTIONS, args.radius),
+                     citytile_policy=random_policy(CITYTILE_ACTIONS, args.radius, seed=1), radius=args.radius)
+        script = TIMER % {"benchmarks": BENCHMARKS, "size": args.size, "turns": args.turns}
+        output = subprocess.run([sys.executable, "-c", script], cwd=path, check=True,
+                                capture_output=True, text=True).stdout
+    run = json.loads(output.splitlines()[-1])
+    times_ms = np.array(run["times"]) * 1e3
+    print(json.dumps({
+        "size": args.size,
+        "radius": args.radius,
+        "turns": args.turns,
+        "p50_ms": round(float(np.percentile(times_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(times_ms, 99)), 3),
+        "max_ms": round(float(times_ms.max()), 3),
+        "commands_per_turn": run["commands"] / args.turns,
+        "heavy_imports": run["heavy_imports"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Per-turn allocation and memory footprint of lux.game.Game._update.
+
+For each map size (late-game state) and map backend, reports:
+    blocks   memory blocks allocated during one _update and still alive after
+             it, i.e. roughly the objects built per turn
+    peak     tracemalloc peak while running one _update
+    state    size of everything the game state keeps alive after the update
+
+    python benchmarks/bench_memory.py
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lux.array_map import ArrayGameMap  # noqa: E402
+from lux.game import Game  # noqa: E402
+from lux.game_map import GameMap  # noqa: E402
+
+from synthetic import MAP_SIZES, make_initial_messages, make_updates  # noqa: E402
+
+
+def measure(map_class, size, phase="late"):
+    messages = make_updates(size, phase)
+    game = Game(map_class=map_class)
+    game._initialize(make_initial_messages(size))
+    game._update(messages)
+    gc.collect()
+
+    tracemalloc.start()
+    game._update(messages)
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+
+    # footprint: everything allocated while building a fresh state
+    gc.collect()
+    tracemalloc.start()
+    fresh = Game(map_class=map_class)
+    fresh._initialize(make_initial_messages(size))
+    fresh._update(messages)
+    gc.collect()
+    state, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return blocks, peak, state
+
+
+def main():
+    print("%-5s %-13s %8s %10s %10s" % ("size", "map", "blocks", "peak", "state"))
+    for size in MAP_SIZES:
+        for map_class in (GameMap, ArrayGameMap):
+            blocks, peak, state = measure(map_class, size)
+            print("%-5d %-13s %8d %8.1fkB %8.1fkB" % (size, map_class.__name__, blocks,
+                                                      peak / 1024, state / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Per-turn cost of building egocentric observations for every actor:
+a per-actor loop over the map cells around each actor (what a custom
+interface typically does) against multilux.observation.SpatialObservation
+(render + gather), on late-game states.
+
+    python benchmarks/bench_observation.py [--radius R]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lux.array_map import ArrayGameMap  # noqa: E402
+from lux.game import Game  # noqa: E402
+from lux.game_map import GameMap  # noqa: E402
+from multilux.observation import CHANNELS, SpatialObservation  # noqa: E402
+
+from synthetic import MAP_SIZES, make_initial_messages, make_updates  # noqa: E402
+
+
+def per_actor_loop(game, actors, radius):
+    """A fresh array per actor, filled from the cells within radius"""
+    units = {}
+    for p in game.players:
+        for unit in p.units:
+            units.setdefault((unit.pos.x, unit.pos.y), []).append(unit)
+    obs = {}
+    size = 2 * radius + 1
+    for actor in actors:
+        crop = np.zeros((len(CHANNELS), size, size), dtype=np.float32)
+        for dy in range(-radius, radius + 1):
+            y = actor.pos.y + dy
+            if not 0 <= y < game.map_height:
+                continue
+            for dx in range(-radius, radius + 1):
+                x = actor.pos.x + dx
+                if not 0 <= x < game.map_width:
+                    continue
+                cell = game.map.get_cell(x, y)
+                i, j = dy + radius, dx + radius
+                crop[0, i, j] = 1
+                if cell.resource is not None:
+                    crop[1, i, j] = cell.resource.amount
+                crop[4, i, j] = cell.road
+                if cell.citytile is not None:
+                    crop[5 if cell.citytile.team == game.id else 6, i, j] = 1
+                    crop[7, i, j] = cell.citytile.cooldown
+                for unit in units.get((x, y), ()):
+                    crop[9 if unit.team == game.id else 11, i, j] += 1
+        obs[actor.id] = crop
+    return obs
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--radius", type=int, default=5)
+    args = parser.parse_args()
+
+    print("%-5s %-13s %6s | %10s | %10s %10s %10s %8s" % (
+        "size", "map", "actors", "loop", "render", "gather", "total", "speedup"))
+    for size in MAP_SIZES:
+        for map_class in (GameMap, ArrayGameMap):
+            game = Game(map_class=map_class)
+            game._initialize(make_initial_messages(size))
+            game._update(make_updates(size, "late"))
+            player = game.players[game.id]
+            actors = player.units + [ct for city in player.cities.values() for ct in city.citytiles]
+            spatial = SpatialObservation(args.radius)
+            spatial.render(game)
+
+            loop = per_call(lambda: per_actor_loop(game, actors, args.radius), 5)
+            render = per_call(lambda: spatial.render(game), 200)
+            gather = per_call(lambda: spatial.gather(actors), 200)
+            print("%-5d %-13s %6d | %8.0fus | %8.0fus %8.0fus %8.0fus %7.0fx" % (
+                size, map_class.__name__, len(actors), loop * 1e6, render * 1e6, gather * 1e6,
+                (render + gather) * 1e6, loop / (render + gather)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compares lux.game.Game._update with the bulk parser (lux.parser) against
+the original line-by-line loop, for both map backends.
+
+    python benchmarks/bench_parser.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lux.array_map import ArrayGameMap  # noqa: E402
+from lux.game import Game  # noqa: E402
+from lux.game_map import GameMap  # noqa: E402
+from lux.parser import parse_updates  # noqa: E402
+
+from synthetic import MAP_SIZES, PHASES, make_initial_messages, make_updates  # noqa: E402
+
+
+def time_update(messages, size, repeat, **game_kwargs):
+    game = Game(**game_kwargs)
+    game._initialize(make_initial_messages(size))
+    game._update(messages)
+    return timeit.timeit(lambda: game._update(messages), number=repeat) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print("%-5s %-6s %6s | %10s | %10s %10s %7s | %10s %10s %7s" % (
+        "size", "phase", "lines", "parse", "GameMap", "+bulk", "speedup",
+        "ArrayMap", "+bulk", "speedup"))
+    for size in MAP_SIZES:
+        for phase in PHASES:
+            messages = make_updates(size, phase)
+            parse = timeit.timeit(lambda: parse_updates(messages), number=args.repeat) / args.repeat
+            row = [size, phase, len(messages), parse * 1e6]
+            for map_class in (GameMap, ArrayGameMap):
+                lines = time_update(messages, size, args.repeat, map_class=map_class, bulk_parse=False)
+                bulk = time_update(messages, size, args.repeat, map_class=map_class, bulk_parse=True)
+                row += [lines * 1e6, bulk * 1e6, lines / bulk]
+            print("%-5d %-6s %6d | %8.0fus | %8.0fus %8.0fus %6.2fx | %8.0fus %8.0fus %6.2fx" % tuple(row))
+
+
+if __name__ == "__main__":
+    main()
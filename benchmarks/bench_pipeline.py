@@ -0,0 +1,322 @@
+"""
+Throughput of the multilux pipeline per map size and game phase, as JSON.
+
+Plays seeded episodes on the native engine (multilux.lux_engine, random
+actions against a random opponent) or replays recorded kaggle episodes,
+through a LuxEnv/interface with profiling on. For each map size and game
+phase (early/mid/late turns, see multilux.profiling.GAME_PHASES) it reports:
+
+    env_steps_per_sec    full LuxEnv.step calls per second (replays: the
+                         agent side only, there is no engine step)
+    env_step_ms          engine step
+    update_ms            Game._update of the turn's messages
+    actors_ms            get_team_actors
+    observation_ms, reward_ms, done_ms, info_ms, actions_ms
+                         interface conversions, and their sum conversion_ms
+    actors               mean number of actors per step
+    peak_memory_kb       highest tracemalloc peak of a step (separate run)
+
+    python benchmarks/bench_pipeline.py --output run.json
+    python benchmarks/bench_pipeline.py --episodes replay1.json replay2.json
+    python benchmarks/bench_pipeline.py --compare baseline.json --tolerance 0.15
+
+With --compare, times that grew (or steps/sec that dropped) by more than
+the tolerance against the baseline file are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gym import spaces  # noqa: E402
+
+from lux.array_map import ArrayGameMap  # noqa: E402
+from lux.game import Game  # noqa: E402
+from lux.game_map import GameMap  # noqa: E402
+from multilux.lux_engine import Observation  # noqa: E402
+from multilux.lux_interface import LuxDefaultInterface  # noqa: E402
+from multilux.parity import random_actions  # noqa: E402
+from multilux.profiling import GAME_PHASES, PhaseTimer, game_phase  # noqa: E402
+
+from synthetic import MAP_SIZES  # noqa: E402
+
+CONVERSIONS = ("observation", "reward", "done", "info", "actions")
+TIMES = ("env_step", "update", "actors") + CONVERSIONS
+MAP_CLASSES = {"GameMap": GameMap, "ArrayGameMap": ArrayGameMap}
+
+
+class BenchInterface(LuxDefaultInterface):
+    """Small per-actor feature vectors and seeded random actions"""
+    obs_spaces = {'default': spaces.Box(low=0, high=1, shape=(6,), dtype=np.float32)}
+    seed = 0
+
+    def __init__(self, obs, initial_state=None):
+        super().__init__(obs, initial_state=initial_state)
+        self.rng = random.Random(self.seed)
+
+    def observation(self, joint_obs, actors=None) -> dict:
+        game = self.game_state
+        width, height = game.map_width, game.map_height
+        obs = {}
+        for actor in actors:
+            cargo = getattr(actor, "cargo", None)
+            obs[actor.id] = np.array([
+                actor.pos.x / width, actor.pos.y / height, actor.cooldown / 10,
+                cargo.wood / 100 if cargo else 0, cargo.coal / 100 if cargo else 0,
+                game.turn % 40 >= 30], dtype=np.float32)
+        return obs
+
+    def done(self, joint_done, actors) -> dict:
+        d = {a.id: joint_done for a in actors}
+        d['__all__'] = joint_done
+        return d
+
+    def actions(self, action_dict) -> list:
+        return random_actions(self.game_state, self.game.player_id, self.rng)
+
+
+class RandomAgent:
+    """Opponent for the native engine playing parity.random_actions"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.game = None
+
+    def __call__(self, observation, configuration):
+        if observation["step"] == 0:
+            self.game = Game()
+            self.game._initialize(observation["updates"])
+            self.game._update(observation["updates"][2:])
+        else:
+            self.game._update(observation["updates"])
+        return random_actions(self.game, observation["player"], self.rng)
+
+
+def make_interface(map_class, incremental, seed):
+    return type("BenchInterface", (BenchInterface,),
+                {"map_class": map_class, "incremental_update": incremental, "seed": seed})
+
+
+def play_episode(size, seed, interface, trace_memory=False):
+    """
+    One native engine episode.
+
+    :return: list of per-step records (turn, actors, seconds, phases, peak)
+    """
+    from multilux.lux_env import LuxEnv
+
+    configuration = {"width": size, "height": size, "seed": seed}
+    env = LuxEnv(configuration, False, interface=interface,
+                 agents=(None, RandomAgent(seed + 1)), engine='native', profile=True)
+    env.reset()
+    records = []
+    # random play often loses a team early, keep going to the turn limit
+    # so that every game phase is measured
+    while env.interface.game_state.turn < env._env.episode_steps - 1:
+        if trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        obs, _, _, _ = env.step({})
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        records.append((env.interface.game_state.turn, len(obs), seconds, env.profiler.last_step, peak))
+    return records
+
+
+def load_replay(path, player=0):
+    """Per-step observations of `player` in a kaggle replay (env.toJSON())"""
+    with open(path) as f:
+        replay = json.load(f)
+    observations = []
+    for step, agents in enumerate(replay["steps"]):
+        shared = agents[0]["observation"]
+        observations.append(Observation(player=player, step=step, updates=shared["updates"],
+                                        reward=agents[player].get("reward") or 0))
+    return observations
+
+
+def play_replay(observations, interface, trace_memory=False):
+    """
+    Feeds recorded observations through the interface, timing the same
+    phases as LuxEnv.step minus the engine step.
+    """
+    timer = PhaseTimer()
+    agent = interface(observations[0])
+    agent.timer = timer
+    last = len(observations) - 1
+    records = []
+    for i, obs in enumerate(observations[1:], 1):
+        if trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        t = timer.start()
+        agent.actions({})
+        timer.stop("actions", t)
+        out, _, _, _ = agent.ordi(obs, obs.reward, i == last, {})
+        timer.end_step(agent.game_state.turn, len(out))
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        records.append((agent.game_state.turn, len(out), seconds, timer.last_step, peak))
+    return records
+
+
+def run_episodes(play, memory):
+    """Runs play(trace_memory) once for timings and, with memory, once more under tracemalloc"""
+    records = play(False)
+    if memory:
+        tracemalloc.start()
+        try:
+            peaks = [record[4] for record in play(True)]
+        finally:
+            tracemalloc.stop()
+        # same seed and actions, so the two runs step through the same turns
+        records = [record[:4] + (peak,) for record, peak in zip(records, peaks)]
+    return records
+
+
+def summarise(size, records):
+    """One result row per game phase"""
+    by_phase = {}
+    for record in records:
+        by_phase.setdefault(game_phase(record[0]), []).append(record)
+    rows = []
+    for _, phase in GAME_PHASES:
+        steps = by_phase.get(phase)
+        if not steps:
+            continue
+        n = len(steps)
+        seconds = sum(step[2] for step in steps)
+        row = {"size": size, "phase": phase, "steps": n,
+               "env_steps_per_sec": n / seconds,
+               "actors": sum(step[1] for step in steps) / n}
+        for name in TIMES:
+            if any(name in step[3] for step in steps):
+                row[name + "_ms"] = sum(step[3].get(name, 0.0) for step in steps) * 1e3 / n
+            else:
+                row[name + "_ms"] = None  # e.g. env_step in replays
+        row["conversion_ms"] = sum(row[name + "_ms"] for name in CONVERSIONS)
+        peaks = [step[4] for step in steps if step[4] is not None]
+        row["peak_memory_kb"] = max(peaks) / 1024 if peaks else None
+        rows.append(row)
+    return rows
+
+
+def merge_rows(rows):
+    """Averages rows of the same size and phase (several seeds or replays), weighted by steps"""
+    merged = {}
+    for row in rows:
+        merged.setdefault((row["size"], row["phase"]), []).append(row)
+    out = []
+    for (size, phase), group in merged.items():
+        steps = sum(row["steps"] for row in group)
+        row = {"size": size, "phase": phase, "steps": steps}
+        for key, value in group[0].items():
+            if key in row:
+                continue
+            if key == "peak_memory_kb":
+                peaks = [r[key] for r in group if r[key] is not None]
+                row[key] = max(peaks) if peaks else None
+            elif value is None:
+                row[key] = None
+            else:
+                row[key] = sum(r[key] * r["steps"] for r in group) / steps
+        out.append(row)
+    return sorted(out, key=lambda row: (row["size"], [p for _, p in GAME_PHASES].index(row["phase"])))
+
+
+def compare(results, baseline, tolerance):
+    """Rows of results slower than baseline by more than tolerance (a fraction)"""
+    base = {(row["size"], row["phase"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results["results"]:
+        old = base.get((row["size"], row["phase"]))
+        if old is None:
+            continue
+        for key, value in row.items():
+            if value is None or old.get(key) is None or not old[key]:
+                continue
+            if key.endswith("_ms") or key == "peak_memory_kb":
+                change = value / old[key] - 1
+            elif key == "env_steps_per_sec":
+                change = old[key] / value - 1
+            else:
+                continue
+            if change > tolerance:
+                regressions.append({"size": row["size"], "phase": row["phase"], "metric": key,
+                                    "baseline": old[key], "value": value, "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=MAP_SIZES)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1])
+    parser.add_argument("--episodes", nargs="+", help="kaggle replay JSON files, instead of the native engine")
+    parser.add_argument("--player", type=int, default=0, help="player whose view is replayed")
+    parser.add_argument("--map-class", choices=sorted(MAP_CLASSES), default="GameMap")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    memory = not args.no_memory and hasattr(tracemalloc, "reset_peak")
+    rows = []
+    if args.episodes:
+        for path in args.episodes:
+            observations = load_replay(path, args.player)
+            size = int(observations[0]["updates"][1].split()[0])
+            interface = make_interface(MAP_CLASSES[args.map_class], args.incremental, 0)
+            records = run_episodes(lambda trace: play_replay(observations, interface, trace), memory)
+            rows.extend(summarise(size, records))
+    else:
+        for size in args.sizes:
+            for seed in args.seeds:
+                interface = make_interface(MAP_CLASSES[args.map_class], args.incremental, seed)
+                records = run_episodes(lambda trace: play_episode(size, seed, interface, trace), memory)
+                rows.extend(summarise(size, records))
+
+    results = {
+        "meta": {
+            "source": "replay" if args.episodes else "native",
+            "episodes": args.episodes or None,
+            "seeds": None if args.episodes else args.seeds,
+            "map_class": args.map_class,
+            "incremental": args.incremental,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": merge_rows(rows),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print("%4d %-5s %-18s %10.4g -> %10.4g (%+.0f%%)" % (
+                r["size"], r["phase"], r["metric"], r["baseline"], r["value"], r["change"] * 100),
+                file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
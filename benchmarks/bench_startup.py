@@ -0,0 +1,118 @@
+"""
+Import time of the lux and multilux modules, as JSON, for the short-lived
+processes (evaluation workers, submission agents, replay ingestion) whose
+wall clock it adds to.
+
+Each module is imported in a fresh interpreter, `--repeat` times, and the
+report gives the median import time and the heavy dependencies (ray, gym,
+kaggle_environments, deep learning frameworks) the import pulled in.
+Modules whose dependencies are not installed are reported with the error.
+lux and multilux are byte-compiled first, as they are after a first run,
+so that the times do not include compiling them.
+It also checks that lux/game_constants.py matches lux/game_constants.json
+and times the constant lookups of the Unit and Player helpers.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--modules lux.game multilux.lux_env]
+"""
+import argparse
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lux.game_constants import GAME_CONSTANTS  # noqa: E402
+from lux.game_map import GameMap  # noqa: E402
+from lux.game_objects import Player, Unit  # noqa: E402
+
+MODULES = (
+    "lux.game_constants",
+    "lux.game",
+    "multilux.lux_engine",
+    "multilux.observation",
+    "multilux.recorder",
+    "multilux.replay_ingest",
+    "multilux.exported_agent",
+    "multilux.profiling",
+    "multilux.lux_interface",
+    "multilux.policy_pool",
+    "multilux.league",
+    "multilux.lux_env",
+    "multilux.lux_vector_env",
+    "multilux.callbacks",
+)
+HEAVY = ("ray", "gym", "kaggle_environments", "torch", "tensorflow")
+
+IMPORT = """
+import json, sys, time
+started = time.perf_counter()
+try:
+    import %(module)s
+    error = None
+except Exception as e:
+    error = "%%s: %%s" %% (type(e).__name__, e)
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "error": error,
+                  "heavy": [name for name in %(heavy)r if name in sys.modules]}))
+"""
+
+
+def import_once(module):
+    script = IMPORT % {"module": module, "heavy": HEAVY}
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    # some packages print at import, the report is the last line
+    return json.loads(output.splitlines()[-1])
+
+
+def import_times(module, repeat):
+    runs = [import_once(module) for _ in range(repeat)]
+    report = {"import_ms": round(statistics.median(run["seconds"] for run in runs) * 1e3, 2),
+              "heavy_imports": runs[0]["heavy"]}
+    if runs[0]["error"] is not None:
+        report["error"] = runs[0]["error"]
+    return report
+
+
+def lookup_times(number=200000):
+    """ns per call of the helpers that read game constants"""
+    game_map = GameMap(12, 12)
+    player = Player(0)
+    unit = Unit(0, 0, "u_1", 3, 3, 0, 50, 30, 20)
+    calls = {
+        "Player.researched_coal": player.researched_coal,
+        "Unit.get_cargo_space_left": unit.get_cargo_space_left,
+        "Unit.can_build": lambda: unit.can_build(game_map),
+    }
+    return {name: round(min(timeit.repeat(call, number=number, repeat=3)) / number * 1e9, 1)
+            for name, call in calls.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    args = parser.parse_args()
+
+    for package in ("lux", "multilux"):
+        compileall.compile_dir(os.path.join(ROOT, package), quiet=1)
+    with open(os.path.join(ROOT, "lux", "game_constants.json")) as f:
+        constants_match = json.load(f) == GAME_CONSTANTS
+    report = {
+        "python": sys.version.split()[0],
+        "constants_match_json": constants_match,
+        "modules": {module: import_times(module, args.repeat) for module in args.modules},
+        "lookup_ns": lookup_times(),
+    }
+    print(json.dumps(report, indent=2))
+    if not constants_match:
+        sys.exit("lux/game_constants.py is out of date with lux/game_constants.json")
+
+
+if __name__ == "__main__":
+    main()
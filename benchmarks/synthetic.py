@@ -0,0 +1,69 @@
+"""
+Synthetic kaggle `updates` message lists for benchmarks.
+
+The states are random but shaped like real games: resource clusters, a
+city per team grown from a seed tile, units spread around the cities and
+roads under citytiles. Sizes scale with the map size and game phase.
+"""
+import random
+
+# fraction of the map covered by (resources, citytiles per team, units per team)
+PHASES = {
+    "early": (0.30, 0.004, 0.004),
+    "mid": (0.22, 0.04, 0.03),
+    "late": (0.12, 0.09, 0.07),
+}
+MAP_SIZES = (12, 16, 24, 32)
+
+
+def make_updates(size, phase="late", seed=0):
+    """
+    Returns a list of update messages (terminated by "D_DONE") for a
+    size x size map in the given game phase
+    """
+    rng = random.Random(seed)
+    resource_frac, citytile_frac, unit_frac = PHASES[phase]
+    cells = [(x, y) for y in range(size) for x in range(size)]
+    rng.shuffle(cells)
+    n_resources = int(resource_frac * size * size)
+    n_citytiles = max(1, int(citytile_frac * size * size))
+    n_units = max(1, int(unit_frac * size * size))
+
+    messages = ["rp 0 %d" % rng.randint(0, 250), "rp 1 %d" % rng.randint(0, 250)]
+    resource_cells = cells[:n_resources]
+    for x, y in resource_cells:
+        r_type = rng.choices(["wood", "coal", "uranium"], weights=[6, 2, 1])[0]
+        messages.append("r %s %d %d %d" % (r_type, x, y, rng.randint(1, 500)))
+
+    free = cells[n_resources:]
+    unit_id = 0
+    city_id = 1
+    roads = []
+    for team in (0, 1):
+        tiles = free[team * n_citytiles:(team + 1) * n_citytiles]
+        n_cities = max(1, len(tiles) // 6)
+        city_ids = list(range(city_id, city_id + n_cities))
+        city_id += n_cities
+        for cid in city_ids:
+            messages.append("c %d c_%d %d %d" % (team, cid, rng.randint(0, 3000), 23 * 6))
+        for i, (x, y) in enumerate(tiles):
+            messages.append("ct %d c_%d %d %d %d" % (team, city_ids[i % n_cities], x, y,
+                                                     rng.randint(0, 10)))
+            roads.append((x, y))
+        for _ in range(n_units):
+            x, y = rng.randrange(size), rng.randrange(size)
+            messages.append("u %d %d u_%d %d %d %d %d %d %d" % (
+                int(rng.random() < 0.1), team, unit_id, x, y, rng.randint(0, 2),
+                rng.randint(0, 100), rng.randint(0, 20), rng.randint(0, 5)))
+            unit_id += 1
+    for x, y in roads:
+        messages.append("ccd %d %d 6" % (x, y))
+    messages.append("D_DONE")
+    return messages
+
+
+def make_initial_messages(size, player=0):
+    """
+    The two header messages of the step-0 observation
+    """
+    return [str(player), "%d %d" % (size, size)]
@@ -0,0 +1,106 @@
+import numpy as np
+
+from .constants import Constants
+from .game_constants import PARAMETERS
+from .game_objects import citytile_id
+
+DIRECTIONS = Constants.DIRECTIONS
+UNIT_TYPES = Constants.UNIT_TYPES
+CITY_BUILD_COST = PARAMETERS.CITY_BUILD_COST
+
+# columns of the unit and citytile masks
+UNIT_ACTIONS = (DIRECTIONS.NORTH, DIRECTIONS.EAST, DIRECTIONS.SOUTH, DIRECTIONS.WEST,
+                DIRECTIONS.CENTER, "bcity", "p", "t")
+CITYTILE_ACTIONS = ("r", "bw", "bc")
+MOVE_DX = np.array([0, 1, 0, -1])
+MOVE_DY = np.array([-1, 0, 1, 0])
+
+
+class ActionMasks:
+    """
+    units[i, j] is whether unit_ids[i] can take UNIT_ACTIONS[j], citytiles
+    likewise with CITYTILE_ACTIONS. Positions are (x, y) per row.
+    """
+    __slots__ = ("unit_ids", "unit_positions", "units", "citytile_positions", "citytiles")
+
+    def __init__(self, unit_ids, unit_positions, units, citytile_positions, citytiles):
+        self.unit_ids = unit_ids
+        self.unit_positions = unit_positions
+        self.units = units
+        self.citytile_positions = citytile_positions
+        self.citytiles = citytiles
+
+    @property
+    def citytile_ids(self):
+        return [citytile_id(x, y) for x, y in self.citytile_positions.tolist()]
+
+
+def action_masks(game, team) -> ActionMasks:
+    """
+    Actions the game engine accepts and that have an effect, for all units
+    and citytiles of team. Moves are masked on the map bounds and enemy
+    citytiles only, collisions are resolved by the engine. Each unit build
+    is checked against the current unit count on its own.
+    """
+    player = game.players[team]
+    game_map = game.map
+    height, width = game.map_height, game.map_width
+    array_map = hasattr(game_map, "citytile_team")
+
+    # citytiles; flat lists convert to arrays much faster than tuples
+    values = [value for city in player.cities.values() for citytile in city.citytiles
+              for value in (citytile.pos.x, citytile.pos.y, citytile.cooldown)]
+    citytile_values = np.array(values, dtype=np.float64).reshape(-1, 3)
+    citytile_positions = citytile_values[:, :2].astype(np.intp)
+    can_build_unit = len(player.units) < len(citytile_values)
+    citytile_can_act = citytile_values[:, 2] < 1
+    citytiles = np.stack([citytile_can_act, citytile_can_act & can_build_unit,
+                          citytile_can_act & can_build_unit], axis=1)
+
+    if array_map:
+        citytile_team = game_map.citytile_team
+    else:
+        values = [value for p in game.players for city in p.cities.values() for citytile in city.citytiles
+                  for value in (citytile.pos.x, citytile.pos.y, p.team)]
+        xs, ys, teams = np.array(values, dtype=np.intp).reshape(-1, 3).T
+        citytile_team = np.full((height, width), -1, dtype=np.int8)
+        citytile_team[ys, xs] = teams
+
+    # units
+    units = player.units
+    values = [value for unit in units for value in (
+        unit.pos.x, unit.pos.y, unit.type, unit.cooldown, unit.cargo.wood + unit.cargo.coal + unit.cargo.uranium)]
+    x, y, u_type, cooldown, cargo = np.array(values, dtype=np.float64).reshape(-1, 5).T
+    x, y = x.astype(np.intp), y.astype(np.intp)
+    if array_map:
+        has_resource = (game_map.resource_type[y, x] >= 0) & (game_map.resource_amount[y, x] > 0)
+        road = game_map.road[y, x]
+    else:
+        cells = [game_map.get_cell_by_pos(unit.pos) for unit in units]
+        has_resource = np.array([cell.has_resource() for cell in cells], dtype=bool)
+        road = np.array([cell.road for cell in cells], dtype=np.float64)
+    can_act = cooldown < 1
+    is_worker = u_type == UNIT_TYPES.WORKER
+    on_citytile = citytile_team[y, x] >= 0
+
+    masks = np.zeros((len(units), len(UNIT_ACTIONS)), dtype=bool)
+    # moves
+    tx = x[:, None] + MOVE_DX
+    ty = y[:, None] + MOVE_DY
+    in_map = (tx >= 0) & (tx < width) & (ty >= 0) & (ty < height)
+    target_team = citytile_team[np.clip(ty, 0, height - 1), np.clip(tx, 0, width - 1)]
+    masks[:, :4] = can_act[:, None] & in_map & ((target_team < 0) | (target_team == team))
+    masks[:, 4] = True
+    # build city and pillage are only carried out by workers
+    masks[:, 5] = can_act & is_worker & ~on_citytile & ~has_resource & (cargo >= CITY_BUILD_COST)
+    masks[:, 6] = can_act & is_worker & ~on_citytile & (road > 0)
+    # transfer: to another own unit on the same or an adjacent tile
+    padded = np.zeros((height + 2, width + 2), dtype=np.intp)
+    np.add.at(padded, (y + 1, x + 1), 1)
+    near = padded[y + 1, x + 1] - 1
+    for dx, dy in zip(MOVE_DX, MOVE_DY):
+        near = near + padded[y + 1 + dy, x + 1 + dx]
+    masks[:, 7] = can_act & (cargo > 0) & (near > 0)
+
+    return ActionMasks([unit.id for unit in units], np.stack([x, y], axis=1), masks,
+                       citytile_positions, citytiles)
@@ -0,0 +1,207 @@
+import numpy as np
+
+from .game_map import GameMap, Resource, cached_position
+from .parser import RESOURCE_CODES
+
+# integer codes used in the resource_type plane (-1 means no resource)
+RESOURCE_TYPE_IDS = {r_type: i for i, r_type in enumerate(RESOURCE_CODES)}
+RESOURCE_TYPE_NAMES = {v: k for k, v in RESOURCE_TYPE_IDS.items()}
+NO_RESOURCE = -1
+NO_TEAM = -1
+# per-tile planes of an ArrayGameMap, (dtype, fill value)
+PLANES = {
+    "resource_type": (np.int8, NO_RESOURCE),
+    "resource_amount": (np.int32, 0),
+    "road": (np.float32, 0),
+    "citytile_team": (np.int8, NO_TEAM),
+    "citytile_cooldown": (np.float32, 0),
+}
+
+
+class CellView:
+    """
+    Cell-like view onto one tile of an ArrayGameMap. Reads and writes go
+    straight to the map's arrays, so existing agent code using
+    cell.resource / cell.citytile / cell.road keeps working.
+    """
+    __slots__ = ("_map", "pos")
+
+    def __init__(self, game_map, pos):
+        self._map = game_map
+        self.pos = pos
+
+    @property
+    def resource(self):
+        m, x, y = self._map, self.pos.x, self.pos.y
+        r_type = m.resource_type[y, x]
+        if r_type == NO_RESOURCE:
+            return None
+        return Resource(RESOURCE_TYPE_NAMES[int(r_type)], int(m.resource_amount[y, x]))
+
+    @resource.setter
+    def resource(self, resource):
+        if resource is None:
+            self._map._clear_resource(self.pos.x, self.pos.y)
+        else:
+            self._map._setResource(resource.type, self.pos.x, self.pos.y, resource.amount)
+
+    @property
+    def citytile(self):
+        return self._map._citytiles.get((self.pos.x, self.pos.y))
+
+    @citytile.setter
+    def citytile(self, citytile):
+        self._map._set_citytile(self.pos.x, self.pos.y, citytile)
+
+    @property
+    def road(self):
+        return float(self._map.road[self.pos.y, self.pos.x])
+
+    @road.setter
+    def road(self, road):
+        m = self._map
+        if m._shared:
+            m._unshare("road")
+        m.road[self.pos.y, self.pos.x] = road
+
+    def has_resource(self):
+        m, x, y = self._map, self.pos.x, self.pos.y
+        return m.resource_type[y, x] != NO_RESOURCE and m.resource_amount[y, x] > 0
+
+
+class ArrayGameMap(GameMap):
+    """
+    GameMap backend that keeps the map state in preallocated NumPy planes
+    (indexed [y, x]) which are reused from one turn to the next:
+
+        resource_type      int8     resource code (see RESOURCE_TYPE_IDS), -1 if none
+        resource_amount    int32
+        road               float32
+        citytile_team      int8     owning team, -1 if no citytile
+        citytile_cooldown  float32
+        unit_count         int16    shape (2, height, width), units per team
+
+    Cells and positions are allocated once per map; get_cell/get_cell_by_pos
+    return CellView objects backed by the arrays.
+
+    A clone (see Game.clone) shares the planes with its source until one of
+    them writes to a plane, which then gets its own copy. Shared planes are
+    read-only, so write to them through the map's methods or the cells.
+    """
+    bulk_updates = True
+
+    def __init__(self, width, height):
+        self.height = height
+        self.width = width
+        shape = (height, width)
+        for name, (dtype, fill) in PLANES.items():
+            setattr(self, name, np.full(shape, fill, dtype=dtype))
+        self.unit_count = np.zeros((2, height, width), dtype=np.int16)
+        self._citytiles = {}
+        self._shared = set()
+        self.map = self._make_cells()
+
+    def _make_cells(self):
+        return [[CellView(self, cached_position(x, y)) for x in range(self.width)]
+                for y in range(self.height)]
+
+    def __getattr__(self, name):
+        # clones build their cell views on first use
+        if name == "map":
+            self.map = self._make_cells()
+            return self.map
+        raise AttributeError(name)
+
+    def _unshare(self, *names):
+        """gives this map its own copy of the named planes before writing to them"""
+        for name in names:
+            if name in self._shared:
+                self._shared.discard(name)
+                setattr(self, name, getattr(self, name).copy())
+
+    def _clone(self, citytiles):
+        """copy of the map sharing its planes until written, citytiles are the copied citytiles by (x, y)"""
+        game_map = ArrayGameMap.__new__(ArrayGameMap)
+        game_map.height = self.height
+        game_map.width = self.width
+        for name in PLANES:
+            plane = getattr(self, name)
+            plane.flags.writeable = False
+            setattr(game_map, name, plane)
+        self.unit_count.flags.writeable = False
+        game_map.unit_count = self.unit_count
+        game_map._citytiles = {xy: citytiles[xy] for xy in self._citytiles}
+        self._shared = set(PLANES) | {"unit_count"}
+        game_map._shared = set(self._shared)
+        return game_map
+
+    def _reset(self):
+        """sets every plane to its empty value"""
+        for name, (dtype, fill) in PLANES.items():
+            if name in self._shared:
+                setattr(self, name, np.full((self.height, self.width), fill, dtype=dtype))
+            else:
+                getattr(self, name).fill(fill)
+        if "unit_count" in self._shared:
+            self.unit_count = np.zeros((2, self.height, self.width), dtype=np.int16)
+        else:
+            self.unit_count.fill(0)
+        self._shared.clear()
+        self._citytiles.clear()
+
+    def _setResource(self, r_type, x, y, amount):
+        """sets the resource type and amount of a tile"""
+        if self._shared:
+            self._unshare("resource_type", "resource_amount")
+        self.resource_type[y, x] = RESOURCE_TYPE_IDS[r_type]
+        self.resource_amount[y, x] = amount
+
+    def _set_resources(self, resources):
+        """sets the resources of a parsed (type, x, y, amount) array"""
+        if self._shared:
+            self._unshare("resource_type", "resource_amount")
+        self.resource_type[resources["y"], resources["x"]] = resources["type"]
+        self.resource_amount[resources["y"], resources["x"]] = resources["amount"]
+
+    def _set_roads(self, roads):
+        """sets the roads of a parsed (x, y, road) array"""
+        if self._shared:
+            self._unshare("road")
+        self.road[roads["y"], roads["x"]] = roads["road"]
+
+    def _clear_resource(self, x, y):
+        """removes the resource of a tile"""
+        if self._shared:
+            self._unshare("resource_type", "resource_amount")
+        self.resource_type[y, x] = NO_RESOURCE
+        self.resource_amount[y, x] = 0
+
+    def _set_citytile(self, x, y, citytile):
+        if self._shared:
+            self._unshare("citytile_team", "citytile_cooldown")
+        if citytile is None:
+            self._citytiles.pop((x, y), None)
+            self.citytile_team[y, x] = NO_TEAM
+            self.citytile_cooldown[y, x] = 0
+        else:
+            self._citytiles[(x, y)] = citytile
+            self.citytile_team[y, x] = citytile.team
+            self.citytile_cooldown[y, x] = citytile.cooldown
+
+    def _add_unit(self, unit):
+        """counts the unit on its tile"""
+        if self._shared:
+            self._unshare("unit_count")
+        self.unit_count[unit.team, unit.pos.y, unit.pos.x] += 1
+
+    def _add_units(self, units):
+        """counts the parsed units on their tiles"""
+        if self._shared:
+            self._unshare("unit_count")
+        np.add.at(self.unit_count, (units["team"], units["y"], units["x"]), 1)
+
+    def _remove_unit(self, unit):
+        """uncounts the unit from its tile"""
+        if self._shared:
+            self._unshare("unit_count")
+        self.unit_count[unit.team, unit.pos.y, unit.pos.x] -= 1
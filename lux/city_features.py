@@ -0,0 +1,134 @@
+import numpy as np
+
+from .game_constants import PARAMETERS
+from .parser import RESOURCE_CODES
+
+DAY_LENGTH = PARAMETERS.DAY_LENGTH
+NIGHT_LENGTH = PARAMETERS.NIGHT_LENGTH
+CYCLE_LENGTH = DAY_LENGTH + NIGHT_LENGTH
+MAX_DAYS = PARAMETERS.MAX_DAYS
+# fuel per unit of resource and research points needed to mine it, by resource code
+FUEL_RATE = np.array([PARAMETERS.RESOURCE_TO_FUEL_RATE[name.upper()] for name in RESOURCE_CODES])
+RESEARCH_NEEDED = np.array([getattr(PARAMETERS.RESEARCH_REQUIREMENTS, name.upper(), 0) for name in RESOURCE_CODES])
+
+
+def nights_left(turn):
+    """night turns from turn until the end of the next (or current) night"""
+    cycle_turn = turn % CYCLE_LENGTH
+    return np.where(cycle_turn < DAY_LENGTH, NIGHT_LENGTH, CYCLE_LENGTH - cycle_turn)
+
+
+def night_turn(turn, k):
+    """turn of the k-th (from 0) night turn at or after turn"""
+    start = turn - turn % CYCLE_LENGTH + DAY_LENGTH  # night of the current cycle
+    k = k + np.maximum(turn - start, 0)
+    return start + k // NIGHT_LENGTH * CYCLE_LENGTH + k % NIGHT_LENGTH
+
+
+class CityFeatures:
+    """
+    Per city (both teams, in the players' city order), in the city_ arrays:
+        horizon   turns the city lasts on its fuel alone: it is destroyed
+                  at the night turn `turn + horizon`, or outlives the game
+                  when that is past MAX_DAYS
+        deficit   fuel missing to last until the end of the next (or
+                  current) night, 0 if it has enough
+        reach_value  fuel value of the resources its team can mine within
+                  `reach` moves of any of its tiles
+    Per citytile, in the citytile_ arrays: its position, the row of its city
+    and the reach value around the tile alone.
+    """
+    __slots__ = ("city_ids", "city_team", "city_fuel", "city_light_upkeep", "city_tiles",
+                 "city_horizon", "city_deficit", "city_reach_value",
+                 "citytile_positions", "citytile_city", "citytile_reach_value")
+
+    def __init__(self, **arrays):
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    @property
+    def city_survives_night(self):
+        return self.city_deficit == 0
+
+    @property
+    def citytile_horizon(self):
+        return self.city_horizon[self.citytile_city]
+
+
+def fuel_value_planes(game):
+    """(2, H, W) fuel value of the resources on each tile that each team can mine"""
+    game_map = game.map
+    if hasattr(game_map, "resource_type"):
+        r_type = game_map.resource_type.astype(np.intp)
+        amount = game_map.resource_amount
+    else:
+        r_type = np.full((game.map_height, game.map_width), -1, dtype=np.intp)
+        amount = np.zeros(r_type.shape, dtype=np.int32)
+        codes = {name: code for code, name in enumerate(RESOURCE_CODES)}
+        for row in game_map.map:
+            for cell in row:
+                if cell.resource is not None:
+                    r_type[cell.pos.y, cell.pos.x] = codes[cell.resource.type]
+                    amount[cell.pos.y, cell.pos.x] = cell.resource.amount
+    has_resource = r_type >= 0
+    value = np.where(has_resource, amount * FUEL_RATE[r_type], 0)
+    research = np.array([player.research_points for player in game.players])
+    mineable = has_resource & (research[:, None, None] >= RESEARCH_NEEDED[r_type])
+    return np.where(mineable, value, 0)
+
+
+def _dilate(planes, reach):
+    """planes (N, H, W) bool grown by reach moves"""
+    for _ in range(reach):
+        grown = planes.copy()
+        grown[:, 1:] |= planes[:, :-1]
+        grown[:, :-1] |= planes[:, 1:]
+        grown[:, :, 1:] |= planes[:, :, :-1]
+        grown[:, :, :-1] |= planes[:, :, 1:]
+        planes = grown
+    return planes
+
+
+def city_features(game, reach=1) -> CityFeatures:
+    """
+    Survival horizon, fuel deficit and reachable resource value of all
+    cities and citytiles, see CityFeatures. Income is not taken into
+    account, only the fuel the cities hold.
+    """
+    height, width = game.map_height, game.map_width
+    city_ids, values, tile_values = [], [], []
+    for player in game.players:
+        for city in player.cities.values():
+            row = len(city_ids)
+            city_ids.append(city.cityid)
+            values += (player.team, city.fuel, city.light_upkeep, len(city.citytiles))
+            for citytile in city.citytiles:
+                tile_values += (citytile.pos.x, citytile.pos.y, row)
+    team, fuel, upkeep, tiles = np.array(values, dtype=np.float64).reshape(-1, 4).T
+    team, tiles = team.astype(np.intp), tiles.astype(np.intp)
+    x, y, tile_city = np.array(tile_values, dtype=np.intp).reshape(-1, 3).T
+
+    turn = game.turn
+    covered = np.floor_divide(fuel, upkeep, out=np.full_like(fuel, MAX_DAYS), where=upkeep > 0)
+    death = night_turn(turn, np.minimum(covered, MAX_DAYS).astype(np.intp))
+    horizon = np.minimum(death, MAX_DAYS) - turn
+    deficit = np.maximum(upkeep * nights_left(turn) - fuel, 0)
+
+    value = fuel_value_planes(game)
+    tiles_plane = np.zeros((len(city_ids), height, width), dtype=bool)
+    tiles_plane[tile_city, y, x] = True
+    # one product of the flattened planes instead of a value plane per city
+    reachable = _dilate(tiles_plane, reach).reshape(len(city_ids), height * width).astype(np.float64)
+    city_reach = (reachable @ value.reshape(2, -1).T.astype(np.float64))[np.arange(len(city_ids)), team]
+    # value within reach of each tile: sum over the diamond of offsets
+    padded = np.pad(value, ((0, 0), (reach, reach), (reach, reach)))
+    tile_team = team[tile_city]
+    tile_reach = np.zeros(len(x), dtype=value.dtype)
+    for dy in range(-reach, reach + 1):
+        for dx in range(abs(dy) - reach, reach - abs(dy) + 1):
+            tile_reach += padded[tile_team, y + reach + dy, x + reach + dx]
+
+    return CityFeatures(city_ids=city_ids, city_team=team, city_fuel=fuel, city_light_upkeep=upkeep,
+                        city_tiles=tiles, city_horizon=horizon, city_deficit=deficit,
+                        city_reach_value=city_reach, citytile_positions=np.stack([x, y], axis=1),
+                        citytile_city=tile_city, citytile_reach_value=tile_reach)
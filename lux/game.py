@@ -1,27 +1,138 @@
+import itertools
+
+from .action_masks import ActionMasks, action_masks
+from .city_features import CityFeatures, city_features
 from .constants import Constants
-from .game_map import GameMap
+from .game_map import GameMap, Position, cached_position
 from .game_objects import Player, Unit, City, CityTile
+from .parser import parse_updates, UNIT_ID_PREFIX, CITY_ID_PREFIX
 
 INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
+# Game.version of every state, unique across games, clones and restores
+_versions = itertools.count()
+
+
+class GameDelta:
+    """
+    Changes applied by the last incremental Game._update to the state of
+    Game.version `since` (None for the first update, which fills it all)
+    """
+    def __init__(self, since=None):
+        self.since = since
+        self.units_spawned: list[Unit] = []
+        self.units_died: list[Unit] = []
+        self.citytiles_built: list[CityTile] = []
+        self.citytiles_lost: list[CityTile] = []
+        self.resources_depleted: list[Position] = []
+
+
+def _message_key(strs):
+    """
+    identity of the entity a message describes, used to diff turns
+    """
+    input_identifier = strs[0]
+    if input_identifier == INPUT_CONSTANTS.RESEARCH_POINTS:
+        return input_identifier, strs[1]
+    elif input_identifier == INPUT_CONSTANTS.UNITS:
+        return input_identifier, strs[3]
+    elif input_identifier == INPUT_CONSTANTS.CITY:
+        return input_identifier, strs[2]
+    elif input_identifier == INPUT_CONSTANTS.CITY_TILES:
+        return input_identifier, strs[3], strs[4]
+    elif input_identifier in (INPUT_CONSTANTS.RESOURCES, INPUT_CONSTANTS.ROADS):
+        return input_identifier, strs[-3], strs[-2]
+    return None
+
+
+# order in which incremental updates are applied: cities before their
+# tiles on upsert, tiles before their cities on deletion
+_UPDATE_ORDER = (INPUT_CONSTANTS.RESEARCH_POINTS, INPUT_CONSTANTS.CITY,
+                 INPUT_CONSTANTS.CITY_TILES, INPUT_CONSTANTS.UNITS,
+                 INPUT_CONSTANTS.RESOURCES, INPUT_CONSTANTS.ROADS)
 
 
 class Game:
+    def __init__(self, map_class=GameMap, incremental=False, bulk_parse=None):
+        """
+        map_class selects the map backend, e.g. lux.array_map.ArrayGameMap
+        incremental makes _update diff each turn against the previous one and
+        only touch what changed, reporting the changes in self.delta
+        bulk_parse parses the messages with lux.parser.parse_updates instead
+        of one message at a time. By default it is used when the map backend
+        can apply the parsed arrays in bulk (see benchmarks/bench_parser.py)
+        """
+        self.map_class = map_class
+        self.incremental = incremental
+        if bulk_parse is None:
+            bulk_parse = map_class.bulk_updates
+        self.bulk_parse = bulk_parse
+        self.delta = None
+
     def _initialize(self, messages):
         """
         initialize state
         """
         self.id = int(messages[0])
         self.turn = -1
+        self.version = next(_versions)
         # get some other necessary initial input
         mapInfo = messages[1].split(" ")
         self.map_width = int(mapInfo[0])
         self.map_height = int(mapInfo[1])
-        self.map = GameMap(self.map_width, self.map_height)
+        self.map = self.map_class(self.map_width, self.map_height)
         self.players = [Player(0), Player(1)]
+        self._messages = set()
+        self._units = {}
+        self._citytiles = {}
 
     def _end_turn(self):
         print("D_FINISH")
 
+    def clone(self) -> 'Game':
+        """
+        independent copy of the state, e.g. to branch a search. Units,
+        cities and citytiles are copied; with an ArrayGameMap the map planes
+        are shared copy-on-write, so the cost does not depend on the map size
+        """
+        game = Game.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        citytiles = {}
+        game.players = [player._clone(citytiles) for player in self.players]
+        game.map = self.map._clone(citytiles)
+        # _messages is replaced on every update, never changed in place
+        game._units = {unit.id: unit for player in game.players for unit in player.units} if self._units else {}
+        game._citytiles = {xy: citytiles[xy] for xy in self._citytiles}
+        game.delta = None
+        game.version = next(_versions)
+        return game
+
+    def snapshot(self) -> 'Game':
+        """
+        saved copy of the state to pass to restore(), which can restore it
+        any number of times. Do not update the snapshot itself
+        """
+        return self.clone()
+
+    def restore(self, snapshot: 'Game'):
+        """
+        set the state back to a snapshot()
+        """
+        self.__dict__.update(snapshot.clone().__dict__)
+
+    def action_masks(self, team=None) -> ActionMasks:
+        """
+        boolean masks of the legal actions of all units and citytiles of
+        team (default: this player), see lux.action_masks
+        """
+        return action_masks(self, self.id if team is None else team)
+
+    def city_features(self, reach=1) -> CityFeatures:
+        """
+        survival horizon, fuel deficit to the next night and resource value
+        within reach of all cities and citytiles, see lux.city_features
+        """
+        return city_features(self, reach)
+
     def _reset_player_states(self):
         self.players[0].units = []
         self.players[0].cities = {}
@@ -30,14 +141,53 @@ class Game:
         self.players[1].cities = {}
         self.players[1].city_tile_count = 0
 
-    def _update(self, messages):
+    def _update(self, messages, updates=None):
         """
         update state
+        updates can hold the messages already parsed by parse_updates (e.g.
+        kept from an earlier game on the same map), they are then not parsed
+        again
         """
-        self.map = GameMap(self.map_width, self.map_height)
+        since, self.version = self.version, next(_versions)
+        if self.incremental:
+            self._update_incremental(messages, updates, since)
+            return
+        if self.turn >= 0:
+            # right after _initialize the map is still empty
+            self.map._reset()
         self.turn += 1
         self._reset_player_states()
+        if updates is None:
+            if not self.bulk_parse:
+                self._update_lines(messages)
+                return
+            updates = parse_updates(messages)
+        self._apply_updates(updates)
+
+    def _apply_updates(self, updates):
+        """
+        fill the reset state from parse_updates arrays
+        """
+        for team, points in updates.research.tolist():
+            self.players[team].research_points = points
+        self.map._set_resources(updates.resources)
+        for unittype, team, unitid, x, y, cooldown, wood, coal, uranium in updates.units.tolist():
+            unitid = UNIT_ID_PREFIX + str(unitid)
+            self.players[team].units.append(Unit(team, unittype, unitid, x, y, cooldown, wood, coal, uranium))
+        self.map._add_units(updates.units)
+        for team, cityid, fuel, lightupkeep in updates.cities.tolist():
+            cityid = CITY_ID_PREFIX + str(cityid)
+            self.players[team].cities[cityid] = City(team, cityid, fuel, lightupkeep)
+        for team, cityid, x, y, cooldown in updates.citytiles.tolist():
+            citytile = self.players[team].cities[CITY_ID_PREFIX + str(cityid)]._add_city_tile(x, y, cooldown)
+            self.map.get_cell(x, y).citytile = citytile
+            self.players[team].city_tile_count += 1
+        self.map._set_roads(updates.roads)
 
+    def _update_lines(self, messages):
+        """
+        update state parsing one message at a time
+        """
         for update in messages:
             if update == "D_DONE":
                 break
@@ -62,7 +212,9 @@ class Game:
                 wood = int(strs[7])
                 coal = int(strs[8])
                 uranium = int(strs[9])
-                self.players[team].units.append(Unit(team, unittype, unitid, x, y, cooldown, wood, coal, uranium))
+                unit = Unit(team, unittype, unitid, x, y, cooldown, wood, coal, uranium)
+                self.players[team].units.append(unit)
+                self.map._add_unit(unit)
             elif input_identifier == INPUT_CONSTANTS.CITY:
                 team = int(strs[1])
                 cityid = strs[2]
@@ -84,3 +236,156 @@ class Game:
                 y = int(strs[2])
                 road = float(strs[3])
                 self.map.get_cell(x, y).road = road
+
+    def _update_incremental(self, messages, updates=None, since=None):
+        """
+        update state in place from the messages that differ from last turn,
+        since is the version of the state they are applied to
+        """
+        current = set()
+        for update in messages:
+            if update == "D_DONE":
+                break
+            current.add(update)
+        if updates is not None and not self._messages:
+            # first update with the messages already parsed: fill in bulk
+            self._update_incremental_first(current, updates)
+            return
+
+        self.turn += 1
+        delta = GameDelta(since)
+        added = {}
+        for update in current - self._messages:
+            strs = update.split(" ")
+            key = _message_key(strs)
+            if key is not None:
+                added[key] = strs
+        removed = set()
+        for update in self._messages - current:
+            key = _message_key(update.split(" "))
+            if key is not None and key not in added:
+                removed.add(key)
+        self._messages = current
+
+        for key in sorted(added, key=lambda k: _UPDATE_ORDER.index(k[0])):
+            strs = added[key]
+            input_identifier = strs[0]
+            if input_identifier == INPUT_CONSTANTS.RESEARCH_POINTS:
+                team = int(strs[1])
+                self.players[team].research_points = int(strs[2])
+            elif input_identifier == INPUT_CONSTANTS.RESOURCES:
+                r_type = strs[1]
+                x = int(strs[2])
+                y = int(strs[3])
+                amt = int(float(strs[4]))
+                self.map._setResource(r_type, x, y, amt)
+            elif input_identifier == INPUT_CONSTANTS.UNITS:
+                unittype = int(strs[1])
+                team = int(strs[2])
+                unitid = strs[3]
+                x = int(strs[4])
+                y = int(strs[5])
+                cooldown = float(strs[6])
+                wood = int(strs[7])
+                coal = int(strs[8])
+                uranium = int(strs[9])
+                unit = self._units.get(unitid)
+                if unit is None:
+                    unit = Unit(team, unittype, unitid, x, y, cooldown, wood, coal, uranium)
+                    self._units[unitid] = unit
+                    self.players[team].units.append(unit)
+                    delta.units_spawned.append(unit)
+                else:
+                    self.map._remove_unit(unit)
+                    if unit.pos.x != x or unit.pos.y != y:
+                        unit.pos = cached_position(x, y)
+                    unit.cooldown = cooldown
+                    unit.cargo.wood = wood
+                    unit.cargo.coal = coal
+                    unit.cargo.uranium = uranium
+                self.map._add_unit(unit)
+            elif input_identifier == INPUT_CONSTANTS.CITY:
+                team = int(strs[1])
+                cityid = strs[2]
+                fuel = float(strs[3])
+                lightupkeep = float(strs[4])
+                city = self.players[team].cities.get(cityid)
+                if city is None:
+                    self.players[team].cities[cityid] = City(team, cityid, fuel, lightupkeep)
+                else:
+                    city.fuel = fuel
+                    city.light_upkeep = lightupkeep
+            elif input_identifier == INPUT_CONSTANTS.CITY_TILES:
+                team = int(strs[1])
+                cityid = strs[2]
+                x = int(strs[3])
+                y = int(strs[4])
+                cooldown = float(strs[5])
+                citytile = self._citytiles.get((x, y))
+                if citytile is not None and citytile.cityid != cityid:
+                    # the tile's city was merged into another one, or the
+                    # tile was lost and rebuilt by the other team
+                    self.players[citytile.team].cities[citytile.cityid].citytiles.remove(citytile)
+                    if citytile.team == team:
+                        self.players[team].cities[cityid].citytiles.append(citytile)
+                        citytile.cityid = cityid
+                    else:
+                        delta.citytiles_lost.append(citytile)
+                        citytile = None
+                if citytile is None:
+                    citytile = self.players[team].cities[cityid]._add_city_tile(x, y, cooldown)
+                    self._citytiles[(x, y)] = citytile
+                    delta.citytiles_built.append(citytile)
+                citytile.cooldown = cooldown
+                self.map.get_cell(x, y).citytile = citytile
+            elif input_identifier == INPUT_CONSTANTS.ROADS:
+                x = int(strs[1])
+                y = int(strs[2])
+                road = float(strs[3])
+                self.map.get_cell(x, y).road = road
+
+        for key in sorted(removed, key=lambda k: -_UPDATE_ORDER.index(k[0])):
+            input_identifier = key[0]
+            if input_identifier == INPUT_CONSTANTS.RESOURCES:
+                x, y = int(key[1]), int(key[2])
+                self.map._clear_resource(x, y)
+                delta.resources_depleted.append(cached_position(x, y))
+            elif input_identifier == INPUT_CONSTANTS.UNITS:
+                unit = self._units.pop(key[1])
+                self.players[unit.team].units.remove(unit)
+                self.map._remove_unit(unit)
+                delta.units_died.append(unit)
+            elif input_identifier == INPUT_CONSTANTS.CITY_TILES:
+                x, y = int(key[1]), int(key[2])
+                citytile = self._citytiles.pop((x, y))
+                city = self.players[citytile.team].cities.get(citytile.cityid)
+                if city is not None:
+                    city.citytiles.remove(citytile)
+                self.map.get_cell(x, y).citytile = None
+                delta.citytiles_lost.append(citytile)
+            elif input_identifier == INPUT_CONSTANTS.ROADS:
+                self.map.get_cell(int(key[1]), int(key[2])).road = 0
+            elif input_identifier == INPUT_CONSTANTS.CITY:
+                for player in self.players:
+                    player.cities.pop(key[1], None)
+
+        for player in self.players:
+            player.city_tile_count = sum(len(city.citytiles) for city in player.cities.values())
+        self.delta = delta
+
+    def _update_incremental_first(self, current, updates):
+        """full update of the first incremental turn, every unit and citytile in the delta as new"""
+        self.turn += 1
+        self._reset_player_states()
+        self._apply_updates(updates)
+        self._messages = current
+        delta = GameDelta()
+        for player in self.players:
+            for unit in player.units:
+                self._units[unit.id] = unit
+                delta.units_spawned.append(unit)
+            for city in player.cities.values():
+                for citytile in city.citytiles:
+                    self._citytiles[(citytile.pos.x, citytile.pos.y)] = citytile
+                    delta.citytiles_built.append(citytile)
+        self.delta = delta
@@ -2,34 +2,55 @@ import math
 from typing import List
 
 from .constants import Constants
+from .parser import RESOURCE_CODES
 
 DIRECTIONS = Constants.DIRECTIONS
 RESOURCE_TYPES = Constants.RESOURCE_TYPES
 
 
 class Resource:
+    __slots__ = ("type", "amount")
+
     def __init__(self, r_type: str, amount: int):
         self.type = r_type
         self.amount = amount
 
 
 class Cell:
+    __slots__ = ("pos", "resource", "citytile", "road")
+
     def __init__(self, x, y):
-        self.pos = Position(x, y)
+        self.pos = cached_position(x, y)
         self.resource: Resource = None
         self.citytile = None
         self.road = 0
     def has_resource(self):
         return self.resource is not None and self.resource.amount > 0
+    def _clone(self, citytiles):
+        """copy of the cell, citytiles are the copied citytiles by (x, y)"""
+        cell = Cell.__new__(Cell)
+        cell.pos = self.pos
+        # resources are replaced, never changed in place, so they are shared
+        cell.resource = self.resource
+        cell.citytile = None if self.citytile is None else citytiles[(self.pos.x, self.pos.y)]
+        cell.road = self.road
+        return cell
 
 
 class GameMap:
+    # whether _set_resources/_set_roads/_add_units are vectorized
+    bulk_updates = False
+
     def __init__(self, width, height):
         self.height = height
         self.width = width
-        self.map: List[List[Cell]] = [None] * height
+        self._reset()
+
+    def _reset(self):
+        """fills the map with empty cells"""
+        self.map: List[List[Cell]] = [None] * self.height
         for y in range(0, self.height):
-            self.map[y] = [None] * width
+            self.map[y] = [None] * self.width
             for x in range(0, self.width):
                 self.map[y][x] = Cell(x, y)
 
@@ -46,8 +67,44 @@ class GameMap:
         cell = self.get_cell(x, y)
         cell.resource = Resource(r_type, amount)
 
+    def _set_resources(self, resources):
+        """sets the resources of a parsed (type, x, y, amount) array"""
+        for r_type, x, y, amount in resources.tolist():
+            self._setResource(RESOURCE_CODES[r_type], x, y, amount)
+
+    def _set_roads(self, roads):
+        """sets the roads of a parsed (x, y, road) array"""
+        for x, y, road in roads.tolist():
+            self.get_cell(x, y).road = road
+
+    def _clear_resource(self, x, y):
+        """removes the resource of a depleted tile"""
+        self.get_cell(x, y).resource = None
+
+    def _add_unit(self, unit):
+        """no-op, only ArrayGameMap counts units by tile"""
+        pass
+
+    def _add_units(self, units):
+        """no-op, only ArrayGameMap counts units by tile"""
+        pass
+
+    def _remove_unit(self, unit):
+        """no-op, only ArrayGameMap counts units by tile"""
+        pass
+
+    def _clone(self, citytiles):
+        """copy of the map, citytiles are the copied citytiles by (x, y)"""
+        game_map = self.__class__.__new__(self.__class__)
+        game_map.height = self.height
+        game_map.width = self.width
+        game_map.map = [[cell._clone(citytiles) for cell in row] for row in self.map]
+        return game_map
+
 
 class Position:
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -104,3 +161,17 @@ class Position:
 
     def __str__(self) -> str:
         return f"({self.x}, {self.y})"
+
+
+_positions = {}
+
+
+def cached_position(x, y) -> Position:
+    """
+    Returns the shared Position instance for (x, y), creating it on first
+    use. Cells, units and citytiles all use these, so do not mutate them.
+    """
+    pos = _positions.get((x, y))
+    if pos is None:
+        pos = _positions[(x, y)] = Position(x, y)
+    return pos
@@ -1,13 +1,29 @@
 from typing import Dict
 
 from .constants import Constants
-from .game_map import Position
-from .game_constants import GAME_CONSTANTS
+from .game_map import cached_position
+from .game_constants import PARAMETERS
 
 UNIT_TYPES = Constants.UNIT_TYPES
+RESEARCH_REQUIREMENTS = PARAMETERS.RESEARCH_REQUIREMENTS
+RESOURCE_CAPACITY = PARAMETERS.RESOURCE_CAPACITY
+
+_citytile_ids = {}
+
+
+def citytile_id(x, y) -> str:
+    """
+    id of the citytile at (x, y), e.g. "ct_3_4"
+    """
+    ctid = _citytile_ids.get((x, y))
+    if ctid is None:
+        ctid = _citytile_ids[(x, y)] = f"ct_{x}_{y}"
+    return ctid
 
 
 class Player:
+    __slots__ = ("team", "research_points", "units", "cities", "city_tile_count")
+
     def __init__(self, team):
         self.team = team
         self.research_points = 0
@@ -15,12 +31,23 @@ class Player:
         self.cities: Dict[str, City] = {}
         self.city_tile_count = 0
     def researched_coal(self) -> bool:
-        return self.research_points >= GAME_CONSTANTS["PARAMETERS"]["RESEARCH_REQUIREMENTS"]["COAL"]
+        return self.research_points >= RESEARCH_REQUIREMENTS.COAL
     def researched_uranium(self) -> bool:
-        return self.research_points >= GAME_CONSTANTS["PARAMETERS"]["RESEARCH_REQUIREMENTS"]["URANIUM"]
+        return self.research_points >= RESEARCH_REQUIREMENTS.URANIUM
+    def _clone(self, citytiles):
+        """copy of the player, collecting its copied citytiles by (x, y) in citytiles"""
+        player = Player.__new__(Player)
+        player.team = self.team
+        player.research_points = self.research_points
+        player.units = [unit._clone() for unit in self.units]
+        player.cities = {cityid: city._clone(citytiles) for cityid, city in self.cities.items()}
+        player.city_tile_count = self.city_tile_count
+        return player
 
 
 class City:
+    __slots__ = ("cityid", "team", "fuel", "citytiles", "light_upkeep")
+
     def __init__(self, teamid, cityid, fuel, light_upkeep):
         self.cityid = cityid
         self.team = teamid
@@ -33,14 +60,40 @@ class City:
         return ct
     def get_light_upkeep(self):
         return self.light_upkeep
+    def _clone(self, citytiles):
+        """copy of the city, adding its copied citytiles by (x, y) to citytiles"""
+        city = City.__new__(City)
+        city.cityid = self.cityid
+        city.team = self.team
+        city.fuel = self.fuel
+        city.light_upkeep = self.light_upkeep
+        city.citytiles = []
+        for citytile in self.citytiles:
+            copy = CityTile.__new__(CityTile)
+            copy.cityid = citytile.cityid
+            copy.team = citytile.team
+            copy.pos = citytile.pos
+            copy.cooldown = citytile.cooldown
+            city.citytiles.append(copy)
+            citytiles[(copy.pos.x, copy.pos.y)] = copy
+        return city
 
 
 class CityTile:
+    __slots__ = ("cityid", "team", "pos", "cooldown")
+    class_name = "citytile"
+
     def __init__(self, teamid, cityid, x, y, cooldown):
         self.cityid = cityid
         self.team = teamid
-        self.pos = Position(x, y)
+        self.pos = cached_position(x, y)
         self.cooldown = cooldown
+    @property
+    def id(self) -> str:
+        """
+        citytiles have no id in the game engine, they are identified by position
+        """
+        return citytile_id(self.pos.x, self.pos.y)
     def can_act(self) -> bool:
         """
         Whether or not this unit can research or build
@@ -64,6 +117,8 @@ class CityTile:
 
 
 class Cargo:
+    __slots__ = ("wood", "coal", "uranium")
+
     def __init__(self):
         self.wood = 0
         self.coal = 0
@@ -74,8 +129,11 @@ class Cargo:
 
 
 class Unit:
+    __slots__ = ("pos", "team", "id", "type", "cooldown", "cargo")
+    class_name = "unit"
+
     def __init__(self, teamid, u_type, unitid, x, y, cooldown, wood, coal, uranium):
-        self.pos = Position(x, y)
+        self.pos = cached_position(x, y)
         self.team = teamid
         self.id = unitid
         self.type = u_type
@@ -84,6 +142,19 @@ class Unit:
         self.cargo.wood = wood
         self.cargo.coal = coal
         self.cargo.uranium = uranium
+    def _clone(self):
+        """copy of the unit with its own cargo"""
+        unit = Unit.__new__(Unit)
+        unit.pos = self.pos
+        unit.team = self.team
+        unit.id = self.id
+        unit.type = self.type
+        unit.cooldown = self.cooldown
+        unit.cargo = cargo = Cargo.__new__(Cargo)
+        cargo.wood = self.cargo.wood
+        cargo.coal = self.cargo.coal
+        cargo.uranium = self.cargo.uranium
+        return unit
     def is_worker(self) -> bool:
         return self.type == UNIT_TYPES.WORKER
 
@@ -96,16 +167,16 @@ class Unit:
         """
         spaceused = self.cargo.wood + self.cargo.coal + self.cargo.uranium
         if self.type == UNIT_TYPES.WORKER:
-            return GAME_CONSTANTS["PARAMETERS"]["RESOURCE_CAPACITY"]["WORKER"] - spaceused
+            return RESOURCE_CAPACITY.WORKER - spaceused
         else:
-            return GAME_CONSTANTS["PARAMETERS"]["RESOURCE_CAPACITY"]["CART"] - spaceused
+            return RESOURCE_CAPACITY.CART - spaceused
     
     def can_build(self, game_map) -> bool:
         """
         whether or not the unit can build where it is right now
         """
         cell = game_map.get_cell_by_pos(self.pos)
-        if not cell.has_resource() and self.can_act() and (self.cargo.wood + self.cargo.coal + self.cargo.uranium) >= GAME_CONSTANTS["PARAMETERS"]["CITY_BUILD_COST"]:
+        if not cell.has_resource() and self.can_act() and (self.cargo.wood + self.cargo.coal + self.cargo.uranium) >= PARAMETERS.CITY_BUILD_COST:
             return True
         return False
 
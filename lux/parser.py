@@ -0,0 +1,86 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from .constants import Constants
+
+INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
+RESOURCE_TYPES = Constants.RESOURCE_TYPES
+
+RESEARCH_DTYPE = np.dtype([("team", np.int8), ("points", np.int32)])
+RESOURCE_DTYPE = np.dtype([("type", np.int8), ("x", np.int16), ("y", np.int16),
+                           ("amount", np.int32)])
+UNIT_DTYPE = np.dtype([("type", np.int8), ("team", np.int8), ("id", np.int32),
+                       ("x", np.int16), ("y", np.int16), ("cooldown", np.float64),
+                       ("wood", np.int32), ("coal", np.int32), ("uranium", np.int32)])
+CITY_DTYPE = np.dtype([("team", np.int8), ("id", np.int32), ("fuel", np.float64),
+                       ("light_upkeep", np.float64)])
+CITYTILE_DTYPE = np.dtype([("team", np.int8), ("cityid", np.int32), ("x", np.int16),
+                           ("y", np.int16), ("cooldown", np.float64)])
+ROAD_DTYPE = np.dtype([("x", np.int16), ("y", np.int16), ("road", np.float64)])
+
+# resource codes in RESOURCE_DTYPE["type"], same as lux.array_map.RESOURCE_TYPE_IDS
+RESOURCE_CODES = (RESOURCE_TYPES.WOOD, RESOURCE_TYPES.COAL, RESOURCE_TYPES.URANIUM)
+
+# unit and city ids are sent as "u_<n>" / "c_<n>", the arrays only keep <n>
+UNIT_ID_PREFIX = "u_"
+CITY_ID_PREFIX = "c_"
+
+ParsedUpdates = namedtuple("ParsedUpdates",
+                           ["research", "resources", "units", "cities", "citytiles", "roads"])
+
+# identifier -> (field name in ParsedUpdates, dtype, text substitutions that
+# make every field of the message numeric)
+_GROUPS = {
+    INPUT_CONSTANTS.RESEARCH_POINTS: ("research", RESEARCH_DTYPE, ()),
+    INPUT_CONSTANTS.RESOURCES: ("resources", RESOURCE_DTYPE,
+                                tuple((r_type, str(i)) for i, r_type in enumerate(RESOURCE_CODES))),
+    INPUT_CONSTANTS.UNITS: ("units", UNIT_DTYPE, ((UNIT_ID_PREFIX, ""),)),
+    INPUT_CONSTANTS.CITY: ("cities", CITY_DTYPE, ((CITY_ID_PREFIX, ""),)),
+    INPUT_CONSTANTS.CITY_TILES: ("citytiles", CITYTILE_DTYPE, ((CITY_ID_PREFIX, ""),)),
+    INPUT_CONSTANTS.ROADS: ("roads", ROAD_DTYPE, ()),
+}
+
+# matches the fields of every message of one identifier in the joined text
+# (text starts with a newline, so every message is preceded by one)
+_GROUP_PATTERNS = {identifier: re.compile("\n%s ([^\n]*)" % re.escape(identifier))
+                   for identifier in _GROUPS}
+
+
+def parse_updates(messages) -> ParsedUpdates:
+    """
+    Parse a turn's `updates` message list into typed NumPy record arrays,
+    one per message identifier. Messages are grouped by identifier with one
+    regex scan per identifier, and each group is then converted to numbers in
+    a single np.fromstring pass. Raises ValueError when the messages of an
+    identifier do not hold the numeric fields of its dtype.
+    """
+    messages = list(messages)
+    if INPUT_CONSTANTS.DONE in messages:
+        messages = messages[:messages.index(INPUT_CONSTANTS.DONE)]
+    text = "\n" + "\n".join(messages)
+
+    parsed = {}
+    for identifier, (name, dtype, substitutions) in _GROUPS.items():
+        lines = _GROUP_PATTERNS[identifier].findall(text)
+        out = np.empty(len(lines), dtype=dtype)
+        parsed[name] = out
+        if not lines:
+            continue
+        fields = " ".join(lines)
+        for old, new in substitutions:
+            fields = fields.replace(old, new)
+        try:
+            values = np.fromstring(fields, dtype=np.float64, sep=" ")
+        except ValueError:
+            values = None
+        if values is None or values.size != len(lines) * len(dtype.names):
+            bad = next((line for line in lines if len(line.split(" ")) != len(dtype.names)), lines[0])
+            raise ValueError(f"Malformed '{identifier}' message '{identifier} {bad}', "
+                             f"expected {len(dtype.names)} numeric fields")
+        values = values.reshape(len(lines), -1)
+        for i, field in enumerate(dtype.names):
+            # truncates float amounts like int(float(amt)) does
+            out[field] = values[:, i]
+    return ParsedUpdates(**parsed)
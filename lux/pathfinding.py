@@ -0,0 +1,173 @@
+import numpy as np
+
+from .action_masks import MOVE_DX, MOVE_DY
+from .city_features import nights_left
+from .constants import Constants
+from .parser import RESOURCE_CODES
+
+DIRECTIONS = Constants.DIRECTIONS
+MOVES = (DIRECTIONS.NORTH, DIRECTIONS.EAST, DIRECTIONS.SOUTH, DIRECTIONS.WEST, DIRECTIONS.CENTER)
+# distance of the tiles that cannot reach any source
+UNREACHABLE = np.iinfo(np.int32).max
+# sources of each field: tiles with the resource, citytiles of either side,
+# and own citytiles whose city runs out of fuel before the next night is over
+FIELDS = RESOURCE_CODES + ("own_citytile", "opponent_citytile", "city_at_risk")
+
+
+def distance_fields(sources, passable):
+    """
+    Multi-source BFS, all fields at once. sources is (F, H, W) bool and
+    passable (H, W) bool; returns the (F, H, W) int32 number of moves from
+    each tile to the nearest source of each field, UNREACHABLE if there is
+    no path. Sources need not be passable, paths only go through passable
+    tiles.
+    """
+    dist = np.full(sources.shape, UNREACHABLE, dtype=np.int32)
+    dist[sources] = 0
+    reached = sources.copy()
+    frontier = sources.copy()
+    grown = np.empty_like(frontier)
+    step = 0
+    while frontier.any():
+        step += 1
+        grown[:] = False
+        grown[:, 1:] |= frontier[:, :-1]
+        grown[:, :-1] |= frontier[:, 1:]
+        grown[:, :, 1:] |= frontier[:, :, :-1]
+        grown[:, :, :-1] |= frontier[:, :, 1:]
+        grown &= passable
+        grown &= ~reached
+        reached |= grown
+        dist[grown] = step
+        frontier, grown = grown, frontier
+    return dist
+
+
+class PathFinder:
+    """
+    Obstacle-aware distance fields (see FIELDS) for the units of a team.
+    Opponent citytiles are obstacles, and with avoid_opponent_units the
+    tiles of opponent units too.
+
+    Fields are computed on first use for a state of the game (Game.version)
+    and kept until it changes. For a new state, e.g. the next turn or a
+    restore(), a field is only computed again if its sources or the
+    obstacles changed; the ones that did are computed in one batched BFS.
+    """
+    def __init__(self, team, avoid_opponent_units=False):
+        self.team = team
+        self.avoid_opponent_units = avoid_opponent_units
+        self.computed = 0   # fields computed, for cache statistics
+        self._key = None    # Game.version the inputs were built for
+        self._sources = {}  # {field: (H, W) sources of this turn}
+        self._passable = None
+        self._fields = {}   # {field: (sources, passable, dist)}
+        self._resource_type = None
+        self._resource_key = None
+
+    def _inputs(self, game):
+        """sets the source planes of every field and the passable tiles for this turn"""
+        key = game.version
+        if key == self._key:
+            return
+        self._key = key
+        shape = (game.map_height, game.map_width)
+        resource_type = self._resource_plane(game)
+        sources = {name: resource_type == code for code, name in enumerate(RESOURCE_CODES)}
+
+        values = []
+        at_risk = int(nights_left(game.turn))
+        for player in game.players:
+            for city in player.cities.values():
+                risk = player.team == self.team and city.fuel < city.light_upkeep * at_risk
+                for citytile in city.citytiles:
+                    values += (citytile.pos.x, citytile.pos.y, player.team == self.team, risk)
+        x, y, own, risk = np.array(values, dtype=np.intp).reshape(-1, 4).T
+        own, risk = own.astype(bool), risk.astype(bool)
+        for name, mask in (("own_citytile", own), ("opponent_citytile", ~own), ("city_at_risk", risk)):
+            plane = np.zeros(shape, dtype=bool)
+            plane[y[mask], x[mask]] = True
+            sources[name] = plane
+
+        passable = ~sources["opponent_citytile"]
+        if self.avoid_opponent_units:
+            units = game.players[1 - self.team].units
+            ux = np.fromiter((unit.pos.x for unit in units), dtype=np.intp, count=len(units))
+            uy = np.fromiter((unit.pos.y for unit in units), dtype=np.intp, count=len(units))
+            passable[uy, ux] = False
+        self._sources = sources
+        self._passable = passable
+
+    def _resource_plane(self, game):
+        """resource codes by tile, -1 where there is none"""
+        game_map = game.map
+        if hasattr(game_map, "resource_type"):
+            return np.where(game_map.resource_amount > 0, game_map.resource_type, -1)
+        delta = game.delta
+        if delta is not None and delta.since is not None and delta.since == self._resource_key:
+            # resources only ever disappear
+            plane = self._resource_type
+            for pos in delta.resources_depleted:
+                plane[pos.y, pos.x] = -1
+        else:
+            plane = np.full((game.map_height, game.map_width), -1, dtype=np.int8)
+            codes = {name: code for code, name in enumerate(RESOURCE_CODES)}
+            for row in game_map.map:
+                for cell in row:
+                    if cell.has_resource():
+                        plane[cell.pos.y, cell.pos.x] = codes[cell.resource.type]
+        self._resource_type = plane
+        self._resource_key = game.version
+        return plane
+
+    def fields(self, game, names=FIELDS):
+        """{name: (H, W) int32 moves to the nearest source} for the given fields"""
+        self._inputs(game)
+        passable = self._passable
+        stale = []
+        for name in names:
+            cached = self._fields.get(name)
+            if (cached is None or cached[0].shape != passable.shape
+                    or not np.array_equal(cached[0], self._sources[name])
+                    or not np.array_equal(cached[1], passable)):
+                stale.append(name)
+        if stale:
+            sources = np.stack([self._sources[name] for name in stale])
+            for name, dist in zip(stale, distance_fields(sources, passable)):
+                self._fields[name] = (self._sources[name], passable, dist)
+            self.computed += len(stale)
+        return {name: self._fields[name][2] for name in names}
+
+    def field(self, game, name):
+        return self.fields(game, (name,))[name]
+
+    def distances(self, game, name, units=None):
+        """moves from each unit (default: all units of the team) to the nearest source"""
+        dist = self.field(game, name)
+        x, y = self._positions(game, units)
+        return dist[y, x]
+
+    def directions(self, game, name, units=None):
+        """
+        next step towards the nearest source for each unit (default: all
+        units of the team), CENTER where the unit is on a source or no
+        step gets closer. Other units are not taken into account.
+        """
+        dist = self.field(game, name)
+        x, y = self._positions(game, units)
+        height, width = dist.shape
+        padded = np.full((height + 2, width + 2), UNREACHABLE, dtype=np.int32)
+        padded[1:-1, 1:-1] = np.where(self._passable, dist, UNREACHABLE)
+        neighbours = padded[y[:, None] + 1 + MOVE_DY, x[:, None] + 1 + MOVE_DX]
+        best = neighbours.argmin(axis=1)
+        closer = neighbours[np.arange(len(best)), best] < dist[y, x]
+        moves = np.where(closer, best, len(MOVES) - 1)
+        return [MOVES[move] for move in moves.tolist()]
+
+    def _positions(self, game, units):
+        """(x, y) index arrays of the units, default all units of the team"""
+        if units is None:
+            units = game.players[self.team].units
+        values = [value for unit in units for value in (unit.pos.x, unit.pos.y)]
+        x, y = np.array(values, dtype=np.intp).reshape(-1, 2).T
+        return x, y
@@ -0,0 +1,201 @@
+"""
+Batched translation of integer actions into Lux command strings.
+
+Actions index lux.action_masks.UNIT_ACTIONS and CITYTILE_ACTIONS, one per
+row of a lux.action_masks.ActionMasks (-1 for no action). The command
+strings are built once per unit id / citytile position and action and
+reused on every turn, instead of formatting a new string per actor per
+turn with Unit.move() and friends.
+
+Before the commands are built, moves that would be wasted are dropped:
+illegal actions (per the masks), moves into the same non-citytile tile as
+an earlier unit of the team, and moves into a non-citytile tile where a unit
+stays put (own units not moving, opponent units on cooldown), repeated
+until no such move is left. Unit builds beyond the citytile count are
+dropped as well.
+
+    encoder = ActionEncoder()
+    masks = game_state.action_masks()
+    commands = encoder.encode(game_state, masks, unit_actions, citytile_actions)
+"""
+import numpy as np
+
+from lux.action_masks import CITYTILE_ACTIONS, MOVE_DX, MOVE_DY, UNIT_ACTIONS
+from lux.constants import Constants
+from lux.game_constants import PARAMETERS
+
+NO_ACTION = -1
+TRANSFER = UNIT_ACTIONS.index("t")
+CENTER = UNIT_ACTIONS.index(Constants.DIRECTIONS.CENTER)
+RESOURCE_CAPACITY = PARAMETERS.RESOURCE_CAPACITY
+
+
+class ActionEncoder:
+    """
+    Keeps the command strings of every unit id and citytile position seen.
+    Ids repeat from one episode to the next, so the caches stay small.
+    """
+    def __init__(self):
+        self._unit_commands = {}      # {unit id: command per UNIT_ACTIONS}
+        self._citytile_commands = {}  # {(x, y): command per CITYTILE_ACTIONS}
+        self.cancelled = 0            # moves dropped by the last encode()
+
+    def unit_commands(self, unit_id):
+        commands = self._unit_commands.get(unit_id)
+        if commands is None:
+            commands = tuple(
+                None if action in (Constants.DIRECTIONS.CENTER, "t")
+                else f"m {unit_id} {action}" if i < CENTER
+                else f"{action} {unit_id}"
+                for i, action in enumerate(UNIT_ACTIONS))
+            self._unit_commands[unit_id] = commands
+        return commands
+
+    def citytile_commands(self, x, y):
+        commands = self._citytile_commands.get((x, y))
+        if commands is None:
+            commands = tuple(f"{action} {x} {y}" for action in CITYTILE_ACTIONS)
+            self._citytile_commands[(x, y)] = commands
+        return commands
+
+    def encode(self, game, masks, unit_actions=None, citytile_actions=None, team=None):
+        """
+        :param game: (lux.game.Game) state the masks were computed on
+        :param masks: (lux.action_masks.ActionMasks) of the acting team
+        :param unit_actions: (Array) an action index per row of masks.units
+        :param citytile_actions: (Array) an action index per row of masks.citytiles
+        :param team: (Int) acting team, by default game.id
+        :return: (List) Lux commands
+        """
+        team = game.id if team is None else team
+        self.cancelled = 0
+        commands = []
+        if unit_actions is not None and len(masks.unit_ids):
+            actions = self._legal(unit_actions, masks.units)
+            actions = self._resolve_moves(game, team, masks, actions)
+            units = game.players[team].units
+            cache = self._unit_commands
+            for i, (unit_id, action) in enumerate(zip(masks.unit_ids, actions.tolist())):
+                if action == NO_ACTION or action == CENTER:
+                    continue
+                if action == TRANSFER:
+                    command = self._transfer(units[i], units)
+                    if command is not None:
+                        commands.append(command)
+                else:
+                    unit_commands = cache.get(unit_id) or self.unit_commands(unit_id)
+                    commands.append(unit_commands[action])
+        if citytile_actions is not None and len(masks.citytiles):
+            actions = self._legal(citytile_actions, masks.citytiles)
+            # the engine turns down unit builds once units reach the citytile count
+            builds = actions > 0
+            free = len(masks.citytiles) - len(masks.unit_ids)
+            actions[builds & (np.cumsum(builds) > free)] = NO_ACTION
+            cache = self._citytile_commands
+            for position, action in zip(map(tuple, masks.citytile_positions.tolist()), actions.tolist()):
+                if action != NO_ACTION:
+                    citytile_commands = cache.get(position) or self.citytile_commands(*position)
+                    commands.append(citytile_commands[action])
+        return commands
+
+    @staticmethod
+    def _legal(actions, mask):
+        """actions, with NO_ACTION where the action is not allowed"""
+        actions = np.asarray(actions, dtype=np.intp)
+        given = actions != NO_ACTION
+        legal = given.copy()
+        legal[given] = mask[np.flatnonzero(given), actions[given]]
+        return np.where(legal, actions, NO_ACTION)
+
+    def _resolve_moves(self, game, team, masks, actions):
+        """actions, with NO_ACTION for the moves that would collide"""
+        width, height = game.map_width, game.map_height
+        size = width * height
+        wanted = (actions >= 0) & (actions < CENTER)
+        if not wanted.any():
+            self.cancelled = 0
+            return actions
+        x, y = masks.unit_positions.T
+        origin = y * width + x
+        direction = np.where(wanted, actions, 0)
+        target = np.where(wanted, origin + MOVE_DY[direction] * width + MOVE_DX[direction], origin)
+        # the masks leave out moves onto opponent citytiles, so own ones are enough
+        citytile = np.zeros(size, dtype=bool)
+        cx, cy = masks.citytile_positions.T
+        citytile[cy * width + cx] = True
+        # units staying put: own units not moving, opponent units on cooldown
+        static = [unit.pos.y * width + unit.pos.x for unit in game.players[1 - team].units if unit.cooldown >= 1]
+        occupied = np.bincount(np.array(static, dtype=np.intp), minlength=size)
+        np.add.at(occupied, origin[~wanted], 1)
+
+        moving = wanted.copy()
+        first = np.empty(size, dtype=np.intp)
+        while True:
+            movers = np.flatnonzero(moving)
+            to = target[movers]
+            # the first unit moving into a tile keeps its move
+            first[to[::-1]] = movers[::-1]
+            collide = ~citytile[to] & ((occupied[to] > 0) | (first[to] != movers))
+            if not collide.any():
+                break
+            stopped = movers[collide]
+            moving[stopped] = False
+            np.add.at(occupied, origin[stopped], 1)
+        cancelled = wanted & ~moving
+        self.cancelled = int(cancelled.sum())
+        return np.where(cancelled, NO_ACTION, actions)
+
+    @staticmethod
+    def _transfer(unit, units):
+        """All of unit's most plentiful resource to the neighbour with the most space"""
+        best, space = None, 0
+        for other in units:
+            if other is unit or other.pos.distance_to(unit.pos) > 1:
+                continue
+            capacity = RESOURCE_CAPACITY["WORKER" if other.is_worker() else "CART"]
+            other_space = capacity - other.cargo.wood - other.cargo.coal - other.cargo.uranium
+            if other_space > space:
+                best, space = other, other_space
+        if best is None:
+            return None
+        resource, amount = max((("wood", unit.cargo.wood), ("coal", unit.cargo.coal),
+                                ("uranium", unit.cargo.uranium)), key=lambda item: item[1])
+        return unit.transfer(best.id, resource, min(amount, space))
+
+
+# command name -> UNIT_ACTIONS index, moves are looked up by direction
+_UNIT_COMMANDS = {"bcity": UNIT_ACTIONS.index("bcity"), "p": UNIT_ACTIONS.index("p"), "t": TRANSFER}
+_CITYTILE_COMMANDS = {action: i for i, action in enumerate(CITYTILE_ACTIONS)}
+
+
+def decode_commands(commands, unit_ids, citytile_positions):
+    """
+    The inverse of ActionEncoder.encode, e.g. to learn from the commands of
+    recorded games. Commands of unknown actors, annotations and malformed
+    commands are ignored.
+
+    :param commands: (List) Lux commands of one team and turn
+    :param unit_ids: (List) unit id of each row of the unit actions
+    :param citytile_positions: (Array) (N, 2) x, y of each row of the citytile actions
+    :return: (Array, Array) unit and citytile action indices, NO_ACTION where
+             the actor got no command
+    """
+    unit_rows = {unit_id: row for row, unit_id in enumerate(unit_ids)}
+    citytile_rows = {(x, y): row for row, (x, y) in enumerate(np.asarray(citytile_positions).tolist())}
+    unit_actions = np.full(len(unit_rows), NO_ACTION, dtype=np.int32)
+    citytile_actions = np.full(len(citytile_rows), NO_ACTION, dtype=np.int32)
+    for command in commands:
+        strs = command.split(" ")
+        name = strs[0]
+        if name == "m" and len(strs) == 3 and strs[1] in unit_rows and strs[2] in UNIT_ACTIONS[:CENTER + 1]:
+            unit_actions[unit_rows[strs[1]]] = UNIT_ACTIONS.index(strs[2])
+        elif name in _UNIT_COMMANDS and len(strs) >= 2 and strs[1] in unit_rows:
+            unit_actions[unit_rows[strs[1]]] = _UNIT_COMMANDS[name]
+        elif name in _CITYTILE_COMMANDS and len(strs) == 3:
+            try:
+                row = citytile_rows.get((int(strs[1]), int(strs[2])))
+            except ValueError:
+                continue
+            if row is not None:
+                citytile_actions[row] = _CITYTILE_COMMANDS[name]
+    return unit_actions, citytile_actions
@@ -0,0 +1,220 @@
+"""
+Persistent registry of the actors (units and citytiles) of a game.
+
+Each actor keeps a slot from the turn it appears until it dies, and its
+static data (team, kind) and per-turn data (position, cooldown, cargo) live
+in arrays indexed by slot. This gives:
+
+    registry.get(actor_id)        actor object, O(1)
+    registry.slot(actor_id)       its slot, O(1)
+    registry.at(x, y)             actors on a tile, O(1) after the first call of a turn
+    registry.indices(teams, kinds)  slots in a stable order, for batched
+                                  feature extraction, e.g. registry.x[idx]
+    registry.units(teams), registry.citytiles(teams)
+                                  actor lists without a numpy pass
+    registry.spawned, registry.died   ids that appeared/disappeared this turn
+
+With an incremental Game (see lux.game.Game) the registry follows the
+spawn/death events in game.delta; otherwise it diffs the actor ids.
+"""
+import numpy as np
+
+from lux.constants import Constants
+
+WORKER = Constants.UNIT_TYPES.WORKER
+CART = Constants.UNIT_TYPES.CART
+CITYTILE = 2
+UNIT_KINDS = (WORKER, CART)
+NO_SLOT = -1
+
+
+def _member(array, values):
+    """np.isin for a few values, without its setup cost"""
+    mask = np.zeros(array.shape, dtype=bool)
+    for value in values:
+        mask |= array == value
+    return mask
+
+
+class ActorRegistry:
+    """
+    :param capacity: (Int) initial number of slots, doubled when full
+    """
+    def __init__(self, capacity=64):
+        self.turn = -1
+        self.spawned = []
+        self.died = []
+        self._slots = {}     # {actor id: slot}
+        self._objects = []   # actor object per slot, None if free
+        # {(team, is citytile): {actor id: actor}} in order of appearance
+        self._groups = {(team, citytile): {} for team in (0, 1) for citytile in (False, True)}
+        self._free = []
+        self._allocate(capacity)
+        self._synced = True
+        self._positions = None
+
+    def _allocate(self, capacity):
+        old = len(self._objects)
+        self._objects.extend([None] * (capacity - old))
+        self._free.extend(range(capacity - 1, old - 1, -1))
+        arrays = {"alive": (bool, False), "team": (np.int8, -1), "kind": (np.int8, -1),
+                  "spawn_turn": (np.int32, -1), "_x": (np.int16, 0), "_y": (np.int16, 0),
+                  "_cooldown": (np.float32, 0)}
+        for name, (dtype, fill) in arrays.items():
+            array = np.full(capacity, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        cargo = np.zeros((capacity, 3), dtype=np.int32)
+        if old:
+            cargo[:old] = self._cargo
+        self._cargo = cargo
+
+    @property
+    def capacity(self):
+        return len(self._objects)
+
+    def update(self, game):
+        """Track the actors of game after its _update for the turn"""
+        self.turn = game.turn
+        self._synced = False
+        self._positions = None
+        delta = game.delta
+        if delta is not None:
+            self.died = [self._remove(actor.id) for actor in delta.units_died + delta.citytiles_lost]
+            self.spawned = [self._add(actor) for actor in delta.units_spawned + delta.citytiles_built]
+            return
+
+        current = {unit.id for player in game.players for unit in player.units}
+        current.update(citytile.id for player in game.players
+                       for city in player.cities.values() for citytile in city.citytiles)
+        self.died = [self._remove(actor_id) for actor_id in self._slots.keys() - current]
+        # objects are rebuilt by every non-incremental update
+        self.spawned = []
+        slots, objects = self._slots, self._objects
+        for player in game.players:
+            actors = [(player.units, self._groups[player.team, False]),
+                      ([citytile for city in player.cities.values() for citytile in city.citytiles],
+                       self._groups[player.team, True])]
+            for group_actors, group in actors:
+                for actor in group_actors:
+                    slot = slots.get(actor.id)
+                    if slot is None:
+                        self.spawned.append(self._add(actor))
+                    else:
+                        objects[slot] = group[actor.id] = actor
+
+    def _add(self, actor):
+        if not self._free:
+            self._allocate(2 * self.capacity)
+        slot = self._free.pop()
+        self._slots[actor.id] = slot
+        self._objects[slot] = actor
+        self.alive[slot] = True
+        self.team[slot] = actor.team
+        is_citytile = actor.class_name == "citytile"
+        self.kind[slot] = CITYTILE if is_citytile else actor.type
+        self.spawn_turn[slot] = self.turn
+        self._groups[actor.team, is_citytile][actor.id] = actor
+        return actor.id
+
+    def _remove(self, actor_id):
+        slot = self._slots.pop(actor_id)
+        actor = self._objects[slot]
+        del self._groups[actor.team, actor.class_name == "citytile"][actor_id]
+        self._objects[slot] = None
+        self.alive[slot] = False
+        self.team[slot] = self.kind[slot] = -1
+        self._free.append(slot)
+        return actor_id
+
+    def _sync(self):
+        """Copy positions, cooldowns and cargo from the actor objects"""
+        if self._synced:
+            return
+        values = []
+        for slot, actor in enumerate(self._objects):
+            if actor is None:
+                continue
+            cargo = getattr(actor, "cargo", None)
+            if cargo is None:
+                values += (slot, actor.pos.x, actor.pos.y, actor.cooldown, 0, 0, 0)
+            else:
+                values += (slot, actor.pos.x, actor.pos.y, actor.cooldown, cargo.wood, cargo.coal, cargo.uranium)
+        if values:
+            columns = np.array(values, dtype=np.float64).reshape(-1, 7).T
+            slots = columns[0].astype(np.intp)
+            self._x[slots] = columns[1]
+            self._y[slots] = columns[2]
+            self._cooldown[slots] = columns[3]
+            self._cargo[slots] = columns[4:].T
+        self._synced = True
+
+    @property
+    def x(self):
+        self._sync()
+        return self._x
+
+    @property
+    def y(self):
+        self._sync()
+        return self._y
+
+    @property
+    def cooldown(self):
+        self._sync()
+        return self._cooldown
+
+    @property
+    def cargo(self):
+        """(capacity, 3) wood, coal, uranium"""
+        self._sync()
+        return self._cargo
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, actor_id):
+        return actor_id in self._slots
+
+    def get(self, actor_id):
+        slot = self._slots.get(actor_id)
+        return None if slot is None else self._objects[slot]
+
+    def slot(self, actor_id):
+        return self._slots.get(actor_id, NO_SLOT)
+
+    def at(self, x, y):
+        """Actors on tile (x, y): the citytile, if any, and units"""
+        if self._positions is None:
+            positions = {}
+            for actor in self._objects:
+                if actor is not None:
+                    positions.setdefault((actor.pos.x, actor.pos.y), []).append(actor)
+            self._positions = positions
+        return self._positions.get((x, y), [])
+
+    def indices(self, teams=None, kinds=None):
+        """Slots of the live actors of the given teams and kinds, ascending"""
+        mask = self.alive
+        if teams is not None:
+            mask = mask & _member(self.team, teams)
+        if kinds is not None:
+            mask = mask & _member(self.kind, kinds)
+        return np.flatnonzero(mask)
+
+    def actors(self, teams=None, kinds=None):
+        """Actor objects in indices(teams, kinds) order"""
+        objects = self._objects
+        return [objects[slot] for slot in self.indices(teams, kinds).tolist()]
+
+    def ids(self, teams=None, kinds=None):
+        return [actor.id for actor in self.actors(teams, kinds)]
+
+    def units(self, teams=(0, 1)):
+        """Units of the given teams, each team in order of appearance"""
+        return [unit for team in teams for unit in self._groups[team, False].values()]
+
+    def citytiles(self, teams=(0, 1)):
+        """Citytiles of the given teams, each team in order of appearance"""
+        return [citytile for team in teams for citytile in self._groups[team, True].values()]
@@ -0,0 +1,64 @@
+"""
+RLlib callbacks of multilux, in their own module because they import
+ray.rllib.agents, which the env-side modules do not need.
+
+    config["callbacks"] = ProfilingCallbacks   # see multilux.profiling
+    config["callbacks"] = SelfPlayCallbacks    # see multilux.policy_pool
+"""
+from ray.rllib.agents.callbacks import DefaultCallbacks
+
+from multilux.profiling import record_episode
+
+
+class ProfilingCallbacks(DefaultCallbacks):
+    """
+    RLlib callbacks that record the PhaseTimer stats of each finished
+    episode of a LuxEnv (or of the games of a LuxVectorEnv) created with
+    profile=True. Subclass it to add your own callbacks.
+    """
+    def on_episode_end(self, *, worker, base_env, policies, episode, env_index=None, **kwargs):
+        envs = base_env.get_unwrapped()
+        if not envs:
+            return
+        env = envs[env_index or 0]
+        timer = getattr(env, "profiler", None)
+        if timer is None or not timer.enabled:
+            return
+        record_episode(episode, timer.pop_episode())
+
+
+class SelfPlayCallbacks(DefaultCallbacks):
+    """
+    RLlib callbacks that snapshot the trained policies into the PolicyPool
+    of every game on every worker, every `refresh_every` iterations.
+
+    snapshot_policies maps each trained policy to the policy that plays its
+    snapshots. The latter must be in the multiagent config but not in
+    policies_to_train, e.g.
+
+        "policies": {"default_policy": spec, "opponent": spec},
+        "policies_to_train": ["default_policy"],
+
+    Subclass it to change the class attributes or add your own callbacks.
+    """
+    refresh_every = 10
+    snapshot_policies = {"default_policy": "opponent"}
+
+    def on_train_result(self, *, trainer, result, **kwargs):
+        iteration = result["training_iteration"]
+        if iteration % self.refresh_every:
+            return
+        weights = {frozen: trainer.get_policy(trained).get_weights()
+                   for trained, frozen in self.snapshot_policies.items()}
+
+        def refresh(worker):
+            def add(env):
+                pool = getattr(env, "opponent_pool", None)
+                if pool is None:
+                    return
+                if not pool.policies:
+                    pool.policies = {policy_id: worker.get_policy(policy_id) for policy_id in weights}
+                pool.add(iteration, weights)
+            worker.foreach_env(add)
+
+        trainer.workers.foreach_worker(refresh)
@@ -0,0 +1,137 @@
+"""
+Export trained policies as a self-contained Kaggle submission.
+
+The submission does not import ray, gym or a deep learning framework, and
+skips the per-actor dicts of multilux.lux_interface: it parses the game
+with lux.game.Game, builds the SpatialObservation crops of all actors in
+one gather, runs a NumPy forward pass per actor type and encodes the
+actions with an ActionEncoder (see multilux/exported_agent.py).
+
+It expects policies trained on that observation/action spec: the
+flattened (C, 2r+1, 2r+1) SpatialObservation crop of an actor, and
+Discrete actions indexing lux.action_masks.UNIT_ACTIONS (citytiles:
+CITYTILE_ACTIONS), with RLlib's default fully connected model.
+
+    export_agent("submission", trainer.get_policy("units"),
+                 citytile_policy=trainer.get_policy("citytiles"), radius=5)
+
+writes submission/main.py, its model.npz and the lux/ and multilux/
+modules it needs; `tar -czf submission.tar.gz -C submission .` gives the
+file to upload.
+"""
+import os
+import re
+import shutil
+
+import numpy as np
+
+from lux.action_masks import CITYTILE_ACTIONS, UNIT_ACTIONS
+from multilux.exported_agent import ACTIVATIONS
+from multilux.observation import CHANNELS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# multilux modules the exported agent imports, besides the whole lux package
+AGENT_MODULES = ("__init__.py", "action_encoder.py", "observation.py")
+
+# torch: _hidden_layers.0._model.0.weight, ..., _logits._model.0.weight
+_TORCH_LAYER = re.compile(r"^_(?:hidden_layers\.(\d+)|logits)\._model\.0\.(weight|bias)$")
+# tf: <policy scope>/fc_1/kernel, ..., <policy scope>/fc_out/kernel
+_TF_LAYER = re.compile(r"(?:^|/)fc_(\d+|out)/(kernel|bias)(?::\d+)?$")
+
+
+def dense_layers(weights):
+    """
+    (weights (in, out), bias (out,)) of each layer of an RLlib fully
+    connected model, from its policy's get_weights(). The value branch is
+    left out.
+
+    :param weights: (Dict) {name: array} of a torch or tf policy
+    :return: (List) hidden layers in order, then the logits layer
+    """
+    layers = {}
+    for name, value in weights.items():
+        torch_match = _TORCH_LAYER.match(name)
+        tf_match = _TF_LAYER.search(name)
+        value = np.asarray(value)
+        if torch_match:
+            index, kind = torch_match.groups()
+            # torch keeps weights as (out, in)
+            value = value.T if kind == "weight" else value
+        elif tf_match:
+            index, kind = tf_match.groups()
+            index = None if index == "out" else int(index) - 1
+        else:
+            continue
+        order = float("inf") if index is None else int(index)
+        layers.setdefault(order, {})["bias" if kind == "bias" else "weight"] = value
+    if float("inf") not in layers:
+        raise ValueError(f"No logits layer found in weights {sorted(weights)}, "
+                         f"expected RLlib's fully connected model")
+    return [(layers[order]["weight"], layers[order]["bias"]) for order in sorted(layers)]
+
+
+def _network(policy, actions, radius, dtype):
+    """(layers, activation) of a policy or weights dict, checked against the spec"""
+    if isinstance(policy, dict):
+        weights, activation = policy, None
+    else:
+        weights = policy.get_weights()
+        activation = policy.config.get("model", {}).get("fcnet_activation")
+    layers = [(w.astype(dtype), b.astype(dtype)) for w, b in dense_layers(weights)]
+    size = 2 * radius + 1
+    inputs = len(CHANNELS) * size * size
+    if layers[0][0].shape[0] != inputs:
+        raise ValueError(f"Model takes {layers[0][0].shape[0]} inputs, a radius {radius} "
+                         f"SpatialObservation crop has {inputs}")
+    if layers[-1][0].shape[1] != len(actions):
+        raise ValueError(f"Model has {layers[-1][0].shape[1]} logits, expected one per action {actions}")
+    return layers, activation
+
+
+def save_model(path, unit_layers, citytile_layers=None, activation="tanh", radius=5):
+    """
+    Write the model.npz loaded by the exported agent.
+
+    :param unit_layers: (List) (weights (in, out), bias (out,)) per layer
+    :param citytile_layers: (List) same for citytiles, None to leave them idle
+    """
+    if activation not in ACTIVATIONS:
+        raise ValueError(f"Unknown activation {activation!r}, expected one of {list(ACTIVATIONS)}")
+    arrays = {"activation": np.array(activation), "radius": np.array(radius)}
+    for name, layers in (("unit", unit_layers), ("citytile", citytile_layers)):
+        for i, (weights, bias) in enumerate(layers or ()):
+            arrays[f"{name}_w{i}"] = weights
+            arrays[f"{name}_b{i}"] = bias
+        arrays[f"{name}_layers"] = np.array(len(layers or ()))
+    np.savez(path, **arrays)
+
+
+def export_agent(path, unit_policy, citytile_policy=None, radius=5, activation=None, dtype=np.float32):
+    """
+    Write a submission directory.
+
+    :param path: (Str) directory to write, created if needed
+    :param unit_policy: (Policy or Dict) trained RLlib policy of the units,
+                        or its get_weights()
+    :param citytile_policy: (Policy or Dict) same for the citytiles, None to
+                        leave them idle
+    :param radius: (Int) radius of the SpatialObservation the policies were
+                   trained on
+    :param activation: (Str) hidden layer activation, by default the
+                       policy's fcnet_activation, else "tanh"
+    :param dtype: weights and observations dtype, np.float32 or np.float16
+    """
+    unit_layers, unit_activation = _network(unit_policy, UNIT_ACTIONS, radius, dtype)
+    citytile_layers, citytile_activation = None, None
+    if citytile_policy is not None:
+        citytile_layers, citytile_activation = _network(citytile_policy, CITYTILE_ACTIONS, radius, dtype)
+    activation = activation or unit_activation or citytile_activation or "tanh"
+
+    os.makedirs(path, exist_ok=True)
+    save_model(os.path.join(path, "model.npz"), unit_layers, citytile_layers, activation, radius)
+    shutil.copytree(os.path.join(ROOT, "lux"), os.path.join(path, "lux"), dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    os.makedirs(os.path.join(path, "multilux"), exist_ok=True)
+    for module in AGENT_MODULES:
+        shutil.copy(os.path.join(ROOT, "multilux", module), os.path.join(path, "multilux", module))
+    shutil.copy(os.path.join(ROOT, "multilux", "exported_agent.py"), os.path.join(path, "main.py"))
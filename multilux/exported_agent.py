@@ -0,0 +1,122 @@
+"""
+Kaggle submission agent written out by multilux.export.export_agent as
+main.py, next to the model.npz it loads and copies of lux/ and the multilux
+modules it needs. It imports NumPy and nothing else outside the bundle.
+
+Each turn it updates a lux.game.Game on an ArrayGameMap, renders the
+SpatialObservation crops of all units and citytiles, runs the dense
+networks once per actor type, takes the best legal action under the action
+masks and turns the actions into commands with an ActionEncoder.
+"""
+import os
+import sys
+
+KAGGLE_AGENT_DIR = "/kaggle_simulations/agent"
+
+
+def _agent_dir():
+    """directory of main.py, which kaggle runs through exec() without __file__"""
+    if "__file__" in globals():
+        return os.path.dirname(os.path.abspath(__file__))
+    # kaggle compiles the source with the path it was given as the filename
+    filename = sys._getframe().f_code.co_filename
+    if os.path.isfile(filename):
+        return os.path.dirname(os.path.abspath(filename))
+    return KAGGLE_AGENT_DIR if os.path.isdir(KAGGLE_AGENT_DIR) else os.getcwd()
+
+
+AGENT_DIR = _agent_dir()
+# as main.py the bundled packages sit next to it, as multilux.exported_agent
+# they are already importable
+if not __name__.startswith("multilux.") and AGENT_DIR not in sys.path:
+    sys.path.insert(0, AGENT_DIR)
+
+import numpy as np
+
+from lux.array_map import ArrayGameMap
+from lux.game import Game
+from multilux.action_encoder import ActionEncoder
+from multilux.observation import SpatialObservation
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0),
+    "linear": lambda x: x,
+    "elu": lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+    "swish": lambda x: x / (1 + np.exp(-x)),
+}
+
+
+class DenseNetwork:
+    """
+    Hidden layers with the same activation, then linear logits.
+
+    :param layers: (List) (weights (in, out), bias (out,)) per layer
+    :param activation: (Str) one of ACTIVATIONS
+    """
+    def __init__(self, layers, activation="tanh"):
+        self.layers = layers
+        self.activation = ACTIVATIONS[activation]
+
+    def __call__(self, x):
+        *hidden, (weights, bias) = self.layers
+        for w, b in hidden:
+            x = self.activation(x @ w + b)
+        return x @ weights + bias
+
+    @classmethod
+    def load(cls, model, name):
+        """The network `name` of a loaded model.npz, None if it has none"""
+        n_layers = int(model.get(f"{name}_layers", 0))
+        if not n_layers:
+            return None
+        layers = [(model[f"{name}_w{i}"], model[f"{name}_b{i}"]) for i in range(n_layers)]
+        return cls(layers, str(model["activation"]))
+
+
+class ExportedAgent:
+    """
+    :param model: (Mapping) arrays as written by multilux.export.save_model
+    """
+    def __init__(self, model):
+        self.units = DenseNetwork.load(model, "unit")
+        self.citytiles = DenseNetwork.load(model, "citytile")
+        self.spatial = SpatialObservation(radius=int(model["radius"]), dtype=model["unit_w0"].dtype)
+        self.encoder = ActionEncoder()
+        self.game_state = None
+
+    def __call__(self, observation, configuration):
+        if observation["step"] == 0:
+            self.game_state = Game(map_class=ArrayGameMap)
+            self.game_state._initialize(observation["updates"])
+            self.game_state._update(observation["updates"][2:])
+            self.game_state.id = observation["player"]
+        else:
+            self.game_state._update(observation["updates"])
+        return self.act(self.game_state)
+
+    def act(self, game):
+        masks = game.action_masks()
+        self.spatial.render(game)
+        unit_actions = self._choose(self.units, masks.unit_positions, masks.units)
+        citytile_actions = self._choose(self.citytiles, masks.citytile_positions, masks.citytiles)
+        return self.encoder.encode(game, masks, unit_actions, citytile_actions)
+
+    def _choose(self, network, positions, mask):
+        """best legal action per actor, -1 for no action"""
+        if network is None or not len(positions):
+            return None
+        crops = self.spatial.gather_positions(positions[:, 0], positions[:, 1])
+        logits = network(crops.reshape(len(crops), -1))
+        logits = np.where(mask, logits, -np.inf)
+        return np.where(mask.any(axis=1), logits.argmax(axis=1), -1)
+
+
+_agent = None
+
+
+def agent(observation, configuration):
+    global _agent
+    if _agent is None:
+        _agent = ExportedAgent(dict(np.load(os.path.join(AGENT_DIR, "model.npz"))))
+    return _agent(observation, configuration)
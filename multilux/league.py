@@ -0,0 +1,334 @@
+"""
+League evaluation of policy snapshots and scripted agents, to pick
+checkpoints.
+
+Players are scripted agents (a multilux.lux_engine.AGENTS name, or a
+picklable factory returning agent(observation, configuration)) and
+PolicyPool snapshots ({policy_id: weights}). Matchups are scheduled
+round-robin or sampled, and played on the native engine (LuxEngine) over a
+process pool. The engine builds its own maps, not kaggle's for the same
+seed:
+
+    league = League(agents={"simple": "simple_agent", "idle": "idle"},
+                    snapshots=pool.snapshots, policy_factory=make_policies,
+                    interface=MyInterface, processes=8)
+    league.play(round_robin(league.players, games_per_pair=10))
+    for row in league.standings():
+        print(row)
+
+Each process plays its games `concurrent_games` at a time, in lockstep:
+before every step, the actions of all snapshot players of all its games
+are inferred in one forward pass per (snapshot, policy), through
+PolicyPool.act as in LuxVectorEnv. Results come back in chunks of
+`games_per_task` games, as they finish, and update the Elo and TrueSkill
+ratings right away, so that standings() is current during a long pass.
+"""
+import logging
+import math
+import multiprocessing
+import random
+import time
+from collections import deque, namedtuple
+from statistics import NormalDist
+
+logger = logging.getLogger(__name__)
+
+from multilux.lux_engine import AGENTS, LuxEngine
+from multilux.policy_pool import PolicyPool, PoolOpponent
+
+GameResult = namedtuple("GameResult", ["players", "seed", "rewards", "turns", "score"])
+GameResult.__doc__ = """
+players  (player 0, player 1) names
+seed     map seed
+rewards  final LuxEngine.rewards(), city tiles * 10000 + units per player
+turns    turns played
+score    1 if player 0 won, 0.5 for a draw, 0 if player 1 won
+"""
+
+
+def round_robin(players, games_per_pair=2):
+    """
+    Every pair of players, `games_per_pair` times, each player of the pair
+    playing player 0 in half of the games.
+
+    :return: (List) (player 0, player 1) matchups
+    """
+    players = list(players)
+    matchups = []
+    for i, a in enumerate(players):
+        for b in players[i + 1:]:
+            matchups += [(a, b) if game % 2 == 0 else (b, a) for game in range(games_per_pair)]
+    return matchups
+
+
+def sampled_matchups(players, games, rng=None):
+    """
+    `games` matchups between two different players drawn uniformly, in a
+    random order of sides.
+
+    :param rng: (random.Random)
+    :return: (List) (player 0, player 1) matchups
+    """
+    rng = rng or random.Random()
+    return [tuple(rng.sample(list(players), 2)) for _ in range(games)]
+
+
+class Elo:
+    """
+    :param k: (Float) rating change of an unexpected result
+    :param initial: (Float) rating of new players
+    """
+    def __init__(self, k=16.0, initial=1500.0):
+        self.k = k
+        self.initial = initial
+        self.ratings = {}
+
+    def __getitem__(self, player):
+        return self.ratings.get(player, self.initial)
+
+    def expected(self, a, b):
+        """Expected score of a against b"""
+        return 1.0 / (1.0 + 10.0 ** ((self[b] - self[a]) / 400.0))
+
+    def update(self, a, b, score):
+        """:param score: (Float) 1 if a won, 0.5 for a draw, 0 if b won"""
+        change = self.k * (score - self.expected(a, b))
+        self.ratings[a] = self[a] + change
+        self.ratings[b] = self[b] - change
+
+
+class TrueSkill:
+    """
+    Two-player TrueSkill with draws (Herbrich et al. 2006), with the usual
+    defaults. A player's rating is (mu, sigma); rank on mu - 3 * sigma.
+
+    :param draw_probability: (Float) draws expected between equal players
+    """
+    def __init__(self, mu=25.0, sigma=25.0 / 3, beta=25.0 / 6, tau=25.0 / 300, draw_probability=0.1):
+        self.mu = mu
+        self.sigma = sigma
+        self.beta = beta
+        self.tau = tau
+        self.draw_margin = math.sqrt(2) * beta * NormalDist().inv_cdf((draw_probability + 1) / 2)
+        self.ratings = {}
+
+    def __getitem__(self, player):
+        return self.ratings.get(player, (self.mu, self.sigma))
+
+    def conservative(self, player):
+        mu, sigma = self[player]
+        return mu - 3 * sigma
+
+    def update(self, a, b, score):
+        """:param score: (Float) 1 if a won, 0.5 for a draw, 0 if b won"""
+        if score < 0.5:
+            a, b = b, a
+        (mu_a, sigma_a), (mu_b, sigma_b) = self[a], self[b]
+        var_a, var_b = sigma_a ** 2 + self.tau ** 2, sigma_b ** 2 + self.tau ** 2
+        c = math.sqrt(2 * self.beta ** 2 + var_a + var_b)
+        t, e = (mu_a - mu_b) / c, self.draw_margin / c
+        normal = NormalDist()
+        if score == 0.5:
+            p = max(normal.cdf(e - t) - normal.cdf(-e - t), 1e-12)
+            v = (normal.pdf(-e - t) - normal.pdf(e - t)) / p
+            w = v ** 2 + ((e - t) * normal.pdf(e - t) + (e + t) * normal.pdf(e + t)) / p
+        else:
+            v = normal.pdf(t - e) / max(normal.cdf(t - e), 1e-12)
+            w = v * (v + t - e)
+        self.ratings[a] = (mu_a + var_a / c * v, math.sqrt(var_a * max(1 - var_a / c ** 2 * w, 1e-6)))
+        self.ratings[b] = (mu_b - var_b / c * v, math.sqrt(var_b * max(1 - var_b / c ** 2 * w, 1e-6)))
+
+
+class _Arena:
+    """Plays chunks of matchups in one process, `concurrent_games` at a time"""
+    def __init__(self, agents, snapshots, policy_factory, policy_mapping_fn, interface, configuration,
+                 concurrent_games):
+        self.agents = agents
+        self.interface = interface
+        self.configuration = configuration
+        self.concurrent_games = concurrent_games
+        self.pool = None
+        if snapshots:
+            self.pool = PolicyPool(policy_factory(), policy_mapping_fn, max_size=len(snapshots))
+            for version, weights in snapshots.items():
+                self.pool.add(version, weights)
+
+    def _agent(self, name):
+        if self.pool is not None and name in self.pool.snapshots:
+            return PoolOpponent(self.pool, self.interface, version=name)
+        agent = self.agents[name]
+        return AGENTS[agent]() if isinstance(agent, str) else agent()
+
+    def play(self, matchups):
+        """:param matchups: (List) (player 0, player 1, seed)"""
+        queue, games, results = deque(matchups), [], []
+        while queue or games:
+            while queue and len(games) < self.concurrent_games:
+                a, b, seed = queue.popleft()
+                engine = LuxEngine(self.configuration)
+                updates = engine.reset(seed)
+                games.append(((a, b), seed, engine, [self._agent(a), self._agent(b)],
+                              [engine.observation(player, updates) for player in (0, 1)]))
+            pool_turns = [(agent, obs) for _, _, _, agents, observations in games
+                          for agent, obs in zip(agents, observations) if isinstance(agent, PoolOpponent)]
+            if pool_turns:
+                self.pool.act(pool_turns)
+            running = []
+            for game in games:
+                players, seed, engine, agents, observations = game
+                updates = engine.step([agent(obs, engine.configuration) for agent, obs in zip(agents, observations)])
+                if engine.is_done():
+                    rewards = engine.rewards()
+                    score = 1.0 if rewards[0] > rewards[1] else 0.0 if rewards[0] < rewards[1] else 0.5
+                    results.append(GameResult(players, seed, rewards, engine.turn, score))
+                else:
+                    observations[:] = [engine.observation(player, updates) for player in (0, 1)]
+                    running.append(game)
+            games = running
+        return results
+
+
+_arena = None
+
+
+def _init_worker(*args):
+    """pool initializer, builds the _Arena of the process"""
+    global _arena
+    _arena = _Arena(*args)
+
+
+def _play_task(matchups):
+    """GameResults of a chunk of matchups played by the process's _Arena"""
+    return _arena.play(matchups)
+
+
+class League:
+    """
+    :param agents: (Dict) {name: agent}, agent being a
+                   multilux.lux_engine.AGENTS name ("simple_agent", "idle")
+                   or a picklable factory returning a new
+                   agent(observation, configuration) for each game
+    :param snapshots: (Dict) {name: {policy_id: weights}}, e.g. the
+                   snapshots of a PolicyPool
+    :param policy_factory: (Callable) picklable, returns the
+                   {policy_id: Policy} that the snapshots are loaded into,
+                   in each process. Needed if there are snapshots.
+    :param policy_mapping_fn: (Callable) picklable, actor id -> policy id,
+                   by default the only policy
+    :param interface: (LuxDefaultInterface) class converting the snapshot
+                   players' observations and actions, LuxDefaultInterface
+                   by default
+    :param configuration: (Dict) LuxEngine configuration, e.g. the map
+                   width and height. Without `width`, the map size is drawn
+                   for each game.
+    :param processes: (Int) pool size, by default the number of CPUs.
+                   0 plays in this process.
+    :param concurrent_games: (Int) games played in lockstep per process
+    :param games_per_task: (Int) games sent to a process at a time, i.e.
+                   the granularity of the rating updates
+    :param seed: (Int) seed of the map seeds
+    :param start_method: (Str) multiprocessing start method, None for the
+                   platform default
+    """
+    def __init__(self, agents=None, snapshots=None, policy_factory=None, policy_mapping_fn=None,
+                 interface=None, configuration=None, processes=None, concurrent_games=8,
+                 games_per_task=16, seed=None, start_method=None):
+        self.agents = dict(agents or {})
+        self.snapshots = dict(snapshots or {})
+        overlap = set(self.agents) & set(self.snapshots)
+        if overlap:
+            raise ValueError(f"Players {sorted(overlap)} are both agents and snapshots")
+        if self.snapshots and policy_factory is None:
+            raise ValueError("policy_factory is needed to play snapshots")
+        self.policy_factory = policy_factory
+        self.policy_mapping_fn = policy_mapping_fn
+        self.interface = interface
+        self.configuration = dict(configuration or {})
+        self.processes = processes
+        self.concurrent_games = concurrent_games
+        self.games_per_task = games_per_task
+        self.start_method = start_method
+        self.elo = Elo()
+        self.trueskill = TrueSkill()
+        self.records = {player: [0, 0, 0] for player in self.players}  # wins, draws, losses
+        self.games = 0
+        self.seconds = 0.0
+        self._rng = random.Random(seed)
+
+    @property
+    def players(self):
+        return list(self.agents) + list(self.snapshots)
+
+    def _arena_args(self):
+        return (self.agents, self.snapshots, self.policy_factory, self.policy_mapping_fn, self.interface,
+                self.configuration, self.concurrent_games)
+
+    def record(self, result):
+        """Update the ratings and records with one game"""
+        a, b = result.players
+        self.elo.update(a, b, result.score)
+        self.trueskill.update(a, b, result.score)
+        outcome = {1.0: 0, 0.5: 1, 0.0: 2}[result.score]
+        self.records[a][outcome] += 1
+        self.records[b][2 - outcome] += 1
+        self.games += 1
+
+    def play(self, matchups, callback=None):
+        """
+        Play matchups and rate their results as they come in.
+
+        :param matchups: (Iterable) (player 0, player 1) names
+        :param callback: (Callable) called with each GameResult, after the
+                         ratings are updated
+        :return: (List) GameResult of all games, in the order they finished
+        """
+        matchups = [(a, b, self._rng.randrange(2 ** 31)) for a, b in matchups]
+        unknown = {player for a, b, _ in matchups for player in (a, b)} - set(self.records)
+        if unknown:
+            raise ValueError(f"Unknown players {sorted(unknown)}")
+        tasks = [matchups[i:i + self.games_per_task] for i in range(0, len(matchups), self.games_per_task)]
+        results = []
+        started = last_log = time.perf_counter()
+        if self.processes == 0:
+            arena = _Arena(*self._arena_args())
+            chunks = map(arena.play, tasks)
+            pool = None
+        else:
+            pool = multiprocessing.get_context(self.start_method).Pool(
+                self.processes, initializer=_init_worker, initargs=self._arena_args())
+            chunks = pool.imap_unordered(_play_task, tasks)
+        try:
+            for chunk in chunks:
+                for result in chunk:
+                    self.record(result)
+                    results.append(result)
+                    if callback is not None:
+                        callback(result)
+                now = time.perf_counter()
+                if now - last_log >= 10.0:
+                    last_log = now
+                    logger.info(f"{len(results)}/{len(matchups)} games, "
+                                f"{len(results) / (now - started):.1f} games/s")
+        finally:
+            if pool is not None:
+                pool.terminate()
+        self.seconds += time.perf_counter() - started
+        return results
+
+    @property
+    def games_per_sec(self):
+        return self.games / self.seconds if self.seconds else 0.0
+
+    def standings(self):
+        """
+        :return: (List) per player, best first on the TrueSkill
+                 mu - 3 * sigma: name, elo, mu, sigma, games, wins, draws,
+                 losses
+        """
+        rows = []
+        for player, (wins, draws, losses) in self.records.items():
+            mu, sigma = self.trueskill[player]
+            rows.append({"player": player, "elo": round(self.elo[player], 1), "mu": round(mu, 3),
+                         "sigma": round(sigma, 3), "games": wins + draws + losses,
+                         "wins": wins, "draws": draws, "losses": losses})
+        return sorted(rows, key=lambda row: row["mu"] - 3 * row["sigma"], reverse=True)
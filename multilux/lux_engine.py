@@ -0,0 +1,805 @@
+"""
+In-process Lux AI Season 1 engine written in Python/NumPy.
+
+Alternative to kaggle_environments.make("lux_ai_2021") for LuxEnv: the map
+(resources, roads, citytiles) lives in NumPy planes, the rules are applied
+to them directly, and observations carry the same `updates` messages as the
+kaggle engine, so lux.game.Game parses them unchanged.
+
+    engine = LuxEngine({"seed": 42})
+    trainer = engine.train((None, "simple_agent"))  # like kaggle's env.train()
+    obs = trainer.reset()
+    obs, reward, done, info = trainer.step(actions)
+
+Use multilux.parity to compare it with the kaggle engine.
+"""
+import math
+import random
+import re
+
+import numpy as np
+
+from lux.constants import Constants
+from lux.game import Game
+from lux.game_constants import PARAMETERS as PARAMS
+from lux.parser import parse_updates, RESOURCE_CODES, UNIT_ID_PREFIX, CITY_ID_PREFIX
+from multilux.state_cache import InitialStateCache
+
+DIRECTIONS = Constants.DIRECTIONS
+UNIT_TYPES = Constants.UNIT_TYPES
+
+WOOD, COAL, URANIUM = range(len(RESOURCE_CODES))
+RESOURCE_KEYS = ("WOOD", "COAL", "URANIUM")
+NO_RESOURCE = -1
+NO_TEAM = -1
+MAP_SIZES = (12, 16, 24, 32)
+
+DIRECTION_DELTAS = {
+    DIRECTIONS.NORTH: (0, -1),
+    DIRECTIONS.EAST: (1, 0),
+    DIRECTIONS.SOUTH: (0, 1),
+    DIRECTIONS.WEST: (-1, 0),
+    DIRECTIONS.CENTER: (0, 0),
+}
+# kaggle's neighbour order (n, e, s, w) decides which city a merge keeps
+NEIGHBOURS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+# a worker collects from the four adjacent tiles and its own
+COLLECT_FROM = NEIGHBOURS + ((0, 0),)
+
+COLLECTION_RATE = [PARAMS.WORKER_COLLECTION_RATE[k] for k in RESOURCE_KEYS]
+FUEL_RATE = [PARAMS.RESOURCE_TO_FUEL_RATE[k] for k in RESOURCE_KEYS]
+RESEARCH_REQUIRED = [0, PARAMS.RESEARCH_REQUIREMENTS.COAL,
+                     PARAMS.RESEARCH_REQUIREMENTS.URANIUM]
+CAPACITY = {UNIT_TYPES.WORKER: PARAMS.RESOURCE_CAPACITY.WORKER,
+            UNIT_TYPES.CART: PARAMS.RESOURCE_CAPACITY.CART}
+UNIT_COOLDOWN = {UNIT_TYPES.WORKER: PARAMS.UNIT_ACTION_COOLDOWN.WORKER,
+                 UNIT_TYPES.CART: PARAMS.UNIT_ACTION_COOLDOWN.CART}
+UNIT_UPKEEP = {UNIT_TYPES.WORKER: PARAMS.LIGHT_UPKEEP.WORKER,
+               UNIT_TYPES.CART: PARAMS.LIGHT_UPKEEP.CART}
+CYCLE_LENGTH = PARAMS.DAY_LENGTH + PARAMS.NIGHT_LENGTH
+# lux.annotate commands, which do not act
+DEBUG_COMMANDS = ("dc", "dx", "dl", "dt", "dst")
+_INT_PREFIX = re.compile(r"\s*[+-]?\d+")
+
+
+def _fmt(value):
+    """Numbers as the JS engine prints them: 2 -> "2", 1.5 -> "1.5" """
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _parse_int(value):
+    """int() with JS parseInt() leniency: "3abc" -> 3, "abc" -> None"""
+    match = _INT_PREFIX.match(value)
+    return int(match.group()) if match else None
+
+
+def is_night(turn):
+    return turn % CYCLE_LENGTH >= PARAMS.DAY_LENGTH
+
+
+class Observation(dict):
+    """dict with attribute access, like the kaggle observation Struct"""
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _Unit:
+    __slots__ = ("id", "team", "type", "x", "y", "cooldown", "cargo")
+
+    def __init__(self, unitid, team, u_type, x, y, cooldown=0, cargo=(0, 0, 0)):
+        self.id = unitid
+        self.team = team
+        self.type = u_type
+        self.x = x
+        self.y = y
+        self.cooldown = cooldown
+        self.cargo = list(cargo)  # wood, coal, uranium
+
+    def space_left(self):
+        return CAPACITY[self.type] - sum(self.cargo)
+
+
+class _City:
+    __slots__ = ("id", "team", "fuel", "cells")
+
+    def __init__(self, cityid, team, fuel=0):
+        self.id = cityid
+        self.team = team
+        self.fuel = fuel
+        self.cells = []  # (x, y) of its citytiles, in the order they joined
+
+
+class _MapLayout:
+    """Generated resources and start position of a map, as cached by LuxEngine"""
+    __slots__ = ("resource_type", "resource_amount", "start", "nbytes")
+
+    def __init__(self, resource_type, resource_amount, start):
+        self.resource_type = resource_type.copy()
+        self.resource_amount = resource_amount.copy()
+        self.start = start
+        self.nbytes = self.resource_type.nbytes + self.resource_amount.nbytes
+
+
+class LuxEngine:
+    """
+    Season 1 rules on arrays. Map planes are indexed [y, x]:
+
+        resource_type      int8     WOOD/COAL/URANIUM, -1 if none
+        resource_amount    int32
+        road               float64  MAX_ROAD on citytiles
+        citytile_team      int8     -1 if no citytile
+        citytile_city      int32    numeric id of the tile's city
+        citytile_cooldown  float64
+
+    Units and cities are small slotted records in dicts keyed by their
+    numeric id. Their insertion order is the kaggle engine's processing
+    order, which decides new unit ids and which city survives a merge.
+
+    Maps come from a simpler generator than kaggle's (see _generate_map), so
+    a seed does not give the kaggle map of that seed, and resources and
+    start positions are laid out differently. To play a kaggle map, reset
+    the kaggle environment and pass its first `updates` to load_updates().
+
+    :param configuration: (Dict) as for the kaggle environment; `seed`,
+                          `width`/`height` and `episodeSteps` are used.
+    :param reset_cache_size: (Int) number of generated maps kept, by (seed,
+                          width, height), so that resets with a given seed
+                          copy the map instead of generating it again
+    """
+    def __init__(self, configuration=None, reset_cache_size=0):
+        self.configuration = dict(configuration or {})
+        self.episode_steps = self.configuration.get("episodeSteps", PARAMS.MAX_DAYS + 1)
+        self.seed = None
+        self.initial_maps = InitialStateCache(reset_cache_size) if reset_cache_size else None
+        self._episode = 0
+
+    # Setup ---------------------------------------------------------------
+
+    def _allocate(self, width, height):
+        self.width = width
+        self.height = height
+        shape = (height, width)
+        self.resource_type = np.full(shape, NO_RESOURCE, dtype=np.int8)
+        self.resource_amount = np.zeros(shape, dtype=np.int32)
+        self.road = np.zeros(shape, dtype=np.float64)
+        self.citytile_team = np.full(shape, NO_TEAM, dtype=np.int8)
+        self.citytile_city = np.zeros(shape, dtype=np.int32)
+        self.citytile_cooldown = np.zeros(shape, dtype=np.float64)
+        self.units = {}
+        self.cities = {}
+        self.research_points = [0, 0]
+        self.turn = 0
+        self._next_unit_id = 1
+        self._next_city_id = 1
+
+    def reset(self, seed=None):
+        """
+        Start a new game on a generated map. Without a seed in the
+        configuration (or given here), every reset draws a new map. The map
+        is not the one kaggle generates for the seed.
+        """
+        if seed is None:
+            seed = self.configuration.get("seed")
+        cached = seed is not None and self.initial_maps is not None
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+        self.seed = seed
+        key = (seed, self.configuration.get("width"), self.configuration.get("height"))
+        layout = self.initial_maps.get(key) if cached else None
+        if layout is None:
+            rng = random.Random(seed)
+            size = self.configuration.get("width") or rng.choice(MAP_SIZES)
+            height = self.configuration.get("height") or size
+            self._allocate(size, height)
+            start = self._generate_map(rng)
+            if cached:
+                self.initial_maps.put(key, _MapLayout(self.resource_type, self.resource_amount, start))
+        else:
+            start = layout.start
+            self._allocate(layout.resource_type.shape[1], layout.resource_type.shape[0])
+            self.resource_type[:] = layout.resource_type
+            self.resource_amount[:] = layout.resource_amount
+        for team, x in ((0, start[0]), (1, self.width - 1 - start[0])):
+            self._build_citytile(team, x, start[1])
+            self._spawn_unit(team, UNIT_TYPES.WORKER, x, start[1])
+        self._episode += 1
+        return self.get_updates()
+
+    def load_updates(self, messages):
+        """
+        Load a state from a step-0 kaggle `updates` list (including the
+        player id and map size header), e.g. to replay a kaggle game.
+        """
+        width, height = (int(v) for v in messages[1].split(" "))
+        self._allocate(width, height)
+        updates = parse_updates(messages[2:])
+        for team, points in updates.research.tolist():
+            self.research_points[team] = points
+        self.resource_type[updates.resources["y"], updates.resources["x"]] = updates.resources["type"]
+        self.resource_amount[updates.resources["y"], updates.resources["x"]] = updates.resources["amount"]
+        self.road[updates.roads["y"], updates.roads["x"]] = updates.roads["road"]
+        for team, cityid, fuel, _ in updates.cities.tolist():
+            self.cities[cityid] = _City(cityid, team, fuel)
+        for team, cityid, x, y, cooldown in updates.citytiles.tolist():
+            self.cities[cityid].cells.append((x, y))
+            self.citytile_team[y, x] = team
+            self.citytile_city[y, x] = cityid
+            self.citytile_cooldown[y, x] = cooldown
+        for u_type, team, unitid, x, y, cooldown, wood, coal, uranium in updates.units.tolist():
+            self.units[unitid] = _Unit(unitid, team, u_type, x, y, cooldown, (wood, coal, uranium))
+        self._next_unit_id = max(self.units, default=0) + 1
+        self._next_city_id = max(self.cities, default=0) + 1
+        return self.get_updates()
+
+    def _generate_map(self, rng):
+        """
+        Mirror-symmetric map: wood clusters near the start positions, coal
+        and uranium clusters further out. Returns team 0's start position,
+        team 1 starts on the mirrored one. This is not a port of kaggle's
+        generator, which uses its own seeded random stream and noise-based
+        resource placement.
+        """
+        w, h = self.width, self.height
+        half = w // 2
+
+        def cluster(r_type, n_clusters, cluster_size, amount_range, x_range):
+            for _ in range(n_clusters):
+                cx, cy = rng.randrange(*x_range), rng.randrange(h)
+                for _ in range(cluster_size):
+                    x = min(max(cx + rng.randint(-2, 2), 0), half - 1)
+                    y = min(max(cy + rng.randint(-2, 2), 0), h - 1)
+                    if self.resource_type[y, x] == NO_RESOURCE:
+                        self.resource_type[y, x] = r_type
+                        self.resource_amount[y, x] = rng.randint(*amount_range)
+
+        scale = w // 12
+        cluster(WOOD, 2 + scale, 6 + 2 * scale, (300, 500), (0, half))
+        cluster(COAL, 1 + scale // 2, 4 + scale, (300, 400), (0, max(1, half - 2)))
+        cluster(URANIUM, 1, 2 + scale, (250, 350), (0, max(1, half // 2)))
+
+        # start position next to the wood, on a free tile
+        free = [(x, y) for y in range(h) for x in range(1, half - 1)
+                if self.resource_type[y, x] == NO_RESOURCE]
+        wood = np.argwhere(self.resource_type == WOOD)
+        if len(wood):
+            wy, wx = wood[rng.randrange(len(wood))]
+            free.sort(key=lambda p: abs(p[0] - wx) + abs(p[1] - wy))
+            start = free[rng.randrange(min(3, len(free)))]
+        else:
+            start = free[rng.randrange(len(free))]
+
+        # mirror the left half onto the right half
+        self.resource_type[:, w - half:] = self.resource_type[:, :half][:, ::-1]
+        self.resource_amount[:, w - half:] = self.resource_amount[:, :half][:, ::-1]
+        return start
+
+    # Helpers -------------------------------------------------------------
+
+    def _in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def _team_units(self):
+        """All units, team 0 first, each team in spawn order"""
+        return [unit for team in (0, 1) for unit in self.units.values() if unit.team == team]
+
+    def _unit_for(self, unitid, team):
+        if not unitid.startswith(UNIT_ID_PREFIX):
+            return None
+        number = _parse_int(unitid[len(UNIT_ID_PREFIX):])
+        unit = self.units.get(number)
+        if unit is None or unit.team != team or unitid != UNIT_ID_PREFIX + str(number):
+            return None
+        return unit
+
+    def _spawn_unit(self, team, u_type, x, y):
+        unit = _Unit(self._next_unit_id, team, u_type, x, y)
+        self.units[unit.id] = unit
+        self._next_unit_id += 1
+        return unit
+
+    def _build_citytile(self, team, x, y):
+        """
+        Add a citytile. It joins the city of its first neighbour (n, e, s,
+        w) of the same team, and the other neighbouring cities merge into it.
+        """
+        neighbours = []
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if self._in_bounds(nx, ny) and self.citytile_team[ny, nx] == team:
+                cityid = int(self.citytile_city[ny, nx])
+                if cityid not in neighbours:
+                    neighbours.append(cityid)
+        if neighbours:
+            city = self.cities[neighbours[0]]
+            city.cells.append((x, y))
+            for cityid in neighbours[1:]:
+                other = self.cities.pop(cityid)
+                for ox, oy in other.cells:
+                    self.citytile_city[oy, ox] = city.id
+                city.cells.extend(other.cells)
+                city.fuel += other.fuel
+        else:
+            city = _City(self._next_city_id, team)
+            city.cells.append((x, y))
+            self.cities[city.id] = city
+            self._next_city_id += 1
+        self.citytile_team[y, x] = team
+        self.citytile_city[y, x] = city.id
+        self.citytile_cooldown[y, x] = 0
+        self.road[y, x] = PARAMS.MAX_ROAD
+
+    def _destroy_city(self, cityid):
+        for x, y in self.cities.pop(cityid).cells:
+            self.citytile_team[y, x] = NO_TEAM
+            self.citytile_city[y, x] = 0
+            self.citytile_cooldown[y, x] = 0
+            self.road[y, x] = PARAMS.MIN_ROAD
+
+    def city_tile_counts(self):
+        return [int(np.count_nonzero(self.citytile_team == team)) for team in (0, 1)]
+
+    def unit_counts(self):
+        counts = [0, 0]
+        for unit in self.units.values():
+            counts[unit.team] += 1
+        return counts
+
+    def citytile_upkeep(self):
+        """Light upkeep of every citytile as a plane, 0 where there is none"""
+        team = self.citytile_team
+        padded = np.pad(team, 1, constant_values=NO_TEAM)
+        same = np.zeros(team.shape, dtype=np.int32)
+        for dx, dy in NEIGHBOURS:
+            same += padded[1 + dy:1 + dy + self.height, 1 + dx:1 + dx + self.width] == team
+        upkeep = PARAMS.LIGHT_UPKEEP.CITY - PARAMS.CITY_ADJACENCY_BONUS * same
+        return np.where(team != NO_TEAM, upkeep, 0)
+
+    def city_upkeep(self):
+        """{city number: light upkeep}"""
+        upkeep = self.citytile_upkeep()
+        mask = self.citytile_team != NO_TEAM
+        totals = np.bincount(self.citytile_city[mask], weights=upkeep[mask],
+                             minlength=self._next_city_id)
+        return {cityid: float(totals[cityid]) for cityid in self.cities}
+
+    # Turn ----------------------------------------------------------------
+
+    def step(self, actions):
+        """
+        Run one turn, in the kaggle engine's order: validate the actions
+        against the start-of-turn state, run citytiles then units, collect
+        and deposit resources, pay the night upkeep, regrow wood, then
+        advance the turn and cool down the units.
+
+        :param actions: (Sequence) one list of action strings per team
+        """
+        multiplier = 2 if is_night(self.turn) else 1
+        unit_actions, citytile_actions = self._validate_actions(actions)
+        self._citytile_turns(citytile_actions)
+        self._unit_turns(unit_actions, multiplier)
+        self._collect_resources()
+        self._deposit_resources()
+        if multiplier == 2:
+            self._night()
+        self._grow_wood()
+        self.turn += 1
+        self._run_cooldowns()
+        return self.get_updates()
+
+    def _validate_actions(self, actions):
+        """
+        Drop invalid actions and all but the first action of each actor.
+
+        :return: ({unit id: action tuple}, {(x, y): citytile command}),
+                 moves are included only if they go through
+        """
+        unit_actions = {}
+        citytile_actions = {}
+        moves = []
+        tile_counts = self.city_tile_counts()
+        unit_counts = self.unit_counts()
+        for team, team_actions in enumerate(actions):
+            placed = set()
+            for action in team_actions or ():
+                strs = action.split(" ")
+                command, args = strs[0], strs[1:]
+                if command in DEBUG_COMMANDS:
+                    # lux.annotate drawings, only shown in replays
+                    continue
+                if command in ("r", "bw", "bc"):
+                    if len(args) != 2:
+                        continue
+                    x, y = _parse_int(args[0]), _parse_int(args[1])
+                    if (x is None or y is None or not self._in_bounds(x, y)
+                            or self.citytile_team[y, x] != team or (x, y) in placed
+                            or self.citytile_cooldown[y, x] >= 1):
+                        continue
+                    if command != "r":
+                        if unit_counts[team] >= tile_counts[team]:
+                            continue
+                        unit_counts[team] += 1
+                    placed.add((x, y))
+                    citytile_actions[(x, y)] = command
+                    continue
+
+                if command not in ("m", "t", "bcity", "p"):
+                    continue
+                if len(args) != {"m": 2, "t": 4}.get(command, 1):
+                    continue
+                unit = self._unit_for(args[0], team)
+                if unit is None or unit.cooldown >= 1 or unit.id in placed:
+                    continue
+                if command == "m":
+                    direction = args[1]
+                    if direction not in DIRECTION_DELTAS:
+                        continue
+                    dx, dy = DIRECTION_DELTAS[direction]
+                    x, y = unit.x + dx, unit.y + dy
+                    if not self._in_bounds(x, y) or self.citytile_team[y, x] not in (NO_TEAM, team):
+                        continue
+                    moves.append((unit, direction, (x, y)))
+                elif command == "t":
+                    dest = self._unit_for(args[1], team)
+                    amount = _parse_int(args[3])
+                    if (dest is None or dest is unit
+                            or abs(dest.x - unit.x) + abs(dest.y - unit.y) > 1
+                            or amount is None or amount < 0 or args[2] not in RESOURCE_CODES):
+                        continue
+                    unit_actions[unit.id] = ("t", dest, RESOURCE_CODES.index(args[2]), amount)
+                elif command == "bcity":
+                    if (self.citytile_team[unit.y, unit.x] != NO_TEAM
+                            or self.resource_type[unit.y, unit.x] != NO_RESOURCE
+                            or sum(unit.cargo) < PARAMS.CITY_BUILD_COST):
+                        continue
+                    unit_actions[unit.id] = ("bcity",)
+                else:
+                    unit_actions[unit.id] = ("p",)
+                placed.add(unit.id)
+
+        for unit, direction, _ in self._resolve_moves(moves):
+            if direction != DIRECTIONS.CENTER:
+                unit_actions[unit.id] = ("m", direction)
+        return unit_actions, citytile_actions
+
+    def _resolve_moves(self, moves):
+        """
+        Returns the moves that go through. All moves into the same non-
+        citytile cell fail, and so does a move into a non-citytile cell whose
+        unit does not move (moving to the center counts as moving). A failed
+        move makes the moves into its unit's cell fail too.
+        """
+        groups = {}
+        for move in moves:
+            groups.setdefault(move[2], []).append(move)
+        moving = {unit.id for unit, _, _ in moves}
+        occupants = {}
+        for unit in self.units.values():
+            occupants.setdefault((unit.x, unit.y), []).append(unit.id)
+
+        def revert(failed):
+            stack = list(failed)
+            while stack:
+                unit = stack.pop()[0]
+                if self.citytile_team[unit.y, unit.x] == NO_TEAM:
+                    stack.extend(groups.pop((unit.x, unit.y), ()))
+
+        for (x, y) in list(groups):
+            group = groups.get((x, y))
+            if group is None or self.citytile_team[y, x] != NO_TEAM:
+                continue
+            others = occupants.get((x, y), ())
+            if len(group) > 1 or (len(others) == 1 and others[0] not in moving):
+                revert(group)
+                groups.pop((x, y), None)
+        return [move for group in groups.values() for move in group]
+
+    def _citytile_turns(self, citytile_actions):
+        """Research and build units, city by city and tile by tile"""
+        for city in list(self.cities.values()):
+            for x, y in city.cells:
+                command = citytile_actions.get((x, y))
+                if command is None:
+                    continue
+                if command == "r":
+                    self.research_points[city.team] += 1
+                else:
+                    u_type = UNIT_TYPES.WORKER if command == "bw" else UNIT_TYPES.CART
+                    self._spawn_unit(city.team, u_type, x, y)
+                self.citytile_cooldown[y, x] = PARAMS.CITY_ACTION_COOLDOWN
+        np.maximum(self.citytile_cooldown - 1, 0, out=self.citytile_cooldown)
+
+    def _unit_turns(self, unit_actions, multiplier):
+        """Units act in order, carts develop the road they end up on"""
+        for unit in self._team_units():
+            action = unit_actions.get(unit.id)
+            acted = False
+            if action is None:
+                pass
+            elif action[0] == "m":
+                dx, dy = DIRECTION_DELTAS[action[1]]
+                unit.x += dx
+                unit.y += dy
+                acted = True
+            elif action[0] == "t":
+                _, dest, r, amount = action
+                amount = min(amount, unit.cargo[r], dest.space_left())
+                unit.cargo[r] -= amount
+                dest.cargo[r] += amount
+                acted = True
+            elif unit.type == UNIT_TYPES.WORKER:
+                if action[0] == "bcity":
+                    self._build_citytile(unit.team, unit.x, unit.y)
+                    cost = PARAMS.CITY_BUILD_COST
+                    for r in (WOOD, COAL, URANIUM):
+                        spent = min(cost, unit.cargo[r])
+                        unit.cargo[r] -= spent
+                        cost -= spent
+                elif self.citytile_team[unit.y, unit.x] == NO_TEAM:
+                    # pillage; citytiles keep MAX_ROAD
+                    self.road[unit.y, unit.x] = max(self.road[unit.y, unit.x] - PARAMS.PILLAGE_RATE,
+                                                    PARAMS.MIN_ROAD)
+                acted = True
+            if acted:
+                unit.cooldown += UNIT_COOLDOWN[unit.type] * multiplier
+            if unit.type == UNIT_TYPES.CART and self.road[unit.y, unit.x] < PARAMS.MAX_ROAD:
+                self.road[unit.y, unit.x] = min(self.road[unit.y, unit.x] + PARAMS.CART_ROAD_DEVELOPMENT_RATE,
+                                                PARAMS.MAX_ROAD)
+
+    def _collect_resources(self):
+        """
+        Workers ask each adjacent tile of a researched resource for their
+        cargo space split over those tiles, capped by the collection rate;
+        uranium first. A tile hands out equal shares in rounds until it or
+        the requests run out. Workers on a citytile collect straight into
+        the city's fuel, and identical requests from one citytile count once.
+        """
+        units = self._team_units()
+        for r in (URANIUM, COAL, WOOD):
+            requests = {}
+            for unit in units:
+                if (unit.type != UNIT_TYPES.WORKER
+                        or self.research_points[unit.team] < RESEARCH_REQUIRED[r]):
+                    continue
+                cells = [(unit.x + dx, unit.y + dy) for dx, dy in COLLECT_FROM
+                         if self._in_bounds(unit.x + dx, unit.y + dy)
+                         and self.resource_type[unit.y + dy, unit.x + dx] == r]
+                if not cells:
+                    continue
+                amount = min(math.ceil(unit.space_left() / len(cells)), COLLECTION_RATE[r])
+                if self.citytile_team[unit.y, unit.x] != NO_TEAM:
+                    cityid = int(self.citytile_city[unit.y, unit.x])
+                    key, request = (unit.x, unit.y, amount, cityid), [amount, None, cityid]
+                else:
+                    key, request = unit.id, [amount, unit, None]
+                for cell in cells:
+                    requests.setdefault(cell, {}).setdefault(key, list(request))
+
+            for (x, y), cell_requests in requests.items():
+                left = int(self.resource_amount[y, x])
+                pending = list(cell_requests.values())
+                while pending and sum(p[0] for p in pending) > 0 and left > 0:
+                    share = min(min(p[0] for p in pending), left // len(pending))
+                    for p in pending:
+                        if p[2] is not None:
+                            self.cities[p[2]].fuel += share * FUEL_RATE[r]
+                        else:
+                            p[1].cargo[r] += min(p[1].space_left(), share)
+                        p[0] -= share
+                    left -= share * len(pending)
+                    if left < len(pending):
+                        left = 0
+                    pending = [p for p in pending if p[0] > 0]
+                self.resource_amount[y, x] = left
+
+        depleted = self.resource_amount <= 0
+        self.resource_type[depleted] = NO_RESOURCE
+        self.resource_amount[depleted] = 0
+
+    def _deposit_resources(self):
+        """Units on their own citytiles turn all their cargo into city fuel"""
+        for unit in self.units.values():
+            if self.citytile_team[unit.y, unit.x] == unit.team:
+                fuel = sum(c * rate for c, rate in zip(unit.cargo, FUEL_RATE))
+                self.cities[int(self.citytile_city[unit.y, unit.x])].fuel += fuel
+                unit.cargo = [0, 0, 0]
+
+    def _night(self):
+        """
+        Cities without enough fuel for their upkeep are destroyed. Then
+        units outside citytiles burn cargo (lowest fuel value first) and die
+        without enough of it.
+        """
+        for cityid, upkeep in self.city_upkeep().items():
+            city = self.cities[cityid]
+            if city.fuel < upkeep:
+                self._destroy_city(cityid)
+            else:
+                city.fuel -= upkeep
+
+        dead = []
+        for unit in self._team_units():
+            if self.citytile_team[unit.y, unit.x] != NO_TEAM:
+                continue
+            need = UNIT_UPKEEP[unit.type]
+            for r in (WOOD, COAL, URANIUM):
+                burnt = min(unit.cargo[r], math.ceil(need / FUEL_RATE[r]))
+                unit.cargo[r] -= burnt
+                need -= burnt * FUEL_RATE[r]
+                if need <= 0:
+                    break
+            if need > 0:
+                dead.append(unit.id)
+        for unitid in dead:
+            del self.units[unitid]
+
+    def _grow_wood(self):
+        wood = (self.resource_type == WOOD) & (self.resource_amount < PARAMS.MAX_WOOD_AMOUNT)
+        grown = np.ceil(self.resource_amount[wood] * PARAMS.WOOD_GROWTH_RATE)
+        self.resource_amount[wood] = np.minimum(grown, PARAMS.MAX_WOOD_AMOUNT)
+
+    def _run_cooldowns(self):
+        """Unit cooldowns go down by 1, plus the road of their cell"""
+        for unit in self.units.values():
+            unit.cooldown = max(unit.cooldown - self.road[unit.y, unit.x] - 1, 0)
+
+    # Output --------------------------------------------------------------
+
+    def is_done(self):
+        if self.turn >= self.episode_steps - 1:
+            return True
+        tiles, units = self.city_tile_counts(), self.unit_counts()
+        return any(tiles[team] == 0 and units[team] == 0 for team in (0, 1))
+
+    def rewards(self):
+        """Per team: city tiles * 10000 + units, the kaggle ranking criterion"""
+        tiles, units = self.city_tile_counts(), self.unit_counts()
+        return [tiles[team] * 10000 + units[team] for team in (0, 1)]
+
+    def get_updates(self):
+        """The state as kaggle `updates` messages"""
+        messages = ["rp 0 %d" % self.research_points[0], "rp 1 %d" % self.research_points[1]]
+        for y, x in np.argwhere(self.resource_type != NO_RESOURCE).tolist():
+            messages.append("r %s %d %d %d" % (RESOURCE_CODES[self.resource_type[y, x]], x, y,
+                                               self.resource_amount[y, x]))
+        for unit in self._team_units():
+            messages.append("u %d %d %s%d %d %d %s %d %d %d" % (
+                unit.type, unit.team, UNIT_ID_PREFIX, unit.id, unit.x, unit.y,
+                _fmt(unit.cooldown), *unit.cargo))
+        upkeep = self.city_upkeep()
+        for city in self.cities.values():
+            messages.append("c %d %s%d %s %s" % (city.team, CITY_ID_PREFIX, city.id,
+                                                 _fmt(city.fuel), _fmt(upkeep[city.id])))
+        for city in self.cities.values():
+            for x, y in city.cells:
+                messages.append("ct %d %s%d %d %d %s" % (city.team, CITY_ID_PREFIX, city.id, x, y,
+                                                         _fmt(self.citytile_cooldown[y, x])))
+        for y, x in np.argwhere(self.road > 0).tolist():
+            messages.append("ccd %d %d %s" % (x, y, _fmt(self.road[y, x])))
+        messages.append("D_DONE")
+        return messages
+
+    def observation(self, player, updates=None):
+        """kaggle-style observation for one player"""
+        if updates is None:
+            updates = self.get_updates()
+        if self.turn == 0:
+            updates = [str(player), "%d %d" % (self.width, self.height)] + updates
+        return Observation(player=player, step=self.turn, updates=updates,
+                           reward=self.rewards()[player])
+
+    def train(self, agents):
+        """Same as kaggle's env.train(agents): the None agent is trained"""
+        return LuxTrainer(self, agents)
+
+
+class LuxTrainer:
+    """
+    Steps a LuxEngine for the trained (None) agent, running the other one.
+
+    :param agents: (Sequence) two agents, one of them None. The other is
+                   "simple_agent", None-like "idle", or a callable
+                   agent(observation, configuration) -> list of actions.
+    """
+    def __init__(self, engine, agents):
+        self.engine = engine
+        self.agents = list(agents)
+        self.player = self.agents.index(None)
+        self.opponent = 1 - self.player
+        self._opponent_agent = None
+
+    def _make_opponent(self):
+        agent = self.agents[self.opponent]
+        if agent in AGENTS:
+            return AGENTS[agent]()
+        return agent
+
+    @property
+    def opponent_agent(self):
+        return self._opponent_agent
+
+    @property
+    def opponent_observation(self):
+        """Observation the opponent acts on in the next step"""
+        return self._opponent_obs
+
+    def reset(self):
+        updates = self.engine.reset()
+        self._opponent_agent = self._make_opponent()
+        self._opponent_obs = self.engine.observation(self.opponent, updates)
+        return self.engine.observation(self.player, updates)
+
+    def step(self, action):
+        opponent_actions = self._opponent_agent(self._opponent_obs, self.engine.configuration)
+        actions = [None, None]
+        actions[self.player] = action
+        actions[self.opponent] = opponent_actions
+        updates = self.engine.step(actions)
+        self._opponent_obs = self.engine.observation(self.opponent, updates)
+        obs = self.engine.observation(self.player, updates)
+        return obs, obs.reward, self.engine.is_done(), {}
+
+
+class SimpleAgent:
+    """Port of the kaggle starter kit's simple_agent, for use as opponent"""
+
+    def __init__(self):
+        self.game_state = None
+
+    def __call__(self, observation, configuration):
+        if observation["step"] == 0:
+            self.game_state = Game()
+            self.game_state._initialize(observation["updates"])
+            self.game_state._update(observation["updates"][2:])
+            self.game_state.id = observation.player
+        else:
+            self.game_state._update(observation["updates"])
+
+        actions = []
+        player = self.game_state.players[observation.player]
+        game_map = self.game_state.map
+        resource_tiles = []
+        for y in range(self.game_state.map_height):
+            for x in range(self.game_state.map_width):
+                cell = game_map.get_cell(x, y)
+                if cell.has_resource():
+                    resource_tiles.append(cell)
+
+        for unit in player.units:
+            if not (unit.is_worker() and unit.can_act()):
+                continue
+            if unit.get_cargo_space_left() > 0:
+                closest_dist, closest = math.inf, None
+                for tile in resource_tiles:
+                    if tile.resource.type == Constants.RESOURCE_TYPES.COAL and not player.researched_coal():
+                        continue
+                    if tile.resource.type == Constants.RESOURCE_TYPES.URANIUM and not player.researched_uranium():
+                        continue
+                    dist = tile.pos.distance_to(unit.pos)
+                    if dist < closest_dist:
+                        closest_dist, closest = dist, tile
+                if closest is not None:
+                    actions.append(unit.move(unit.pos.direction_to(closest.pos)))
+            elif player.cities:
+                closest_dist, closest = math.inf, None
+                for city in player.cities.values():
+                    for citytile in city.citytiles:
+                        dist = citytile.pos.distance_to(unit.pos)
+                        if dist < closest_dist:
+                            closest_dist, closest = dist, citytile
+                if closest is not None:
+                    actions.append(unit.move(unit.pos.direction_to(closest.pos)))
+        return actions
+
+
+def idle_agent(observation, configuration):
+    return []
+
+
+AGENTS = {
+    "simple_agent": SimpleAgent,
+    "idle": lambda: idle_agent,
+}
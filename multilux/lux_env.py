@@ -11,9 +11,11 @@ logger = logging.getLogger(__name__)
 
 from ray.rllib.env.multi_agent_env import MultiAgentEnv
 
-from kaggle_environments import make
-
+from multilux.lux_engine import LuxEngine
+from multilux import profiling
 from multilux.lux_interface import LuxDefaultInterface
+from multilux.policy_pool import PoolOpponent
+from multilux.state_cache import InitialState, InitialStateCache
 
 
 class LuxEnv(MultiAgentEnv):
@@ -37,21 +39,56 @@ class LuxEnv(MultiAgentEnv):
                        converted to per-actor observations, and such.
     :param agents: (Iterable) The two agents to run in the environment. Set the one training to None.
     :param train: (Bool)  Not sure, I think it needs to always be True?
+    :param engine: (Str) 'kaggle' for the kaggle_environments (JS) engine, or
+                   'native' for the in-process multilux.lux_engine.LuxEngine.
+                   The rules are the same, but the native engine generates its
+                   own maps: a seed gives a different map than on kaggle.
+    :param reset_cache_size: (Int) number of maps, by (seed, width, height),
+                   whose parsed initial state is kept so that later resets on
+                   the same map skip parsing (the native engine also skips map
+                   generation). 0 disables the cache. The interface must accept
+                   an `initial_state` argument, as LuxDefaultInterface does.
+    :param profile: (Bool) time each phase of reset/step in self.profiler, a
+                   multilux.profiling.PhaseTimer (see ProfilingCallbacks)
+    :param profile_allocations: (Bool) with profile, also count the memory
+                   blocks allocated per phase (slower)
+    :param recorder: (multilux.recorder.EpisodeRecorder) records the state,
+                   actions and rewards of every turn into episode shards
     """
     def __init__(self, configuration, debug,
                  interface=LuxDefaultInterface,
-                 agents=(None, "simple_agent")):
+                 agents=(None, "simple_agent"),
+                 engine='kaggle',
+                 reset_cache_size=0,
+                 profile=False,
+                 profile_allocations=False,
+                 recorder=None):
         super().__init__()
 
         logger.debug('Init LuxEnv')
 
-        self._env = make("lux_ai_2021",
-                         configuration=configuration, debug=debug)
+        if engine == 'kaggle':
+            # imported here: it is slow to import and the native engine does not need it
+            from kaggle_environments import make
+            self._env = make("lux_ai_2021",
+                             configuration=configuration, debug=debug)
+        elif engine == 'native':
+            self._env = LuxEngine(configuration, reset_cache_size=reset_cache_size)
+        else:
+            raise ValueError(f"Unknown engine '{engine}', use 'kaggle' or 'native'")
 
         self.env = self._env.train(agents)
+        # multilux.policy_pool.PolicyPool of a PoolOpponent, refreshed by SelfPlayCallbacks
+        self.opponent_pool = next((agent.pool for agent in agents if isinstance(agent, PoolOpponent)), None)
 
         self.interface_class = interface
+        self.initial_states = InitialStateCache(reset_cache_size) if reset_cache_size else None
         self.interface = None  # will be instantiated in self.reset()
+        if profile:
+            self.profiler = profiling.PhaseTimer(track_allocations=profile_allocations)
+        else:
+            self.profiler = profiling.DISABLED
+        self.recorder = recorder
 
         self.action_space = None
         self.observation_space = None
@@ -61,12 +98,49 @@ class LuxEnv(MultiAgentEnv):
         returns a dictionary of observations with keys being agent ids
         """
         logger.debug("==================== Environment reset ====================")
+        timer = self.profiler
+        timer.new_episode()
+        t = timer.start()
         obs = self.env.reset()
+        t = timer.stop("reset_env", t)
         # Instantiate interface to agent
-        self.interface = self.interface_class(obs)
-        obs = self.interface.observation(obs)
+        initial_state = self._initial_state(obs)
+        if initial_state is None:
+            self.interface = self.interface_class(obs)
+        else:
+            self.interface = self.interface_class(obs, initial_state=initial_state)
+        self.interface.timer = timer
+        t = timer.stop("reset_interface", t)
+        actors = self.interface.game.get_team_actors(teams=(self.interface.game.player_id,), flat=True)
+        obs = self.interface.observation(obs, actors)
+        if timer.enabled:
+            timer.stop("observation", t)
+            game_state = self.interface.game_state
+            timer.map_size = (game_state.map_width, game_state.map_height)
+            timer.end_step(game_state.turn, len(actors))
+        if self.recorder is not None:
+            self.recorder.begin(self.interface.game)
         return obs
 
+    def _initial_state(self, obs):
+        """Cached InitialState of the map just reset, or None without a cache"""
+        if self.initial_states is None:
+            return None
+        if isinstance(self._env, LuxEngine):
+            seed = self._env.seed
+        else:
+            # set by the kaggle engine on its first reset if not configured
+            seed = self._env.configuration.get("seed")
+        if seed is None:
+            return None
+        width, height = obs["updates"][1].split(" ")
+        key = (seed, int(width), int(height))
+        initial_state = self.initial_states.get(key)
+        if initial_state is None:
+            initial_state = InitialState(obs["updates"])
+            self.initial_states.put(key, initial_state)
+        return initial_state
+
     def step(self, action_dict):
         """
         Takes as input a dictionary of actions with keys being agent ids
@@ -85,10 +159,18 @@ class LuxEnv(MultiAgentEnv):
         }
 
         """
+        timer = self.profiler
+        t = timer.start()
         # Convert actions dict to list of actions as per LuxAI spec
         actions = self.interface.actions(action_dict)
+        t = timer.stop("actions", t)
         # Apply actions to environment
         obs, reward, done, info = self.env.step(actions)
-        # Convert data to dicts as per RLlib spec
+        timer.stop("env_step", t)
+        # Convert data to dicts as per RLlib spec (timed inside ordi)
         obs, reward, done, info = self.interface.ordi(obs, reward, done, info)
+        if self.recorder is not None:
+            self.recorder.record(action_dict, reward, done, self.interface.game)
+        if timer.enabled:
+            timer.end_step(self.interface.game_state.turn, len(obs))
         return obs, reward, done, info
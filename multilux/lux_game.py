@@ -7,47 +7,53 @@ Date:   September 2021
 """
 
 from lux.game import Game
+from lux.game_map import GameMap
+from multilux.actor_registry import ActorRegistry
 
 
 class LuxGame:
 
-    def __init__(self, observation):
+    def __init__(self, observation, map_class=GameMap, incremental=False, initial_state=None):
+        # multilux.state_cache.InitialState of this map, restored on the
+        # first update instead of parsing the step-0 messages
+        self.initial_state = initial_state
+        # actors of both teams, tracked across turns
+        self.registry = ActorRegistry()
         if observation["step"] == 0:
-            self.game_state = Game()
+            self.game_state = Game(map_class=map_class, incremental=incremental)
             self.game_state._initialize(observation["updates"])
             self.game_state.id = observation.player
             self.player_id = observation.player
 
     def update(self, observation: dict) -> Game:
         if observation["step"] == 0:
-            self.game_state._update(observation["updates"][2:])
+            updates = self.initial_state.updates if self.initial_state is not None else None
+            self.game_state._update(observation["updates"][2:], updates)
         else:
             self.game_state._update(observation["updates"])
+        self.registry.update(self.game_state)
 
         return self.game_state
 
     def get_state(self):
         return self.game_state
 
+    def get_delta(self):
+        """Changes since the previous turn (lux.game.GameDelta), or None
+        unless the game state is updated incrementally"""
+        return self.game_state.delta
+
     def get_team_actors(self, teams=(0,), flat=False):
-        self.units = []
-        self.citytiles = []
-        self.cities = []
-        for player in [p for p in self.game_state.players if p.team in teams]:
-            for unit in player.units:
-                unit.class_name = 'unit'
-                self.units.append(unit)
-            for city in player.cities.values():
-                for citytile in city.citytiles:
-                    citytile.class_name = 'citytile'
-                    citytile.id = f'ct_{citytile.pos.x}_{citytile.pos.y}'
-                    self.citytiles.append(citytile)
-                self.cities.append(city)
-
-        citytiles = [c for c in self.citytiles if c.team in teams]
-        units = [u for u in self.units if u.team in teams]
+        """
+        Units and citytiles of the given teams from the actor registry, units
+        first, each in the order they appeared in the game
+        """
+        self.units = self.registry.units(teams)
+        self.citytiles = self.registry.citytiles(teams)
+        self.cities = [city for player in self.game_state.players if player.team in teams
+                       for city in player.cities.values()]
 
         if flat:
-            return units + citytiles
+            return self.units + self.citytiles
 
-        return {'units': units, 'citytiles': citytiles}
+        return {'units': self.units, 'citytiles': self.citytiles}
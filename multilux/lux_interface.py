@@ -16,6 +16,8 @@ from typing import Callable, Iterator, Union, Optional, List, Tuple
 from gym import spaces
 import numpy as np
 
+from lux.game_map import GameMap
+from multilux import profiling
 from multilux.lux_game import LuxGame
 
 
@@ -25,10 +27,21 @@ class LuxDefaultInterface:
                                                  shape=(2,), dtype=np.float16)}
     act_spaces = {'default': spaces.Discrete(2)}
 
-    def __init__(self, obs):
+    # Map backend for the game state. Set to lux.array_map.ArrayGameMap to
+    # get the map as NumPy planes that are reused across turns.
+    map_class = GameMap
+    # Update the game state in place from the per-turn message diff. The
+    # changes are then available from self.game.get_delta().
+    incremental_update = False
+    # multilux.profiling.PhaseTimer timing ordi(), set by LuxEnv
+    timer = profiling.DISABLED
+
+    def __init__(self, obs, initial_state=None):
         # logger.debug('Init interface')
         # Instantiate game wrapper
-        self.game = LuxGame(obs)
+        self.game = LuxGame(obs, map_class=self.map_class,
+                            incremental=self.incremental_update,
+                            initial_state=initial_state)
         self.game_state = self.game.update(obs)
 
     def ordi(self, *joint_data) -> Tuple[dict]:
@@ -43,15 +56,20 @@ class LuxDefaultInterface:
                  self.done,
                  self.info]
 
+        timer = self.timer
+        t = timer.start()
         # Update game state form env observation
         self.game_state = self.game.update(joint_data[0])
+        t = timer.stop("update", t)
         # Get actor objects for current player from game
         actors = self.game.get_team_actors(teams=(self.game.player_id,), flat=True)
+        t = timer.stop("actors", t)
 
         output_data = []
         for fun, data in zip(funcs, joint_data):
             data = fun(data, actors)
             output_data.append(data)
+            t = timer.stop(fun.__name__, t)
 
         return tuple(output_data)
 
@@ -0,0 +1,277 @@
+"""
+LuxVectorEnv whose games each run in a child process and step concurrently.
+
+Actions go to the children through a pipe. Observations, rewards and dones
+come back through shared-memory NumPy buffers (one slot per actor), so only
+the actor ids and the infos are pickled.
+"""
+import logging
+import multiprocessing
+import traceback
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from gym import spaces
+
+from multilux.lux_env import LuxEnv
+from multilux.lux_interface import LuxDefaultInterface
+from multilux.lux_vector_env import LuxVectorEnv
+from multilux.recorder import EpisodeRecorder
+
+
+class _SharedBuffers:
+    """Per-game shared-memory arrays, one row per actor slot"""
+
+    def __init__(self, raw_obs, raw_rewards, raw_dones, max_actors, obs_size):
+        self.raw = (raw_obs, raw_rewards, raw_dones, max_actors, obs_size)
+        self.obs = np.frombuffer(raw_obs, dtype=np.float32).reshape(max_actors, obs_size)
+        self.rewards = np.frombuffer(raw_rewards, dtype=np.float32)
+        self.dones = np.frombuffer(raw_dones, dtype=np.bool_)
+
+    @classmethod
+    def allocate(cls, ctx, max_actors, obs_size):
+        return cls(ctx.RawArray('f', max_actors * obs_size),
+                   ctx.RawArray('f', max_actors),
+                   ctx.RawArray('b', max_actors),
+                   max_actors, obs_size)
+
+    def __reduce__(self):
+        return _SharedBuffers, self.raw
+
+
+def _obs_layouts(interface):
+    """Distinct (shape, dtype) of the interface's observation spaces"""
+    layouts = []
+    for key, space in interface.obs_spaces.items():
+        if not isinstance(space, spaces.Box):
+            raise ValueError(f"Shared-memory transport needs Box observation spaces, "
+                             f"'{key}' is {type(space).__name__}")
+        layout = (space.shape, np.dtype(space.dtype))
+        if layout not in layouts:
+            layouts.append(layout)
+    return layouts
+
+
+def _layout_index(layouts, actor_id, o):
+    """
+    index of the layout of an observation: the one with its shape and
+    dtype, or else the only one with its shape
+    """
+    layout = (o.shape, o.dtype)
+    if layout in layouts:
+        return layouts.index(layout)
+    same_shape = [i for i, (shape, _) in enumerate(layouts) if shape == o.shape]
+    if len(same_shape) == 1:
+        return same_shape[0]
+    raise ValueError(f"Observation of actor {actor_id} with shape {o.shape} and dtype {o.dtype} matches "
+                     f"{'several' if same_shape else 'none'} of the observation spaces {layouts}")
+
+
+def _write_results(buffers, layouts, obs, reward, done):
+    """Pack one step's dicts into the shared buffers, returns the metadata"""
+    actor_ids = list(obs)
+    if len(actor_ids) > len(buffers.rewards):
+        raise ValueError(f"{len(actor_ids)} actors do not fit in max_actors={len(buffers.rewards)}")
+    actor_layouts = []
+    for i, actor_id in enumerate(actor_ids):
+        o = np.asarray(obs[actor_id])
+        actor_layouts.append(_layout_index(layouts, actor_id, o))
+        buffers.obs[i, :o.size] = o.ravel()
+        buffers.rewards[i] = reward.get(actor_id, 0) if reward is not None else 0
+        buffers.dones[i] = done.get(actor_id, False) if done is not None else False
+    done_all = done.get('__all__', False) if done is not None else False
+    return actor_ids, actor_layouts, done_all
+
+
+def _worker(conn, buffers, layouts, env_args, env_kwargs):
+    """
+    Serves the parent's commands. Replies are ('ok', (metadata, info,
+    profiled episodes)), or ('error', traceback) when the command failed,
+    for the parent to raise. The profiled episodes are sent when one ends.
+    """
+    try:
+        env, error = LuxEnv(*env_args, **env_kwargs), None
+    except Exception:
+        env, error = None, traceback.format_exc()
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == 'close':
+                break
+            if error is not None:
+                conn.send(('error', error))
+                continue
+            try:
+                if command == 'step':
+                    obs, reward, done, info = env.step(data)
+                    results = _write_results(buffers, layouts, obs, reward, done)
+                    episodes = env.profiler.pop_episodes() if results[2] and env.profiler.enabled else ()
+                    conn.send(('ok', (results, info, episodes)))
+                elif command == 'reset':
+                    obs = env.reset()
+                    conn.send(('ok', (_write_results(buffers, layouts, obs, None, None), None, ())))
+            except Exception:
+                conn.send(('error', traceback.format_exc()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+class _ChildProfiler:
+    """
+    Parent-side stand-in for the PhaseTimer of a child's LuxEnv, holding
+    the stats of the episodes the child finished (see ProfilingCallbacks)
+    """
+    def __init__(self, enabled, max_episodes=8):
+        self.enabled = enabled
+        self._finished = deque(maxlen=max_episodes)
+
+    def add_episodes(self, episodes):
+        self._finished.extend(episodes)
+
+    def pop_episode(self):
+        """Stats of the oldest episode not popped yet, empty ones if there is none"""
+        if self._finished:
+            return self._finished.popleft()
+        return {"map_size": None, "turns": [], "actors": [], "phases": {}}
+
+
+class _RemoteLuxEnv:
+    """Parent-side handle of a LuxEnv running in a child process"""
+
+    def __init__(self, ctx, layouts, max_actors, env_args, env_kwargs):
+        self.layouts = layouts
+        self.profiler = _ChildProfiler(env_kwargs.get('profile', False))
+        obs_size = max(int(np.prod(shape)) for shape, _ in layouts)
+        self.buffers = _SharedBuffers.allocate(ctx, max_actors, obs_size)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker,
+                                   args=(child_conn, self.buffers, layouts, env_args, env_kwargs),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def send(self, command, data=None):
+        self.conn.send((command, data))
+
+    def receive(self):
+        """Unpack the child's reply into (obs, rewards, dones, infos) dicts"""
+        status, reply = self.conn.recv()
+        if status == 'error':
+            raise RuntimeError(f"LuxEnv failed in child process {self.process.pid}:\n{reply}")
+        (actor_ids, actor_layouts, done_all), info, episodes = reply
+        self.profiler.add_episodes(episodes)
+        n = len(actor_ids)
+        # copy out of shared memory, the child overwrites it on the next step
+        flat = self.buffers.obs[:n].copy()
+        rewards = self.buffers.rewards[:n].tolist()
+        dones = self.buffers.dones[:n].tolist()
+        actor_layouts = np.asarray(actor_layouts, dtype=np.int64)
+        obs_rows = [None] * n
+        for j, (shape, dtype) in enumerate(self.layouts):
+            rows = np.flatnonzero(actor_layouts == j)
+            if len(rows) == 0:
+                continue
+            size = int(np.prod(shape))
+            block = flat[rows, :size].astype(dtype).reshape((len(rows),) + shape)
+            for k, row in enumerate(rows):
+                obs_rows[row] = block[k]
+        obs = dict(zip(actor_ids, obs_rows))
+        reward = dict(zip(actor_ids, rewards))
+        done = dict(zip(actor_ids, dones))
+        done['__all__'] = done_all
+        return obs, reward, done, info
+
+    def reset(self):
+        self.send('reset')
+        return self.receive()[0]
+
+    def step(self, action_dict):
+        self.send('step', action_dict)
+        return self.receive()
+
+    def close(self):
+        try:
+            self.send('close')
+        except (BrokenPipeError, EOFError):
+            pass
+        self.process.join(timeout=5)
+
+
+class LuxSubprocVectorEnv(LuxVectorEnv):
+    """
+    LuxVectorEnv that runs every game in its own child process, so the
+    kaggle engine steps of all games run concurrently on separate cores.
+
+    All observation spaces of the interface must be gym Boxes, observations
+    are sent back as float32 through shared memory and cast to the space's
+    dtype on arrival.
+
+    opponent_pool is not supported: the pool opponents of the games are
+    inferred together in the parent, which the children cannot share.
+
+    :param max_actors: (Int) actor slots per game in the shared buffers
+    :param start_method: (Str) multiprocessing start method, e.g. 'spawn' or
+                         'forkserver'. None uses the platform default.
+    The remaining parameters are as in LuxVectorEnv.
+    """
+    def __init__(self, configuration, debug,
+                 interface=LuxDefaultInterface,
+                 agents=(None, "simple_agent"),
+                 num_envs=1,
+                 auto_reset=True,
+                 profile=False,
+                 engine='kaggle',
+                 opponent_pool=None,
+                 record_dir=None,
+                 max_actors=512,
+                 start_method=None):
+        if opponent_pool is not None:
+            raise ValueError("LuxSubprocVectorEnv does not support opponent_pool, "
+                             "use LuxVectorEnv, which batches the pool opponents of its games")
+        self.max_actors = max_actors
+        self.start_method = start_method
+        super().__init__(configuration, debug, interface=interface, agents=agents,
+                         num_envs=num_envs, auto_reset=auto_reset, profile=profile, engine=engine,
+                         record_dir=record_dir)
+
+    def _make_envs(self, configuration, debug, interface, agents):
+        ctx = multiprocessing.get_context(self.start_method)
+        layouts = _obs_layouts(interface)
+        return [_RemoteLuxEnv(ctx, layouts, self.max_actors, (configuration, debug),
+                              {'interface': interface, 'agents': agents, 'engine': self.engine,
+                               'profile': self.profile,
+                               'recorder': None if self.record_dir is None else EpisodeRecorder(self.record_dir)})
+                for _ in range(self.num_envs)]
+
+    def _reset_games(self, games):
+        for game in games:
+            game.env.send('reset')
+        obs = [results[0] for results in self._receive_all(games)]
+        for game in games:
+            game.initialized = True
+        return obs
+
+    def _step_games(self, games, actions):
+        for game, action_dict in zip(games, actions):
+            game.env.send('step', action_dict)
+        return self._receive_all(games)
+
+    def _receive_all(self, games):
+        """replies of all the games, raising the first error once none is left in a pipe"""
+        results, error = [], None
+        for game in games:
+            try:
+                results.append(game.env.receive())
+            except RuntimeError as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def stop(self):
+        for env in self.envs:
+            env.close()
@@ -0,0 +1,105 @@
+"""
+LuxEnv variant where the whole team is a single RLlib agent.
+
+Instead of one agent per unit and citytile, each step returns one
+observation for the team: the interface's per-actor observations stacked
+into a fixed-size, zero-padded array with a mask of the rows in use. The
+team acts with one MultiDiscrete action holding an action per row, which is
+handed back to the interface as the usual {actor_id: action} dict.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from gym import spaces
+
+from multilux.lux_env import LuxEnv
+from multilux.lux_interface import LuxDefaultInterface
+
+TEAM_AGENT_ID = "team"
+
+
+class LuxTeamEnv(LuxEnv):
+    """
+    Observation:
+        {"obs": (max_actors, *actor_obs_shape), "mask": (max_actors,)}
+        rows are the actors in the order of the interface's observation
+        dict, mask is 1 for the rows holding an actor
+    Action:
+        MultiDiscrete, one action per row. Actions of padded rows are ignored.
+    Reward:
+        sum of the per-actor rewards
+    Info:
+        {"actors": number of actors, "truncated": actors left out}
+
+    Actors beyond max_actors get no observation row and no action.
+
+    :param max_actors: (Int) rows of the grouped observation and action
+    :param actor_obs_space: (gym.spaces.Box) per-actor observation space,
+                   by default interface.obs_spaces['default']
+    :param actor_act_space: (gym.spaces.Discrete) per-actor action space,
+                   by default interface.act_spaces['default']
+    The remaining parameters are passed to LuxEnv.
+    """
+    def __init__(self, configuration, debug,
+                 interface=LuxDefaultInterface,
+                 agents=(None, "simple_agent"),
+                 max_actors=128,
+                 actor_obs_space=None,
+                 actor_act_space=None,
+                 **kwargs):
+        super().__init__(configuration, debug, interface=interface, agents=agents, **kwargs)
+
+        actor_obs_space = actor_obs_space or interface.obs_spaces['default']
+        actor_act_space = actor_act_space or interface.act_spaces['default']
+        if not isinstance(actor_act_space, spaces.Discrete):
+            raise ValueError(f"LuxTeamEnv needs a Discrete per-actor action space, got {actor_act_space}")
+
+        self.max_actors = max_actors
+        shape = (max_actors,) + actor_obs_space.shape
+        self.observation_space = spaces.Dict({
+            "obs": spaces.Box(low=np.broadcast_to(actor_obs_space.low, shape),
+                              high=np.broadcast_to(actor_obs_space.high, shape),
+                              dtype=actor_obs_space.dtype),
+            "mask": spaces.Box(low=0, high=1, shape=(max_actors,), dtype=np.float32),
+        })
+        self.action_space = spaces.MultiDiscrete([actor_act_space.n] * max_actors)
+        self.actor_ids = []  # actor of each row of the last observation
+        self.truncated = 0
+
+    def reset(self):
+        obs = super().reset()
+        return {TEAM_AGENT_ID: self.group_observations(obs)}
+
+    def step(self, action_dict):
+        """
+        :param action_dict: {"team": array of max_actors actions}
+        """
+        actions = self.ungroup_actions(action_dict.get(TEAM_AGENT_ID))
+        obs, reward, done, info = super().step(actions)
+        done_all = done['__all__']
+        return ({TEAM_AGENT_ID: self.group_observations(obs)},
+                {TEAM_AGENT_ID: float(sum(reward.values()))},
+                {TEAM_AGENT_ID: done_all, '__all__': done_all},
+                {TEAM_AGENT_ID: {"actors": len(obs), "truncated": self.truncated}})
+
+    def group_observations(self, obs):
+        """Stack a {actor_id: obs} dict into the padded team observation"""
+        space = self.observation_space["obs"]
+        grouped = np.zeros(space.shape, dtype=space.dtype)
+        mask = np.zeros(self.max_actors, dtype=np.float32)
+        self.actor_ids = list(obs)[:self.max_actors]
+        self.truncated = len(obs) - len(self.actor_ids)
+        if self.truncated:
+            logger.debug(f"{self.truncated} actors over max_actors={self.max_actors} left out")
+        for row, actor_id in enumerate(self.actor_ids):
+            grouped[row] = obs[actor_id]
+        mask[:len(self.actor_ids)] = 1
+        return {"obs": grouped, "mask": mask}
+
+    def ungroup_actions(self, actions):
+        """The team action as the {actor_id: action} dict of the last observed actors"""
+        if actions is None:
+            return {}
+        return dict(zip(self.actor_ids, np.asarray(actions).tolist()))
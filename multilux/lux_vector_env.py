@@ -0,0 +1,181 @@
+"""
+Batched Lux AI environment for RLlib: one BaseEnv that owns N LuxEnv games.
+
+RLlib polls all N games at once, so a single policy forward pass serves the
+actors of every game on the worker, and finished games are reset right after
+their last step so the batch keeps N games running.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+from ray.rllib.env.base_env import BaseEnv
+
+from multilux.lux_engine import LuxTrainer
+from multilux.lux_env import LuxEnv
+from multilux.lux_interface import LuxDefaultInterface
+from multilux.policy_pool import PoolOpponent
+from multilux.recorder import EpisodeRecorder
+
+
+class _GameState:
+    """Results of the last reset/step of one game, waiting to be polled"""
+
+    def __init__(self, env):
+        self.env = env
+        self.initialized = False
+        self.pending = None  # (obs, rewards, dones, infos) not yet polled
+        self.reset_obs = None  # obs of an automatic reset, for try_reset()
+
+    def reset(self):
+        obs = self.env.reset()
+        self.initialized = True
+        return obs
+
+    def set_reset(self, obs):
+        rewards = {a: None for a in obs}
+        dones = {a: False for a in obs}
+        dones['__all__'] = False
+        infos = {a: {} for a in obs}
+        self.pending = (obs, rewards, dones, infos)
+
+
+class LuxVectorEnv(BaseEnv):
+    """
+    Owns `num_envs` LuxEnv games and steps them together.
+
+    The RLlib BaseEnv API is:
+        poll()          -> obs, rewards, dones, infos, off_policy_actions, as
+                           {env_id: {actor_id: value}} for every game that
+                           has new data
+        send_actions()  <- {env_id: {actor_id: action}}
+        try_reset()     -> obs of a game whose episode finished
+
+    With auto_reset=True a finished game is reset as soon as its last step
+    has been taken (in send_actions), so try_reset() only hands over the
+    already computed first observation.
+
+    :param num_envs: (Int) number of games
+    :param auto_reset: (Bool) reset finished games immediately
+    :param profile: (Bool) time the phases of each game (see LuxEnv)
+    :param engine: (Str) 'kaggle' or 'native', see LuxEnv
+    :param opponent_pool: (multilux.policy_pool.PolicyPool) play the
+                   opponent from these snapshots, with the other agent of
+                   `agents` as fallback while the pool is empty. With the
+                   native engine the opponent actions of all games are
+                   inferred together before each step.
+    :param record_dir: (Str) record the episodes of every game into this
+                   directory, with an EpisodeRecorder per game
+    The remaining parameters are passed to each LuxEnv.
+    """
+    def __init__(self, configuration, debug,
+                 interface=LuxDefaultInterface,
+                 agents=(None, "simple_agent"),
+                 num_envs=1,
+                 auto_reset=True,
+                 profile=False,
+                 engine='kaggle',
+                 opponent_pool=None,
+                 record_dir=None):
+        logger.debug(f'Init LuxVectorEnv with {num_envs} games')
+
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+        self.profile = profile
+        self.engine = engine
+        self.opponent_pool = opponent_pool
+        self.record_dir = record_dir
+        self.envs = self._make_envs(configuration, debug, interface, agents)
+        self.games = [_GameState(env) for env in self.envs]
+
+    def _make_envs(self, configuration, debug, interface, agents):
+        return [LuxEnv(configuration, debug, interface=interface, agents=self._game_agents(interface, agents),
+                       engine=self.engine, profile=self.profile,
+                       recorder=None if self.record_dir is None else EpisodeRecorder(self.record_dir))
+                for _ in range(self.num_envs)]
+
+    def _game_agents(self, interface, agents):
+        """agents of one game, with a PoolOpponent of its own if there is a pool"""
+        if self.opponent_pool is None:
+            return agents
+        return tuple(None if agent is None else PoolOpponent(self.opponent_pool, interface, fallback=agent)
+                     for agent in agents)
+
+    def _act_opponents(self, games):
+        """Infer the pool opponent actions of the given native-engine games in one batch"""
+        if self.opponent_pool is None:
+            return
+        opponents = [(game.env.env.opponent_agent, game.env.env.opponent_observation) for game in games
+                     if isinstance(game.env.env, LuxTrainer)]
+        self.opponent_pool.act(opponents)
+
+    def _reset_games(self, games):
+        """Reset the given games, returns their first observations"""
+        return [game.reset() for game in games]
+
+    def _step_games(self, games, actions):
+        """Step the given games, returns their (obs, rewards, dones, infos)"""
+        return [game.env.step(a) for game, a in zip(games, actions)]
+
+    def poll(self):
+        new_games = [game for game in self.games if not game.initialized]
+        for game, obs in zip(new_games, self._reset_games(new_games)):
+            game.set_reset(obs)
+        obs, rewards, dones, infos = {}, {}, {}, {}
+        for env_id, game in enumerate(self.games):
+            if game.pending is None:
+                continue
+            obs[env_id], rewards[env_id], dones[env_id], infos[env_id] = game.pending
+            game.pending = None
+        return obs, rewards, dones, infos, {}
+
+    def send_actions(self, action_dict):
+        games = [self.games[env_id] for env_id in action_dict]
+        self._act_opponents(games)
+        finished = []
+        for game, results in zip(games, self._step_games(games, action_dict.values())):
+            game.pending = results
+            if self.auto_reset and results[2].get('__all__', False):
+                finished.append(game)
+        for game, obs in zip(finished, self._reset_games(finished)):
+            game.reset_obs = obs
+
+    def try_reset(self, env_id=None):
+        game = self.games[env_id]
+        obs, game.reset_obs = game.reset_obs, None
+        if obs is None:
+            obs = game.reset()
+        # the reset observation is returned here, not polled again
+        game.pending = None
+        return obs
+
+    def vector_reset(self):
+        """Reset all games, returns a list with the obs dict of each game"""
+        obs = self._reset_games(self.games)
+        for game in self.games:
+            game.pending = game.reset_obs = None
+        return obs
+
+    def vector_step(self, action_dicts):
+        """
+        Step all games outside of RLlib.
+
+        :param action_dicts: (List) one actions dict per game
+        :return: lists of obs, rewards, dones and infos dicts, one per game.
+                 With auto_reset, the obs of a finished game is the first
+                 observation of its next episode.
+        """
+        self.send_actions(dict(enumerate(action_dicts)))
+        obs, rewards, dones, infos = [], [], [], []
+        for game in self.games:
+            (o, r, d, i), game.pending = game.pending, None
+            if game.reset_obs is not None:
+                o, game.reset_obs = game.reset_obs, None
+            obs.append(o)
+            rewards.append(r)
+            dones.append(d)
+            infos.append(i)
+        return obs, rewards, dones, infos
+
+    def get_unwrapped(self):
+        return self.envs
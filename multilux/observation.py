@@ -0,0 +1,199 @@
+"""
+Spatial observations: the game state rendered as one (C, H, W) tensor per
+turn, with an egocentric (C, 2r+1, 2r+1) crop around each actor.
+
+The tensor is the interior of a preallocated buffer padded by r tiles on
+each side, so the crop around any tile is a plain strided view of the
+buffer. Nothing is allocated per turn except for gather().
+
+    spatial = SpatialObservation(radius=5)
+    spatial.render(game)              # one pass over the state
+    spatial.tensor                    # (C, H, W) view
+    spatial.crop(x, y)                # (C, 11, 11) view, no copy
+    spatial.gather(actors)            # {actor id: (C, 11, 11)}, one copy
+
+Views are overwritten by the next render(). Observations handed to RLlib
+are kept until the batch is built, so return gather() from an interface,
+not crops.
+"""
+import numpy as np
+
+from lux.constants import Constants
+from lux.game_constants import PARAMETERS
+from lux.parser import RESOURCE_CODES
+
+DAY_LENGTH = PARAMETERS.DAY_LENGTH
+CYCLE_LENGTH = DAY_LENGTH + PARAMETERS.NIGHT_LENGTH
+
+# channel: scale applied to the raw value
+CHANNELS = {
+    "in_map": 1,                # 1 on the map, 0 in the padding
+    "wood": 1 / PARAMETERS.MAX_WOOD_AMOUNT,
+    "coal": 1 / PARAMETERS.MAX_WOOD_AMOUNT,
+    "uranium": 1 / PARAMETERS.MAX_WOOD_AMOUNT,
+    "road": 1 / PARAMETERS.MAX_ROAD,
+    "own_citytile": 1,
+    "opponent_citytile": 1,
+    "citytile_cooldown": 1 / PARAMETERS.CITY_ACTION_COOLDOWN,
+    "city_nights": 1 / PARAMETERS.NIGHT_LENGTH,  # nights the tile's city can light
+    "own_workers": 1,
+    "own_carts": 1,
+    "opponent_units": 1,
+    "own_cargo": 1 / PARAMETERS.RESOURCE_CAPACITY.WORKER,
+    "unit_cooldown": 1 / PARAMETERS.UNIT_ACTION_COOLDOWN.WORKER,
+    "night": 1,
+    "turn": 1 / PARAMETERS.MAX_DAYS,
+}
+CHANNEL_INDEX = {name: i for i, name in enumerate(CHANNELS)}
+
+
+class SpatialObservation:
+    """
+    Renders a lux.game.Game into a padded (C, H + 2r, W + 2r) buffer.
+
+    The resource, road and citytile channels are copied straight from the
+    planes of a lux.array_map.ArrayGameMap; with a GameMap they are read
+    from the cells. Units and citytiles are scattered in bulk.
+
+    :param radius: (Int) crops are (C, 2 * radius + 1, 2 * radius + 1)
+    :param dtype: np.float32 or np.float16
+    """
+    def __init__(self, radius=5, dtype=np.float32):
+        self.radius = radius
+        self.size = 2 * radius + 1
+        self.dtype = np.dtype(dtype)
+        self._buffers = {}  # {(width, height): (buffer, tensor, windows)}
+        self.buffer = self.tensor = self.windows = None
+
+    def observation_space(self):
+        """gym Box of one crop"""
+        # gym is only needed here, rendering runs without it (e.g. in an exported agent)
+        from gym import spaces
+        return spaces.Box(low=0, high=np.inf, shape=(len(CHANNELS), self.size, self.size),
+                          dtype=self.dtype)
+
+    def _allocate(self, width, height):
+        r = self.radius
+        buffer = np.zeros((len(CHANNELS), height + 2 * r, width + 2 * r), dtype=self.dtype)
+        tensor = buffer[:, r:r + height, r:r + width]
+        tensor[CHANNEL_INDEX["in_map"]] = 1
+        # windows[:, y, x] is the crop centred on map tile (x, y)
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, (self.size, self.size), axis=(1, 2))
+        return buffer, tensor, windows
+
+    def render(self, game, player=None):
+        """
+        Fill the tensor from the game state, seen from `player` (by default
+        the game's own player). Returns the (C, H, W) tensor.
+        """
+        if player is None:
+            player = game.id
+        key = (game.map_width, game.map_height)
+        buffers = self._buffers.get(key)
+        if buffers is None:
+            buffers = self._buffers[key] = self._allocate(*key)
+        self.buffer, self.tensor, self.windows = buffers
+        tensor = self.tensor
+        tensor[1:] = 0
+
+        self._render_map(game.map, tensor)
+        self._render_cities(game, player, tensor)
+        self._render_units(game, player, tensor)
+        tensor[CHANNEL_INDEX["night"]] = game.turn % CYCLE_LENGTH >= DAY_LENGTH
+        tensor[CHANNEL_INDEX["turn"]] = game.turn * CHANNELS["turn"]
+        return tensor
+
+    @staticmethod
+    def _render_map(game_map, tensor):
+        if hasattr(game_map, "resource_type"):
+            for code, name in enumerate(RESOURCE_CODES):
+                np.multiply(game_map.resource_type == code, game_map.resource_amount,
+                            out=tensor[CHANNEL_INDEX[name]], casting="unsafe")
+            np.copyto(tensor[CHANNEL_INDEX["road"]], game_map.road, casting="unsafe")
+        else:
+            resources = {name: ([], [], []) for name in RESOURCE_CODES}
+            roads = ([], [], [])
+            for row in game_map.map:
+                for cell in row:
+                    if cell.resource is not None:
+                        ys, xs, amounts = resources[cell.resource.type]
+                        ys.append(cell.pos.y)
+                        xs.append(cell.pos.x)
+                        amounts.append(cell.resource.amount)
+                    if cell.road:
+                        roads[0].append(cell.pos.y)
+                        roads[1].append(cell.pos.x)
+                        roads[2].append(cell.road)
+            for name, (ys, xs, amounts) in resources.items():
+                tensor[CHANNEL_INDEX[name], ys, xs] = amounts
+            tensor[CHANNEL_INDEX["road"], roads[0], roads[1]] = roads[2]
+        for name in RESOURCE_CODES + ("road",):
+            tensor[CHANNEL_INDEX[name]] *= CHANNELS[name]
+
+    @staticmethod
+    def _render_cities(game, player, tensor):
+        # flat lists convert to arrays much faster than lists of tuples
+        values = []
+        for p in game.players:
+            for city in p.cities.values():
+                nights = city.fuel / city.light_upkeep if city.light_upkeep else 0
+                for citytile in city.citytiles:
+                    values += (citytile.pos.y, citytile.pos.x, p.team, citytile.cooldown, nights)
+        if not values:
+            return
+        ys, xs, team, cooldown, nights = np.array(values, dtype=np.float64).reshape(-1, 5).T
+        ys, xs, own = ys.astype(np.intp), xs.astype(np.intp), team == player
+        tensor[CHANNEL_INDEX["own_citytile"], ys[own], xs[own]] = 1
+        tensor[CHANNEL_INDEX["opponent_citytile"], ys[~own], xs[~own]] = 1
+        tensor[CHANNEL_INDEX["citytile_cooldown"], ys, xs] = cooldown * CHANNELS["citytile_cooldown"]
+        tensor[CHANNEL_INDEX["city_nights"], ys, xs] = nights * CHANNELS["city_nights"]
+
+    @staticmethod
+    def _render_units(game, player, tensor):
+        values = [value for p in game.players for unit in p.units
+                  for value in (unit.pos.y, unit.pos.x, p.team, unit.type, unit.cooldown,
+                                unit.cargo.wood + unit.cargo.coal + unit.cargo.uranium)]
+        if not values:
+            return
+        height, width = tensor.shape[1:]
+        ys, xs, team, u_type, cooldown, cargo = np.array(values, dtype=np.float64).reshape(-1, 6).T
+        ys, xs, own = ys.astype(np.intp), xs.astype(np.intp), team == player
+        # units on the same tile add up
+        tiles = ys * width + xs
+
+        def count(channel, mask, weights=None):
+            counts = np.bincount(tiles[mask], None if weights is None else weights[mask],
+                                 minlength=height * width)
+            tensor[CHANNEL_INDEX[channel]] = counts.reshape(height, width)
+
+        is_worker = u_type == Constants.UNIT_TYPES.WORKER
+        count("opponent_units", ~own)
+        count("own_workers", own & is_worker)
+        count("own_carts", own & ~is_worker)
+        count("own_cargo", own, cargo * CHANNELS["own_cargo"])
+        np.maximum.at(tensor[CHANNEL_INDEX["unit_cooldown"]], (ys[own], xs[own]),
+                      cooldown[own] * CHANNELS["unit_cooldown"])
+
+    def crop(self, x, y):
+        """(C, 2r+1, 2r+1) view centred on tile (x, y), zero outside the map"""
+        return self.windows[:, y, x]
+
+    def crops(self, actors):
+        """{actor id: crop view}, valid until the next render()"""
+        windows = self.windows
+        return {a.id: windows[:, a.pos.y, a.pos.x] for a in actors}
+
+    def gather(self, actors):
+        """
+        Crops of all actors copied at once into a new (N, C, 2r+1, 2r+1)
+        array. Returns {actor id: crop}, each crop a view of that array.
+        """
+        if not actors:
+            return {}
+        ys = np.fromiter((a.pos.y for a in actors), dtype=np.intp, count=len(actors))
+        xs = np.fromiter((a.pos.x for a in actors), dtype=np.intp, count=len(actors))
+        return dict(zip([a.id for a in actors], self.gather_positions(xs, ys)))
+
+    def gather_positions(self, xs, ys):
+        """Crops centred on tiles (xs[i], ys[i]) as a new (N, C, 2r+1, 2r+1) array"""
+        return self.windows.transpose(1, 2, 0, 3, 4)[ys, xs]
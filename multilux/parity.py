@@ -0,0 +1,123 @@
+"""
+Parity checks between multilux.lux_engine.LuxEngine and the kaggle engine.
+
+Each seeded episode resets the kaggle engine, loads its initial state into a
+LuxEngine, then plays both with the same seeded random actions for both
+teams and compares the `updates` messages after every turn.
+
+    python -m multilux.parity --seeds 0 1 2 3 --steps 360
+
+Exits with status 1 if any episode diverges. Needs kaggle_environments.
+"""
+import argparse
+import random
+import sys
+
+from lux.game import Game
+from multilux.lux_engine import LuxEngine
+
+MOVES = ("n", "e", "s", "w", "c")
+RESOURCES = ("wood", "coal", "uranium")
+
+
+def random_actions(game, team, rng):
+    """Random but mostly valid actions for every actor of a team"""
+    player = game.players[team]
+    actions = []
+    for unit in player.units:
+        if not unit.can_act():
+            continue
+        roll = rng.random()
+        if unit.is_worker() and unit.can_build(game.map) and roll < 0.3:
+            actions.append(unit.build_city())
+        elif roll < 0.05:
+            actions.append(unit.pillage())
+        elif roll < 0.15 and unit.get_cargo_space_left() < 100:
+            others = [u for u in player.units if u is not unit and u.pos.distance_to(unit.pos) <= 1]
+            if others:
+                resource = rng.choice(RESOURCES)
+                actions.append(unit.transfer(rng.choice(others).id, resource, rng.randrange(1, 60)))
+        else:
+            actions.append(unit.move(rng.choice(MOVES)))
+    for city in player.cities.values():
+        for citytile in city.citytiles:
+            if not citytile.can_act():
+                continue
+            roll = rng.random()
+            if roll < 0.4:
+                actions.append(citytile.research())
+            elif roll < 0.8:
+                actions.append(citytile.build_worker())
+            elif roll < 0.9:
+                actions.append(citytile.build_cart())
+    return actions
+
+
+def _state_messages(updates):
+    return {m for m in updates if m != "D_DONE"}
+
+
+def check_episode(seed, steps=360, configuration=None):
+    """
+    Play one seeded episode on both engines.
+
+    :return: None if both engines agree on every turn, else a dict with the
+             turn and the messages only one of them produced
+    """
+    from kaggle_environments import make
+
+    configuration = dict(configuration or {}, seed=seed)
+    kaggle_env = make("lux_ai_2021", configuration=configuration, debug=False)
+    states = kaggle_env.reset(2)
+    updates = states[0].observation.updates
+
+    engine = LuxEngine(configuration)
+    engine.load_updates(updates)
+    game = Game()
+    game._initialize(updates)
+    game._update(updates[2:])
+    rng = random.Random(seed)
+
+    for turn in range(1, steps + 1):
+        actions = [random_actions(game, team, rng) for team in (0, 1)]
+        states = kaggle_env.step(actions)
+        kaggle_updates = states[0].observation.updates
+        native_updates = engine.step(actions)
+
+        expected, actual = _state_messages(kaggle_updates), _state_messages(native_updates)
+        if expected != actual:
+            return {"seed": seed, "turn": turn, "actions": actions,
+                    "kaggle_only": sorted(expected - actual),
+                    "native_only": sorted(actual - expected)}
+        if kaggle_env.done:
+            break
+        game._update(kaggle_updates)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", type=int, nargs="+", default=list(range(8)))
+    parser.add_argument("--steps", type=int, default=360)
+    parser.add_argument("--size", type=int, default=None, help="map width/height")
+    args = parser.parse_args(argv)
+
+    configuration = {"width": args.size, "height": args.size} if args.size else {}
+    failures = 0
+    for seed in args.seeds:
+        mismatch = check_episode(seed, args.steps, configuration)
+        if mismatch is None:
+            print(f"seed {seed}: ok")
+            continue
+        failures += 1
+        print(f"seed {seed}: diverged at turn {mismatch['turn']}")
+        for line in mismatch["kaggle_only"][:10]:
+            print(f"    kaggle: {line}")
+        for line in mismatch["native_only"][:10]:
+            print(f"    native: {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Self-play against frozen snapshots of the trained policies.
+
+A PolicyPool keeps the last few weight snapshots of the policies being
+trained. A PoolOpponent is a LuxEnv opponent agent that draws one snapshot
+per episode and acts with it through the same interface the trained side
+uses:
+
+    pool = PolicyPool(max_size=10)
+    env = LuxVectorEnv(configuration, False, interface=MyInterface,
+                       engine='native', num_envs=8, opponent_pool=pool)
+
+With engine='native', LuxVectorEnv infers the opponent actions of all its
+games before stepping them, in one forward pass per snapshot and policy
+(PolicyPool.act). With the kaggle engine, each opponent infers its own
+actions when the engine calls it.
+
+SelfPlayCallbacks (multilux.callbacks) adds a snapshot to the pools of all
+games on all workers every `refresh_every` training iterations, so the
+workers keep running.
+Until the first snapshot, opponents play their fallback agent.
+"""
+import logging
+import random
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+from multilux.lux_engine import AGENTS
+
+
+class PolicyPool:
+    """
+    :param policies: (Dict) {policy_id: Policy} used for the opponents'
+                     inference. Their weights are replaced by the snapshots,
+                     so they must not be trained. SelfPlayCallbacks sets them
+                     to the workers' policies if left empty.
+    :param policy_mapping_fn: (Callable) opponent actor id -> policy id, by
+                     default the only policy
+    :param max_size: (Int) snapshots kept, the oldest is dropped first
+    :param latest_prob: (Float) probability that an episode is played against
+                     the latest snapshot, otherwise one is drawn uniformly
+    :param seed: (Int) seed of the snapshot draws
+    """
+    def __init__(self, policies=None, policy_mapping_fn=None, max_size=10, latest_prob=0.5, seed=None):
+        self.policies = dict(policies or {})
+        self.policy_mapping_fn = policy_mapping_fn
+        self.max_size = max_size
+        self.latest_prob = latest_prob
+        self.snapshots = OrderedDict()  # {version: {policy_id: weights}}
+        self.forward_passes = 0
+        self._loaded = {}  # {policy_id: version whose weights it holds}
+        self._rng = random.Random(seed)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    @property
+    def versions(self):
+        return list(self.snapshots)
+
+    def add(self, version, weights):
+        """
+        Keep a snapshot, unless one with this version is already kept.
+
+        :param version: (Hashable) e.g. the training iteration
+        :param weights: (Dict) {policy_id: weights} as from Policy.get_weights()
+        :return: (Bool) whether it was added
+        """
+        if version in self.snapshots:
+            return False
+        self.snapshots[version] = weights
+        while len(self.snapshots) > self.max_size:
+            dropped, _ = self.snapshots.popitem(last=False)
+            logger.debug(f"Snapshot {dropped} dropped from the pool")
+        return True
+
+    def sample(self):
+        """Version to play an episode against, None if the pool is empty"""
+        if not self.snapshots:
+            return None
+        if self._rng.random() < self.latest_prob:
+            return next(reversed(self.snapshots))
+        return self._rng.choice(self.versions)
+
+    def policy_id(self, actor_id):
+        if self.policy_mapping_fn is None:
+            return next(iter(self.policies))
+        return self.policy_mapping_fn(actor_id)
+
+    def compute_actions(self, version, policy_id, obs_batch, weights=None):
+        """
+        Actions of one batch of observations with a snapshot's weights.
+        weights are those of the snapshot, for snapshots already dropped.
+        """
+        policy = self.policies[policy_id]
+        if self._loaded.get(policy_id) != version:
+            weights = weights or self.snapshots[version]
+            policy.set_weights(weights[policy_id])
+            self._loaded[policy_id] = version
+        self.forward_passes += 1
+        return policy.compute_actions(obs_batch, explore=False)[0]
+
+    def act(self, opponents):
+        """
+        Set the next actions of several opponents, with one forward pass
+        per (snapshot, policy) over all their actors.
+
+        :param opponents: (List) (PoolOpponent, observation) pairs
+        """
+        groups = {}  # {(version, policy_id): (opponent rows, actor ids, observations)}
+        weights = {}  # {version: weights}
+        observed = []
+        for row, (opponent, observation) in enumerate(opponents):
+            actor_obs = opponent.observe(observation)
+            observed.append(actor_obs is not None)
+            weights[opponent.version] = opponent.weights
+            for actor_id, obs in (actor_obs or {}).items():
+                rows, actor_ids, batch = groups.setdefault((opponent.version, self.policy_id(actor_id)), ([], [], []))
+                rows.append(row)
+                actor_ids.append(actor_id)
+                batch.append(obs)
+        actions = [{} for _ in opponents]
+        for (version, policy_id), (rows, actor_ids, batch) in groups.items():
+            batch_actions = self.compute_actions(version, policy_id, np.stack(batch), weights[version])
+            for row, actor_id, action in zip(rows, actor_ids, batch_actions):
+                actions[row][actor_id] = action
+        for (opponent, _), has_obs, opponent_actions in zip(opponents, observed, actions):
+            if has_obs:
+                opponent.set_actions(opponent_actions)
+
+
+class PoolOpponent:
+    """
+    Opponent agent(observation, configuration) playing a PolicyPool snapshot
+    drawn at the start of each episode. Episodes that start while the pool
+    is empty are played by `fallback`.
+
+    :param pool: (PolicyPool)
+    :param interface: (LuxDefaultInterface) class converting the opponent's
+                      observations and actions, as for the trained side,
+                      LuxDefaultInterface by default
+    :param fallback: (Str or Callable) a multilux.lux_engine agent name
+                     ("simple_agent", "idle") or agent(observation, configuration)
+    :param version: (Hashable) always play this snapshot instead of drawing
+                     one, e.g. for evaluation (see multilux.league)
+    """
+    def __init__(self, pool, interface=None, fallback="idle", version=None):
+        if interface is None:
+            # imported here: it needs gym, which leagues of scripted agents do not
+            from multilux.lux_interface import LuxDefaultInterface
+            interface = LuxDefaultInterface
+        self.pool = pool
+        self.interface_class = interface
+        self.fallback = fallback
+        self.fixed_version = version
+        self.version = None
+        self.weights = None
+        self.interface = None
+        self._fallback_agent = None
+        self._observation = None  # observation of the last observe()
+        self._obs = None          # its per-actor observations
+        self._actions = None      # commands set by set_actions(), not yet taken
+
+    def observe(self, observation):
+        """
+        Per-actor observations of the opponent's turn, or None if the
+        episode is played by the fallback. Calling it again with the same
+        observation returns the same observations.
+        """
+        if observation is self._observation:
+            return self._obs
+        self._observation = observation
+        self._actions = None
+        if observation["step"] == 0:
+            self.version = self.pool.sample() if self.fixed_version is None else self.fixed_version
+            # kept for the episode, even if the pool drops the snapshot
+            self.weights = self.pool.snapshots.get(self.version)
+            self.interface = None
+            if self.version is None:
+                self._fallback_agent = AGENTS[self.fallback]() if isinstance(self.fallback, str) else self.fallback
+        if self.version is None:
+            self._obs = None
+            return None
+        if self.interface is None:
+            self.interface = self.interface_class(observation)
+        else:
+            self.interface.game_state = self.interface.game.update(observation)
+        game = self.interface.game
+        actors = game.get_team_actors(teams=(game.player_id,), flat=True)
+        self._obs = self.interface.observation(observation, actors)
+        return self._obs
+
+    def set_actions(self, actions):
+        """:param actions: (Dict) {actor_id: action} for this turn"""
+        self._actions = self.interface.actions(actions)
+
+    def __call__(self, observation, configuration):
+        if self.observe(observation) is None:
+            return self._fallback_agent(observation, configuration)
+        if self._actions is None:
+            self.pool.act([(self, observation)])
+        actions, self._actions = self._actions, None
+        return actions
+
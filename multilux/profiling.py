@@ -0,0 +1,184 @@
+"""
+Per-phase timing of LuxEnv.reset/step, exported to RLlib per episode.
+
+LuxEnv(profile=True) times each phase of every step and reset:
+
+    reset_env, reset_interface, observation         LuxEnv.reset
+    actions, env_step                               LuxEnv.step
+    update, actors, observation, reward, done, info LuxDefaultInterface.ordi
+
+and keeps one record per step with the turn and the number of actors.
+multilux.callbacks.ProfilingCallbacks puts them in the episode's
+hist_data (per-step values) and custom_metrics (means, also per map size
+and game phase), e.g.
+
+    config["callbacks"] = ProfilingCallbacks
+    env_creator = lambda env_config: LuxEnv(..., profile=True)
+
+With profile=False the env uses DISABLED, whose start/stop return at once.
+"""
+import sys
+import time
+from collections import deque
+
+# turns at which the early and mid game end, for the per game phase metrics
+GAME_PHASES = ((120, "early"), (240, "mid"), (float("inf"), "late"))
+
+
+class PhaseTimer:
+    """
+    Wall time (and optionally allocated memory blocks) per phase and step.
+
+        t = timer.start()
+        ...
+        t = timer.stop("phase", t)  # records and restarts
+        ...
+        timer.end_step(turn, n_actors)
+
+    :param enabled: (Bool) False makes start/stop/end_step no-ops
+    :param track_allocations: (Bool) also record the change in
+                      sys.getallocatedblocks() per phase. This walks the
+                      allocator's arenas, expect tens of microseconds per call.
+    :param max_episodes: (Int) finished episodes kept until popped
+    """
+    def __init__(self, enabled=True, track_allocations=False, max_episodes=8):
+        self.enabled = enabled
+        self.track_allocations = track_allocations
+        self.map_size = None
+        self.last_step = {}  # {phase: seconds} of the last completed step
+        self._finished = deque(maxlen=max_episodes)
+        self._clear_episode()
+
+    def _clear_episode(self):
+        self._turns = []
+        self._actors = []
+        self._steps = []
+        self._step = {}
+        self._blocks = []
+        self._step_blocks = {}
+        self._last_blocks = None
+
+    def start(self):
+        if not self.enabled:
+            return None
+        if self.track_allocations:
+            self._last_blocks = sys.getallocatedblocks()
+        return time.perf_counter()
+
+    def stop(self, phase, started):
+        """Record the time since `started` under phase, returns the new start"""
+        if started is None:
+            return None
+        now = time.perf_counter()
+        self._step[phase] = self._step.get(phase, 0.0) + now - started
+        if self.track_allocations:
+            blocks = sys.getallocatedblocks()
+            self._step_blocks[phase] = self._step_blocks.get(phase, 0) + blocks - self._last_blocks
+            self._last_blocks = blocks
+            return time.perf_counter()
+        return now
+
+    def end_step(self, turn, n_actors):
+        if not self.enabled:
+            return
+        self._turns.append(turn)
+        self._actors.append(n_actors)
+        self._steps.append(self._step)
+        self.last_step = self._step
+        self._step = {}
+        if self.track_allocations:
+            self._blocks.append(self._step_blocks)
+            self._step_blocks = {}
+
+    def new_episode(self, map_size=None):
+        """Close the current episode (if it has steps) and start another one"""
+        if not self.enabled:
+            return
+        if self._steps:
+            self._finished.append(self._episode_stats())
+        self._clear_episode()
+        self.map_size = map_size
+
+    def pop_episode(self):
+        """
+        Stats of the oldest episode not popped yet. If all finished episodes
+        have been popped, the current one is closed and returned.
+
+        :return: (Dict) map_size, turns and actors (one value per step),
+                 phases {phase: [ms per step]} and, when tracking
+                 allocations, blocks {phase: [blocks per step]}
+        """
+        if self._finished:
+            return self._finished.popleft()
+        stats = self._episode_stats()
+        self._clear_episode()
+        return stats
+
+    def pop_episodes(self):
+        """Stats of all episodes not popped yet, oldest first, the current one closed"""
+        episodes = list(self._finished)
+        self._finished.clear()
+        episodes.append(self.pop_episode())
+        return episodes
+
+    def _episode_stats(self):
+        phases = {}
+        for i, step in enumerate(self._steps):
+            for phase, seconds in step.items():
+                phases.setdefault(phase, [0.0] * len(self._steps))[i] = seconds * 1e3
+        stats = {"map_size": self.map_size, "turns": self._turns,
+                 "actors": self._actors, "phases": phases}
+        if self.track_allocations:
+            blocks = {}
+            for i, step in enumerate(self._blocks):
+                for phase, count in step.items():
+                    blocks.setdefault(phase, [0] * len(self._blocks))[i] = count
+            stats["blocks"] = blocks
+        return stats
+
+
+DISABLED = PhaseTimer(enabled=False)
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def game_phase(turn):
+    for end, name in GAME_PHASES:
+        if turn < end:
+            return name
+
+
+def record_episode(episode, stats, prefix="multilux"):
+    """Put PhaseTimer.pop_episode() stats into an RLlib episode"""
+    phases = stats["phases"]
+    if not phases:
+        return
+    n = len(stats["turns"])
+    step_ms = [sum(times[i] for times in phases.values()) for i in range(n)]
+    for phase, times in phases.items():
+        episode.hist_data[f"{prefix}/{phase}_ms"] = times
+        # mean over the steps that ran the phase (reset phases run once)
+        episode.custom_metrics[f"{prefix}/{phase}_ms"] = _mean([ms for ms in times if ms])
+    episode.hist_data[f"{prefix}/step_ms"] = step_ms
+    episode.hist_data[f"{prefix}/actors"] = list(stats["actors"])
+    episode.custom_metrics[f"{prefix}/step_ms"] = _mean(step_ms)
+    episode.custom_metrics[f"{prefix}/actors_max"] = max(stats["actors"], default=0)
+    per_actor = [ms / actors for ms, actors in zip(step_ms, stats["actors"]) if actors]
+    episode.custom_metrics[f"{prefix}/step_ms_per_actor"] = _mean(per_actor)
+
+    # scaling by game phase and map size
+    by_phase = {}
+    for turn, ms in zip(stats["turns"], step_ms):
+        by_phase.setdefault(game_phase(turn), []).append(ms)
+    for name, values in by_phase.items():
+        episode.custom_metrics[f"{prefix}/step_ms_{name}"] = _mean(values)
+    if stats["map_size"] is not None:
+        width, height = stats["map_size"]
+        episode.custom_metrics[f"{prefix}/step_ms_{width}x{height}"] = _mean(step_ms)
+
+    for phase, counts in stats.get("blocks", {}).items():
+        episode.hist_data[f"{prefix}/{phase}_blocks"] = counts
+        episode.custom_metrics[f"{prefix}/{phase}_blocks"] = _mean(counts)
+
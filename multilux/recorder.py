@@ -0,0 +1,336 @@
+"""
+Episode recording into compressed columnar shards, and a memory-mapped
+dataset of their turns for imitation learning and offline RL.
+
+A shard holds one episode in two files:
+
+    <name>.bin    the columns, cut into chunks of `chunk_turns` turns, each
+                  column chunk zlib-compressed on its own
+    <name>.json   its index: columns (dtype, shape), byte ranges of every
+                  column chunk, number of turns, metadata. Written last, so
+                  a shard without it is incomplete and ignored.
+
+Columns are either per turn (one row per turn) or per actor (one row per
+actor of every turn, with the "actors" turn column giving the number of
+rows of each turn). EpisodeRecorder writes, for the recording team:
+
+    per turn   turn, state (the SpatialObservation (C, H, W) tensor), actors
+    per actor  x, y, kind (WORKER, CART or CITYTILE), action (-1 if none),
+               reward (received for the action on the next step)
+
+    env = LuxEnv(configuration, False, interface=MyInterface,
+                 recorder=EpisodeRecorder("episodes"))
+
+EpisodeDataset memory-maps the shards of a directory and decompresses
+only the chunks that samples fall into:
+
+    dataset = EpisodeDataset("episodes")
+    for turn in dataset.sample(256):
+        turn["state"], turn["action"], turn["reward"]
+"""
+import json
+import mmap
+import os
+import uuid
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from multilux.actor_registry import CITYTILE
+from multilux.observation import CHANNELS, SpatialObservation
+
+NO_ACTION = -1
+FORMAT_VERSION = 1
+
+
+class ShardWriter:
+    """
+    Writes one shard, a chunk at a time.
+
+    :param path: (Str) shard path without extension
+    :param chunk_turns: (Int) turns per chunk
+    :param compression_level: (Int) zlib level, 1 is fast and already
+                              shrinks the sparse state tensors a lot
+    """
+    def __init__(self, path, chunk_turns=32, compression_level=1):
+        self.path = path
+        self.chunk_turns = chunk_turns
+        self.compression_level = compression_level
+        self.columns = {}  # {name: {"dtype", "shape", "per"}}
+        self.chunks = []
+        self.turns = 0
+        self.actor_rows = 0
+        self._file = open(path + ".bin", "wb")
+        self._offset = 0
+        self._turn_rows = {}   # {name: [row per turn]} of the open chunk
+        self._actor_rows = {}  # {name: [array per turn]} of the open chunk
+
+    def __len__(self):
+        """turns appended"""
+        return self.turns + len(self._turn_rows.get("actors", ()))
+
+    def append(self, turn_values, actor_values=None):
+        """
+        Add a turn.
+
+        :param turn_values: (Dict) {column: scalar or array}, the same
+                            columns and shapes on every turn
+        :param actor_values: (Dict) {column: 1-D array}, one row per actor;
+                            sets the "actors" turn column
+        """
+        actor_values = actor_values or {}
+        counts = {len(values) for values in actor_values.values()}
+        if len(counts) > 1:
+            raise ValueError(f"Actor columns have different lengths {sorted(counts)}")
+        turn_values = dict(turn_values, actors=np.int32(counts.pop() if counts else 0))
+        for name, value in turn_values.items():
+            self._turn_rows.setdefault(name, []).append(value)
+        for name, values in actor_values.items():
+            self._actor_rows.setdefault(name, []).append(values)
+        if len(self._turn_rows["actors"]) >= self.chunk_turns:
+            self.flush()
+
+    def flush(self):
+        """Write the open chunk"""
+        if not self._turn_rows:
+            return
+        arrays = {name: np.stack([np.asarray(row) for row in rows]) for name, rows in self._turn_rows.items()}
+        n_turns = len(arrays["actors"])
+        n_actors = int(arrays["actors"].sum())
+        for name, rows in self._actor_rows.items():
+            arrays[name] = np.concatenate([np.asarray(row) for row in rows])
+        data = {}
+        for name, array in arrays.items():
+            per = "actor" if name in self._actor_rows else "turn"
+            column = {"dtype": array.dtype.str, "shape": list(array.shape[1:]), "per": per}
+            if self.columns.setdefault(name, column) != column:
+                raise ValueError(f"Column {name} changed from {self.columns[name]} to {column}")
+            compressed = zlib.compress(np.ascontiguousarray(array).tobytes(), self.compression_level)
+            self._file.write(compressed)
+            data[name] = [self._offset, len(compressed)]
+            self._offset += len(compressed)
+        self.chunks.append({"turns": [self.turns, self.turns + n_turns],
+                            "actors": [self.actor_rows, self.actor_rows + n_actors],
+                            "data": data})
+        self.turns += n_turns
+        self.actor_rows += n_actors
+        self._turn_rows = {}
+        self._actor_rows = {}
+
+    def close(self, **metadata):
+        """Write the last chunk and the index, which completes the shard"""
+        self.flush()
+        self._file.close()
+        index = {"version": FORMAT_VERSION, "turns": self.turns, "actor_rows": self.actor_rows,
+                 "columns": self.columns, "chunks": self.chunks, "metadata": metadata}
+        with open(self.path + ".json.tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(self.path + ".json.tmp", self.path + ".json")
+
+    def discard(self):
+        """Delete the shard instead of completing it"""
+        self._file.close()
+        os.remove(self.path + ".bin")
+
+
+class EpisodeRecorder:
+    """
+    Records the episodes of a LuxEnv, one shard per episode, named
+    episode_<random hex> so that several envs and workers can share a
+    directory. An episode cut off by a reset is kept, with
+    metadata["complete"] False.
+
+    Actions must be Discrete (one integer per actor). Rewards are looked up
+    by actor id in the next step's rewards, 0 for actors that died.
+
+    :param directory: (Str) created if needed
+    :param chunk_turns: (Int) see ShardWriter
+    :param compression_level: (Int) see ShardWriter
+    :param dtype: dtype of the recorded state tensor
+    """
+    def __init__(self, directory, chunk_turns=32, compression_level=1, dtype=np.float16):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_turns = chunk_turns
+        self.compression_level = compression_level
+        self.spatial = SpatialObservation(radius=0, dtype=dtype)
+        self.episodes = 0  # shards completed
+        self._writer = None
+        self._pending = None  # (turn, state, actor ids, (N, 3) x/y/kind) awaiting its actions
+
+    def begin(self, game):
+        """
+        Start an episode, after the reset.
+
+        :param game: (multilux.lux_game.LuxGame) the env interface's game
+        """
+        if self._writer is not None:
+            self._close(complete=False)
+        path = os.path.join(self.directory, f"episode_{uuid.uuid4().hex[:16]}")
+        self._writer = ShardWriter(path, self.chunk_turns, self.compression_level)
+        self._observe(game)
+
+    def record(self, action_dict, rewards, dones, game):
+        """
+        Write the last observed turn with the actions taken on it and the
+        rewards they got, then observe the new turn.
+
+        :param action_dict: (Dict) {actor id: action} passed to LuxEnv.step
+        :param rewards: (Dict) {actor id: reward} returned by it
+        :param dones: (Dict) its dones, the episode ends with "__all__"
+        :param game: (multilux.lux_game.LuxGame) the env interface's game
+        """
+        if self._writer is None:
+            return
+        turn, state, actor_ids, actors = self._pending
+        actions = np.fromiter((action_dict.get(actor_id, NO_ACTION) for actor_id in actor_ids),
+                              dtype=np.int32, count=len(actor_ids))
+        actor_rewards = np.fromiter((rewards.get(actor_id, 0) for actor_id in actor_ids),
+                                    dtype=np.float32, count=len(actor_ids))
+        self._writer.append({"turn": np.int16(turn), "state": state},
+                            {"x": actors[:, 0], "y": actors[:, 1], "kind": actors[:, 2].astype(np.int8),
+                             "action": actions, "reward": actor_rewards})
+        if dones.get("__all__"):
+            self._close(complete=True)
+        else:
+            self._observe(game)
+
+    def close(self):
+        """Write the episode in progress, if any"""
+        if self._writer is not None:
+            self._close(complete=False)
+
+    def _observe(self, game):
+        """keeps the state and actors of this turn until its actions are known"""
+        player = game.player_id
+        actors = game.registry.units((player,)) + game.registry.citytiles((player,))
+        values = [value for actor in actors
+                  for value in (actor.pos.x, actor.pos.y, getattr(actor, "type", CITYTILE))]
+        state = self.spatial.render(game.game_state, player).copy()
+        self._pending = (game.game_state.turn, state, [actor.id for actor in actors],
+                         np.array(values, dtype=np.int16).reshape(-1, 3))
+
+    def _close(self, complete):
+        """closes the episode's shard, discarding it when no turn was written"""
+        state = self._pending[1]
+        if len(self._writer):
+            self._writer.close(complete=complete, channels=list(CHANNELS),
+                               width=state.shape[2], height=state.shape[1])
+            self.episodes += 1
+        else:
+            # reset again before any step
+            self._writer.discard()
+        self._writer = None
+        self._pending = None
+
+
+class EpisodeDataset:
+    """
+    Turns of all complete shards of a directory (those with an index),
+    read through memory maps. Only the chunks that requested turns fall
+    into are decompressed, the last `cache_chunks` of them are kept.
+
+    :param directory: (Str)
+    :param cache_chunks: (Int) decompressed chunks kept
+    :param max_open: (Int) shard files kept memory-mapped
+    """
+    def __init__(self, directory, cache_chunks=32, max_open=64):
+        self.directory = directory
+        self.cache_chunks = cache_chunks
+        self.max_open = max_open
+        self.shards = []  # [(path without extension, index)]
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                path = os.path.join(directory, name[:-len(".json")])
+                with open(path + ".json") as f:
+                    index = json.load(f)
+                if index["turns"]:
+                    self.shards.append((path, index))
+        # global turn number of the first turn of each shard, and the total
+        self._starts = np.cumsum([0] + [index["turns"] for _, index in self.shards])
+        self._chunk_starts = [np.array([chunk["turns"][0] for chunk in index["chunks"]])
+                              for _, index in self.shards]
+        self._maps = OrderedDict()    # {shard: (file, mmap)}
+        self._chunks = OrderedDict()  # {(shard, chunk): {column: array}}
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    @property
+    def episodes(self):
+        return len(self.shards)
+
+    def __getitem__(self, i):
+        """
+        Turn i as {column: value}: turn columns as a scalar or array, actor
+        columns as an array with a row per actor
+        """
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"Turn {i} out of range for {len(self)} turns")
+        i %= len(self)
+        shard = int(np.searchsorted(self._starts, i, side="right")) - 1
+        turn = i - int(self._starts[shard])
+        chunk = int(np.searchsorted(self._chunk_starts[shard], turn, side="right")) - 1
+        columns, actor_starts = self._chunk(shard, chunk)
+        row = turn - int(self._chunk_starts[shard][chunk])
+        start, stop = actor_starts[row], actor_starts[row + 1]
+        per = self.shards[shard][1]["columns"]
+        return {name: array[row] if per[name]["per"] == "turn" else array[start:stop]
+                for name, array in columns.items()}
+
+    def sample(self, n, rng=None):
+        """n turns drawn uniformly over all turns, as from __getitem__"""
+        rng = np.random.default_rng(rng)
+        indices = rng.integers(len(self), size=n)
+        # read chunk by chunk, so each is decompressed once per call
+        turns = [None] * n
+        for position in np.argsort(indices, kind="stable").tolist():
+            turns[position] = self[int(indices[position])]
+        return turns
+
+    def episode(self, shard):
+        """All turns of a shard, {column: array}, actor columns concatenated"""
+        arrays = [self._chunk(shard, chunk)[0] for chunk in range(len(self.shards[shard][1]["chunks"]))]
+        return {name: np.concatenate([columns[name] for columns in arrays]) for name in arrays[0]}
+
+    def _chunk(self, shard, chunk):
+        """({column: array} of a chunk, actor row offsets of its turns)"""
+        key = (shard, chunk)
+        cached = self._chunks.get(key)
+        if cached is not None:
+            self._chunks.move_to_end(key)
+            return cached
+        path, index = self.shards[shard]
+        data = self._map(shard)
+        columns = {}
+        for name, (offset, size) in index["chunks"][chunk]["data"].items():
+            column = index["columns"][name]
+            raw = zlib.decompress(data[offset:offset + size])
+            columns[name] = np.frombuffer(raw, dtype=column["dtype"]).reshape([-1] + column["shape"])
+        actor_starts = np.concatenate([[0], np.cumsum(columns["actors"])]).tolist()
+        self._chunks[key] = cached = (columns, actor_starts)
+        if len(self._chunks) > self.cache_chunks:
+            self._chunks.popitem(last=False)
+        return cached
+
+    def _map(self, shard):
+        """read-only memory map of the shard's .bin file, closing the least recently used beyond max_open"""
+        if shard in self._maps:
+            self._maps.move_to_end(shard)
+            return self._maps[shard][1]
+        f = open(self.shards[shard][0] + ".bin", "rb")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[shard] = (f, data)
+        if len(self._maps) > self.max_open:
+            _, (old_file, old_data) = self._maps.popitem(last=False)
+            old_data.close()
+            old_file.close()
+        return data
+
+    def close(self):
+        for f, data in self._maps.values():
+            data.close()
+            f.close()
+        self._maps.clear()
+        self._chunks.clear()
@@ -0,0 +1,176 @@
+"""
+Bulk conversion of kaggle episode replays (env.toJSON() files) into the
+episode shards of multilux.recorder, for imitation learning from other
+agents' games.
+
+Replays are spread over a process pool. Each process parses its replay one
+turn at a time with lux.game.Game on an ArrayGameMap, i.e. with the bulk
+parser (lux.parser.parse_updates), and writes a shard per player named
+<replay file name>_p<player>, in the EpisodeRecorder layout:
+
+    per turn   turn, state (SpatialObservation tensor of the player), actors
+    per actor  x, y, kind, action (decoded from the player's commands of
+               the turn, -1 if none), reward (always 0, the game's final
+               rewards are in the shard metadata)
+
+Shards are complete once their index is written, so an interrupted run
+picks up where it stopped: replays whose shards are all complete are
+skipped.
+
+    python -m multilux.replay_ingest replays/*.json --output dataset --processes 8
+
+or ingest(paths, "dataset"), which returns the number of turns and turns
+per second.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from functools import partial
+
+import numpy as np
+
+from lux.array_map import ArrayGameMap
+from lux.game import Game
+from multilux.action_encoder import decode_commands
+from multilux.actor_registry import CITYTILE
+from multilux.observation import CHANNELS, SpatialObservation
+from multilux.recorder import ShardWriter
+
+logger = logging.getLogger(__name__)
+
+PLAYERS = (0, 1)
+
+
+def shard_path(output, replay_path, player):
+    name = os.path.splitext(os.path.basename(replay_path))[0]
+    return os.path.join(output, f"{name}_p{player}")
+
+
+def ingest_replay(path, output, players=PLAYERS, chunk_turns=32, compression_level=1, dtype=np.float16):
+    """
+    Write the shards of one replay that are not complete already.
+
+    :return: (Int) turns written per player, 0 if skipped
+    """
+    shards = {player: shard_path(output, path, player) for player in players}
+    shards = {player: shard for player, shard in shards.items() if not os.path.exists(shard + ".json")}
+    if not shards:
+        return 0
+    with open(path) as f:
+        replay = json.load(f)
+    steps = replay["steps"]
+
+    game = Game(map_class=ArrayGameMap)
+    spatial = SpatialObservation(radius=0, dtype=dtype)
+    writers = {player: ShardWriter(shard, chunk_turns, compression_level) for player, shard in shards.items()}
+    try:
+        # the commands of turn t are in the actions of step t + 1
+        for step in range(len(steps) - 1):
+            updates = steps[step][0]["observation"]["updates"]
+            if step == 0:
+                game._initialize(updates)
+                game._update(updates[2:])
+            else:
+                game._update(updates)
+            for player, writer in writers.items():
+                writer.append(*_turn(game, player, steps[step + 1][player].get("action") or (), spatial))
+    except Exception:
+        # no partial .bin files or open handles are left for a broken replay
+        for writer in writers.values():
+            writer.discard()
+        raise
+
+    rewards = replay.get("rewards") or [None] * len(PLAYERS)
+    team_names = (replay.get("info") or {}).get("TeamNames")
+    for player, writer in writers.items():
+        writer.close(complete=True, channels=list(CHANNELS), width=game.map_width, height=game.map_height,
+                     source=os.path.basename(path), episode_id=replay.get("id"), player=player,
+                     reward=rewards[player], opponent_reward=rewards[1 - player],
+                     team_name=team_names[player] if team_names else None)
+    return len(steps) - 1
+
+
+def _turn(game, player, commands, spatial):
+    """(turn values, actor values) of one player's turn"""
+    units = game.players[player].units
+    citytiles = [citytile for city in game.players[player].cities.values() for citytile in city.citytiles]
+    values = [value for unit in units for value in (unit.pos.x, unit.pos.y, unit.type)]
+    values += [value for citytile in citytiles for value in (citytile.pos.x, citytile.pos.y, CITYTILE)]
+    actors = np.array(values, dtype=np.int16).reshape(-1, 3)
+    unit_actions, citytile_actions = decode_commands(commands, [unit.id for unit in units],
+                                                     actors[len(units):, :2])
+    state = spatial.render(game, player).copy()
+    return ({"turn": np.int16(game.turn), "state": state},
+            {"x": actors[:, 0], "y": actors[:, 1], "kind": actors[:, 2].astype(np.int8),
+             "action": np.concatenate([unit_actions, citytile_actions]),
+             "reward": np.zeros(len(actors), dtype=np.float32)})
+
+
+def _ingest_task(path, **kwargs):
+    """(path, turns, error) of one replay, run in the pool"""
+    try:
+        return path, ingest_replay(path, **kwargs), None
+    except Exception as e:  # a broken replay must not stop the run
+        return path, 0, f"{type(e).__name__}: {e}"
+
+
+def ingest(paths, output, processes=None, players=PLAYERS, chunk_turns=32, compression_level=1,
+           start_method=None, log_every=10.0):
+    """
+    Ingest replays in a process pool, as they are read and parsed.
+
+    :param paths: (Iterable) replay JSON files
+    :param output: (Str) shard directory, created if needed
+    :param processes: (Int) pool size, by default the number of CPUs
+    :param start_method: (Str) multiprocessing start method, None for the
+                         platform default
+    :param log_every: (Float) seconds between progress log lines
+    :return: (Dict) replays ingested, skipped and failed (path: error),
+             turns written per player, seconds and turns_per_sec
+    """
+    os.makedirs(output, exist_ok=True)
+    task = partial(_ingest_task, output=output, players=players, chunk_turns=chunk_turns,
+                   compression_level=compression_level)
+    stats = {"replays": 0, "skipped": 0, "failed": {}, "turns": 0}
+    started = last_log = time.perf_counter()
+    with multiprocessing.get_context(start_method).Pool(processes) as pool:
+        for path, turns, error in pool.imap_unordered(task, paths):
+            if error is not None:
+                stats["failed"][path] = error
+                logger.warning(f"Replay {path} failed: {error}")
+            elif turns:
+                stats["replays"] += 1
+                stats["turns"] += turns
+            else:
+                stats["skipped"] += 1
+            now = time.perf_counter()
+            if now - last_log >= log_every:
+                last_log = now
+                logger.info(f"{stats['replays']} replays, {stats['turns']} turns, "
+                            f"{stats['turns'] / (now - started):.0f} turns/s")
+    stats["seconds"] = time.perf_counter() - started
+    stats["turns_per_sec"] = stats["turns"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert kaggle replays into episode shards")
+    parser.add_argument("replays", nargs="+", help="replay JSON files")
+    parser.add_argument("--output", required=True, help="shard directory")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--players", type=int, nargs="+", default=list(PLAYERS))
+    parser.add_argument("--chunk-turns", type=int, default=32)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    stats = ingest(args.replays, args.output, processes=args.processes, players=tuple(args.players),
+                   chunk_turns=args.chunk_turns)
+    json.dump(stats, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
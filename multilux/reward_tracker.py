@@ -0,0 +1,156 @@
+"""
+Per-actor reward shaping from the turn-to-turn changes of the game state.
+
+RewardTracker keeps last turn's cargo, liveness and team of every slot of
+the game's ActorRegistry, and each team's research points, so that one
+update() per turn gives the changes of all actors at once:
+
+    per actor  gathered     fuel value of the cargo gained
+               deposited    fuel value of the cargo handed in on an own citytile
+               built        citytiles built (by the unit standing on them)
+    per team   tiles_built, tiles_lost, units_lost, research
+
+Rewards are the weighted sum of an actor's own changes and its team's.
+
+    class MyInterface(LuxDefaultInterface):
+        def __init__(self, obs, initial_state=None):
+            super().__init__(obs, initial_state=initial_state)
+            self.rewards = RewardTracker(weights={"deposited": 0.01})
+
+        def reward(self, joint_reward, actors) -> dict:
+            self.rewards.update(self.game.registry, self.game_state)
+            return self.rewards.rewards(actors)
+"""
+import numpy as np
+
+from lux.city_features import FUEL_RATE
+from lux.game_constants import PARAMETERS
+from multilux.actor_registry import CITYTILE, NO_SLOT
+
+CITY_BUILD_COST = PARAMETERS.CITY_BUILD_COST
+ACTOR_DELTAS = ("gathered", "deposited", "built")
+TEAM_DELTAS = ("tiles_built", "tiles_lost", "units_lost", "research")
+DEFAULT_WEIGHTS = {
+    "gathered": 0.001,
+    "deposited": 0.002,
+    "built": 0.1,
+    "tiles_built": 0.05,
+    "tiles_lost": -0.05,
+    "units_lost": -0.05,
+    "research": 0.001,
+}
+
+
+class RewardTracker:
+    """
+    :param weights: (Dict) weight of each delta, missing ones are taken
+                    from DEFAULT_WEIGHTS
+    """
+    def __init__(self, weights=None):
+        unknown = set(weights or ()) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown reward deltas {sorted(unknown)}, expected some of {list(DEFAULT_WEIGHTS)}")
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self._actor_weights = np.array([self.weights[name] for name in ACTOR_DELTAS])
+        self._team_weights = np.array([self.weights[name] for name in TEAM_DELTAS])
+        self.reset()
+
+    def reset(self):
+        self.turn = -1
+        self._registry = None
+        self.actor_deltas = np.zeros((0, len(ACTOR_DELTAS)))  # by registry slot
+        self.team_deltas = np.zeros((2, len(TEAM_DELTAS)))
+        self.reward = np.zeros(0)                             # by registry slot
+        self._cargo = np.zeros((0, 3), dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._team = np.zeros(0, dtype=np.int8)
+        self._kind = np.zeros(0, dtype=np.int8)
+        self._research = np.zeros(2)
+
+    def _resize(self, capacity):
+        """grows the per-slot state of the last turn to the registry's capacity"""
+        grow = capacity - len(self._alive)
+        if grow > 0:
+            self._cargo = np.concatenate([self._cargo, np.zeros((grow, 3), dtype=np.int32)])
+            self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+            self._team = np.concatenate([self._team, np.zeros(grow, dtype=np.int8)])
+            self._kind = np.concatenate([self._kind, np.zeros(grow, dtype=np.int8)])
+
+    def update(self, registry, game):
+        """
+        Compute the changes since the previous call, once per turn after
+        the registry's update. A game restarting from turn 0 starts over.
+
+        :param registry: (multilux.actor_registry.ActorRegistry)
+        :param game: (lux.game.Game) the registry tracks
+        """
+        if registry.turn <= self.turn or registry.turn == 0:
+            self.reset()
+        first = self.turn < 0
+        self.turn = registry.turn
+        self._registry = registry
+        self._resize(registry.capacity)
+
+        alive, team, kind = registry.alive, registry.team, registry.kind
+        cargo, x, y = registry.cargo, registry.x, registry.y
+        # a slot freed this turn may already hold a new actor
+        new = alive & (registry.spawn_turn == registry.turn)
+        previous = self._alive & ~new
+        units = alive & (kind != CITYTILE)
+        citytiles = alive & (kind == CITYTILE)
+
+        shape = (2, game.map_height, game.map_width)
+        tile_team = np.maximum(team, 0)
+        # a city is built by the unit on the tile, which stays there
+        built = citytiles & new
+        built_plane = np.zeros(shape, dtype=bool)
+        built_plane[team[built], y[built], x[built]] = True
+        builders = units & previous & built_plane[tile_team, y, x]
+        # building spends wood first, then coal, then uranium
+        before = self._cargo.astype(np.int64)
+        spent = np.minimum(before, np.maximum(CITY_BUILD_COST - (np.cumsum(before, axis=1) - before), 0))
+        before -= np.where(builders[:, None], spent, 0)
+
+        gained = np.where((units & previous)[:, None], cargo - before, 0)
+        own_citytile = np.zeros(shape, dtype=bool)
+        own_citytile[team[citytiles], y[citytiles], x[citytiles]] = True
+        on_citytile = units & own_citytile[tile_team, y, x]
+        actor_deltas = np.zeros((registry.capacity, len(ACTOR_DELTAS)))
+        actor_deltas[:, 0] = np.maximum(gained, 0) @ FUEL_RATE
+        actor_deltas[:, 1] = np.where(on_citytile, np.maximum(-gained, 0) @ FUEL_RATE, 0)
+        actor_deltas[:, 2] = builders
+
+        died = self._alive & (~alive | new)
+        research = np.array([player.research_points for player in game.players], dtype=np.float64)
+        team_deltas = np.zeros((2, len(TEAM_DELTAS)))
+        team_deltas[:, 0] = np.bincount(team[built], minlength=2)
+        team_deltas[:, 1] = np.bincount(self._team[died & (self._kind == CITYTILE)], minlength=2)
+        team_deltas[:, 2] = np.bincount(self._team[died & (self._kind != CITYTILE)], minlength=2)
+        team_deltas[:, 3] = research - self._research
+        if first:
+            actor_deltas[:] = 0
+            team_deltas[:] = 0
+
+        self.actor_deltas = actor_deltas
+        self.team_deltas = team_deltas
+        self.reward = np.where(alive, actor_deltas @ self._actor_weights
+                               + (team_deltas @ self._team_weights)[tile_team], 0)
+
+        self._cargo = cargo.copy()
+        self._alive = alive.copy()
+        self._team = team.copy()
+        self._kind = kind.copy()
+        self._research = research
+
+    def rewards(self, actors) -> dict:
+        """
+        {actor id: reward} of the last update for the given actors, 0 for
+        actors the registry does not know
+        """
+        reward = self.reward.tolist()
+        slot = self._registry.slot
+        rewards = {}
+        for actor in actors:
+            actor_slot = slot(actor.id)
+            rewards[actor.id] = 0.0 if actor_slot == NO_SLOT else reward[actor_slot]
+        return rewards
@@ -0,0 +1,78 @@
+"""
+LRU cache of initial game states, keyed by (seed, width, height).
+
+Training runs usually cycle through a fixed set of seeds and map sizes. The
+step-0 messages of a map are parsed once, and later resets on the same map
+restore the game state from the parsed arrays instead of parsing again.
+"""
+from collections import OrderedDict
+
+from lux.parser import parse_updates
+
+
+class InitialState:
+    """
+    Step-0 data of one map: the `updates` messages and their
+    lux.parser.parse_updates arrays (initial resources, units, cities and
+    roads). The arrays are read-only as every restore shares them.
+
+    :param messages: (List) step-0 `updates`, including the player id and
+                     map size header
+    """
+    __slots__ = ("messages", "updates", "nbytes")
+
+    def __init__(self, messages):
+        self.messages = tuple(messages)
+        self.updates = parse_updates(self.messages[2:])
+        for array in self.updates:
+            array.setflags(write=False)
+        self.nbytes = sum(array.nbytes for array in self.updates) + sum(map(len, self.messages))
+
+
+class InitialStateCache:
+    """
+    Least recently used cache with hit/miss counters. Values are usually
+    InitialState, anything with an `nbytes` attribute is counted in nbytes.
+
+    :param maxsize: (Int) number of entries kept
+    """
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """The entry for key, or None. Counts a hit or a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        return sum(getattr(entry, "nbytes", 0) for entry in self._entries.values())
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "maxsize": self.maxsize, "nbytes": self.nbytes}
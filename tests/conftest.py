@@ -0,0 +1,75 @@
+"""
+Seeded native-engine games with random actions for both teams, the
+reference play most tests check the fast paths against.
+"""
+import random
+
+import pytest
+
+from lux.game import Game
+from multilux.lux_engine import LuxEngine
+from multilux.parity import random_actions
+
+
+def play(size, seed, turns=120, **game_kwargs):
+    """
+    Yield (engine, game, updates) after the reset and after every turn of a
+    seeded game. game is player 0's lux.game.Game, built with game_kwargs.
+    """
+    engine = LuxEngine({"width": size, "height": size, "seed": seed})
+    updates = engine.reset()
+    game = Game(**game_kwargs)
+    game._initialize(engine.observation(0, updates)["updates"])
+    game._update(updates)
+    rngs = [random.Random(seed), random.Random(seed + 1)]
+    yield engine, game, updates
+    for _ in range(turns):
+        if engine.is_done():
+            return
+        updates = engine.step([random_actions(game, team, rngs[team]) for team in (0, 1)])
+        game._update(updates)
+        yield engine, game, updates
+
+
+def build(width, height, messages, **game_kwargs):
+    """
+    player 0's Game from hand-written update messages, e.g.
+    "u 0 0 u_1 3 4 0 100 0 0" or "ct 0 c_1 3 4 0"
+    """
+    game = Game(**game_kwargs)
+    game._initialize(["0", f"{width} {height}"])
+    game._update(list(messages) + ["D_DONE"])
+    return game
+
+
+def state(game):
+    """Everything a Game holds, as comparable tuples"""
+    units = sorted((unit.id, unit.team, unit.type, unit.pos.x, unit.pos.y, unit.cooldown,
+                    unit.cargo.wood, unit.cargo.coal, unit.cargo.uranium)
+                   for player in game.players for unit in player.units)
+    cities = sorted((city.cityid, city.team, city.fuel, city.light_upkeep,
+                     tuple(sorted((tile.pos.x, tile.pos.y, tile.cooldown) for tile in city.citytiles)))
+                    for player in game.players for city in player.cities.values())
+    cells = []
+    for y in range(game.map_height):
+        for x in range(game.map_width):
+            cell = game.map.get_cell(x, y)
+            cells.append((x, y, (cell.resource.type, cell.resource.amount) if cell.resource else None,
+                          cell.road, (cell.citytile.team, cell.citytile.cityid) if cell.citytile else None))
+    return (game.turn, units, cities, cells, [player.research_points for player in game.players],
+            [player.city_tile_count for player in game.players])
+
+
+@pytest.fixture
+def native_game():
+    return play
+
+
+@pytest.fixture
+def hand_game():
+    return build
+
+
+@pytest.fixture
+def game_state():
+    return state
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.game_map import GameMap
+from multilux.action_encoder import NO_ACTION, ActionEncoder, decode_commands
+
+CITYTILE_COMMANDS = ("r", "bw", "bc")
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+@pytest.mark.parametrize("size,seed", [(12, 4), (24, 1)])
+def test_encoded_commands_pass_engine_validation(native_game, map_class, size, seed):
+    encoder = ActionEncoder()
+    rng = np.random.default_rng(seed)
+    for engine, game, updates in native_game(size, seed, turns=360, map_class=map_class):
+        masks = game.action_masks(0)
+        # mostly moves, to crowd the tiles
+        unit_actions = rng.choice([0, 1, 2, 3, 4, 5, 6, 7, NO_ACTION], size=len(masks.unit_ids),
+                                  p=[.2, .2, .2, .2, .05, .05, .03, .05, .02])
+        citytile_actions = rng.integers(NO_ACTION, 3, size=len(masks.citytiles))
+        commands = encoder.encode(game, masks, unit_actions, citytile_actions)
+
+        accepted_units, accepted_citytiles = engine._validate_actions([commands, []])
+        assert len(accepted_citytiles) == sum(command.split(" ")[0] in CITYTILE_COMMANDS for command in commands)
+        units = {unit.id: unit for unit in game.players[0].units}
+        rejected, moves = set(), {}
+        for command in commands:
+            strs = command.split(" ")
+            if strs[0] in CITYTILE_COMMANDS:
+                continue
+            accepted = accepted_units.get(int(strs[1][2:]))
+            if strs[0] == "m":
+                target = units[strs[1]].pos.translate(strs[2], 1)
+                moves[strs[1]] = (target.x, target.y)
+            if accepted is None or accepted[0] != strs[0]:
+                assert strs[0] == "m", (game.turn, command)
+                rejected.add(strs[1])
+        # the only moves the encoder cannot foresee: into an opponent unit that
+        # may move, or into an own unit whose move failed for that reason
+        stuck = {(unit.pos.x, unit.pos.y) for unit in game.players[1].units}
+        excused = set()
+        while True:
+            more = {unit_id for unit_id, target in moves.items() if target in stuck} - excused
+            if not more:
+                break
+            excused |= more
+            stuck |= {(units[unit_id].pos.x, units[unit_id].pos.y) for unit_id in more & rejected}
+        assert rejected <= excused, (game.turn, rejected - excused)
+
+        # decoding gives back the requested action of every actor that got a command
+        decoded_units, decoded_citytiles = decode_commands(commands, masks.unit_ids, masks.citytile_positions)
+        sent = decoded_units != NO_ACTION
+        assert np.array_equal(decoded_units[sent], unit_actions[sent])
+        sent = decoded_citytiles != NO_ACTION
+        assert np.array_equal(decoded_citytiles[sent], citytile_actions[sent])
+
+
+def test_decode_commands():
+    unit_actions, citytile_actions = decode_commands(
+        ["m u_1 e", "bcity u_2", "t u_3 u_1 wood 10", "p u_9", "bw 1 2", "r 3 4", "dc 1 2"],
+        ["u_1", "u_2", "u_3", "u_4"], np.array([[1, 2], [3, 4], [5, 6]]))
+    assert unit_actions.tolist() == [1, 5, 7, NO_ACTION]
+    assert citytile_actions.tolist() == [1, 0, NO_ACTION]
+
+
+def test_decode_commands_skips_malformed_commands():
+    unit_actions, citytile_actions = decode_commands(
+        ["r x 2", "bw 1", "bc 1 2.5", "m u_1", "m u_1 up", "bc 1 2"], ["u_1"], np.array([[1, 2]]))
+    assert unit_actions.tolist() == [NO_ACTION]
+    assert citytile_actions.tolist() == [2]
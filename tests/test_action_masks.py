@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from lux.action_masks import CITYTILE_ACTIONS, UNIT_ACTIONS
+from lux.array_map import ArrayGameMap
+from lux.game_map import GameMap
+
+
+def reference_masks(game, team):
+    """Per-object masks from the Unit/CityTile helpers and the engine's validation rules"""
+    player = game.players[team]
+    citytile_teams = {(citytile.pos.x, citytile.pos.y): owner.team for owner in game.players
+                      for city in owner.cities.values() for citytile in city.citytiles}
+    units = []
+    for unit in player.units:
+        row = []
+        for direction in "nesw":
+            target = unit.pos.translate(direction, 1)
+            row.append(unit.can_act() and 0 <= target.x < game.map_width and 0 <= target.y < game.map_height
+                       and citytile_teams.get((target.x, target.y), team) == team)
+        row.append(True)
+        on_citytile = (unit.pos.x, unit.pos.y) in citytile_teams
+        row.append(unit.is_worker() and unit.can_build(game.map) and not on_citytile)
+        row.append(unit.is_worker() and unit.can_act() and not on_citytile
+                   and game.map.get_cell_by_pos(unit.pos).road > 0)
+        cargo = unit.cargo.wood + unit.cargo.coal + unit.cargo.uranium
+        row.append(unit.can_act() and cargo > 0
+                   and any(other is not unit and other.pos.distance_to(unit.pos) <= 1 for other in player.units))
+        units.append(row)
+    citytile_count = sum(len(city.citytiles) for city in player.cities.values())
+    citytiles = [[citytile.can_act(), citytile.can_act() and len(player.units) < citytile_count,
+                  citytile.can_act() and len(player.units) < citytile_count]
+                 for city in player.cities.values() for citytile in city.citytiles]
+    return (np.array(units, dtype=bool).reshape(-1, len(UNIT_ACTIONS)),
+            np.array(citytiles, dtype=bool).reshape(-1, len(CITYTILE_ACTIONS)))
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+@pytest.mark.parametrize("size,seed", [(12, 4), (24, 1)])
+def test_action_masks_match_reference(native_game, map_class, size, seed):
+    for engine, game, updates in native_game(size, seed, turns=360, map_class=map_class):
+        for team in (0, 1):
+            masks = game.action_masks(team)
+            units, citytiles = reference_masks(game, team)
+            assert masks.unit_ids == [unit.id for unit in game.players[team].units]
+            assert np.array_equal(masks.units, units), (game.turn, team)
+            assert np.array_equal(masks.citytiles, citytiles), (game.turn, team)
+            assert masks.citytile_ids == [citytile.id for city in game.players[team].cities.values()
+                                          for citytile in city.citytiles]
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+def test_map_edges_citytiles_cooldown_and_empty_teams(hand_game, map_class):
+    game = hand_game(12, 12, [
+        "c 0 c_1 0 23", "ct 0 c_1 5 5 0", "c 1 c_2 0 23", "ct 1 c_2 1 0 0",
+        "r wood 6 6 500", "ccd 5 6 1.5",
+        # corner unit next to the opponent citytile, with enough wood to build
+        "u 0 0 u_1 0 0 0 100 0 0",
+        # on its own citytile, and on a wood tile
+        "u 0 0 u_2 5 5 0 0 50 0", "u 0 0 u_3 6 6 0 100 0 0",
+        # cooling down on a road, next to u_3
+        "u 0 0 u_4 5 6 2 10 0 0",
+        "u 1 0 u_5 11 11 0 0 0 0",
+    ], map_class=map_class)
+    masks = game.action_masks(0)
+    rows = dict(zip(masks.unit_ids, masks.units.tolist()))
+    #                  n      e      s      w     center bcity  p      t
+    assert rows["u_1"] == [False, False, True, False, True, True, False, False]
+    assert rows["u_2"] == [True, True, True, True, True, False, False, True]
+    assert rows["u_3"] == [True, True, True, True, True, False, False, True]
+    assert rows["u_4"] == [False, False, False, False, True, False, False, False]
+    # a cart in the corner: east and south leave the map
+    assert rows["u_5"] == [True, False, False, True, True, False, False, False]
+    # one citytile and five units: no unit can be built
+    assert masks.citytiles.tolist() == [[True, False, False]]
+    assert masks.citytile_ids == ["ct_5_5"]
+
+    # a team with a citytile and no units
+    masks = game.action_masks(1)
+    assert masks.unit_ids == [] and masks.units.shape == (0, len(UNIT_ACTIONS))
+    assert masks.citytiles.tolist() == [[True, True, True]]
+    # and one with neither
+    empty = hand_game(12, 12, [], map_class=map_class).action_masks(0)
+    assert empty.unit_ids == [] and empty.units.shape == (0, len(UNIT_ACTIONS))
+    assert empty.citytile_ids == [] and empty.citytiles.shape == (0, len(CITYTILE_ACTIONS))
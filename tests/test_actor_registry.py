@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from multilux.actor_registry import CITYTILE, NO_SLOT, ActorRegistry
+from multilux.lux_game import LuxGame
+
+
+def _actors(game):
+    units = [unit for player in game.players for unit in player.units]
+    citytiles = [citytile for player in game.players
+                 for city in player.cities.values() for citytile in city.citytiles]
+    return units, citytiles
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+@pytest.mark.parametrize("size,seed", [(12, 4), (24, 1)])
+def test_registry_tracks_game(native_game, incremental, size, seed):
+    lux_game = previous = None
+    first_seen, peak = {}, 0
+    for engine, game, updates in native_game(size, seed, turns=360):
+        observation = engine.observation(0, updates)
+        if lux_game is None:
+            lux_game = LuxGame(observation, incremental=incremental)
+            # small, so that it grows during the game
+            lux_game.registry = ActorRegistry(capacity=4)
+        lux_game.update(observation)
+        registry = lux_game.registry
+        units, citytiles = _actors(lux_game.game_state)
+
+        assert len(registry) == len(units) + len(citytiles)
+        for actor in units + citytiles:
+            slot = registry.slot(actor.id)
+            assert registry.get(actor.id) is actor
+            assert (registry.x[slot], registry.y[slot]) == (actor.pos.x, actor.pos.y)
+            assert registry.team[slot] == actor.team
+            assert actor in registry.at(actor.pos.x, actor.pos.y)
+        for unit in units:
+            slot = registry.slot(unit.id)
+            assert registry.kind[slot] == unit.type
+            assert registry.cooldown[slot] == np.float32(unit.cooldown)
+            assert tuple(registry.cargo[slot]) == (unit.cargo.wood, unit.cargo.coal, unit.cargo.uranium)
+        assert set(registry.kind[registry.indices(kinds=(CITYTILE,))]) <= {CITYTILE}
+        assert sorted(registry.ids(kinds=(CITYTILE,))) == sorted(citytile.id for citytile in citytiles)
+
+        ids = {actor.id for actor in units + citytiles}
+        for actor_id in ids - first_seen.keys():
+            first_seen[actor_id] = game.turn
+        peak = max(peak, len(ids))
+        assert len({registry.slot(actor_id) for actor_id in ids}) == len(ids)
+        if previous is not None:
+            assert set(registry.spawned) == ids - previous
+            assert set(registry.died) == previous - ids
+        previous = ids
+
+        for team in (0, 1):
+            team_units = [unit.id for unit in units if unit.team == team]
+            team_citytiles = {citytile.id for citytile in citytiles if citytile.team == team}
+            actors = [actor.id for actor in lux_game.get_team_actors(teams=(team,), flat=True)]
+            # units first, in order of appearance, then citytiles
+            assert set(actors[:len(team_units)]) == set(team_units)
+            turns = [first_seen[actor_id] for actor_id in actors[:len(team_units)]]
+            assert turns == sorted(turns)
+            assert set(actors[len(team_units):]) == team_citytiles
+    # slots of dead actors are reused, so capacity only grows with the peak
+    assert registry.capacity <= max(4, 1 << (peak - 1).bit_length())
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_slots_are_reused_and_teams_can_be_empty(hand_game, incremental):
+    registry = ActorRegistry(capacity=1)
+    game = hand_game(12, 12, ["u 0 0 u_1 3 3 0 0 0 0", "u 0 1 u_2 8 8 0 0 0 0"], incremental=incremental)
+    registry.update(game)
+    assert registry.capacity == 2
+    assert sorted([registry.slot("u_1"), registry.slot("u_2")]) == [0, 1]
+    free_slot = registry.slot("u_2")
+
+    # u_2 died, u_3 takes the free slot, a citytile grows the registry
+    game._update(["u 0 0 u_1 3 3 0 0 0 0", "u 0 0 u_3 5 5 0 10 0 0",
+                  "c 0 c_1 0 23", "ct 0 c_1 5 5 0", "D_DONE"])
+    registry.update(game)
+    assert registry.died == ["u_2"] and sorted(registry.spawned) == ["ct_5_5", "u_3"]
+    assert registry.slot("u_2") == NO_SLOT and registry.get("u_2") is None and "u_2" not in registry
+    assert registry.slot("u_3") == free_slot
+    assert registry.spawn_turn[free_slot] == 1 and registry.team[free_slot] == 0
+    assert registry.capacity == 4 and len(registry) == 3
+    assert tuple(registry.cargo[free_slot]) == (10, 0, 0)
+    assert sorted(actor.id for actor in registry.at(5, 5)) == ["ct_5_5", "u_3"]
+    # team 1 has no actors left
+    assert registry.units((1,)) == [] and registry.citytiles((1,)) == []
+    assert registry.ids(teams=(1,)) == [] and len(registry.indices(teams=(1,))) == 0
+
+    # every actor gone
+    game._update(["D_DONE"])
+    registry.update(game)
+    assert len(registry) == 0 and not registry.alive.any()
+    assert sorted(registry.died) == ["ct_5_5", "u_1", "u_3"]
+    assert registry.units() == [] and registry.ids() == [] and registry.at(3, 3) == []
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.game_constants import GAME_CONSTANTS
+from lux.game_map import GameMap
+
+PARAMETERS = GAME_CONSTANTS["PARAMETERS"]
+FUEL_RATE = {name.lower(): rate for name, rate in PARAMETERS["RESOURCE_TO_FUEL_RATE"].items()}
+RESEARCH_NEEDED = {"wood": 0, **{name.lower(): points for name, points in PARAMETERS["RESEARCH_REQUIREMENTS"].items()}}
+
+
+def is_night(turn):
+    cycle = PARAMETERS["DAY_LENGTH"] + PARAMETERS["NIGHT_LENGTH"]
+    return turn % cycle >= PARAMETERS["DAY_LENGTH"]
+
+
+def reference_features(game, reach):
+    """(cityid, horizon, deficit, reach value, [reach value per tile]) per city, turn by turn"""
+    last_turn = PARAMETERS["MAX_DAYS"]
+    features = []
+    for player in game.players:
+        for city in player.cities.values():
+            fuel, turn = city.fuel, game.turn
+            while turn < last_turn:
+                if is_night(turn):
+                    if fuel < city.light_upkeep:
+                        break
+                    fuel -= city.light_upkeep
+                turn += 1
+            horizon = turn - game.turn
+
+            night_turns, turn = 0, game.turn
+            while is_night(turn) or not night_turns:
+                night_turns += is_night(turn)
+                turn += 1
+            deficit = max(city.light_upkeep * night_turns - city.fuel, 0)
+
+            def value(center_tiles):
+                total = 0
+                for row in game.map.map:
+                    for cell in row:
+                        resource = cell.resource
+                        if (resource is not None and player.research_points >= RESEARCH_NEEDED[resource.type]
+                                and any(cell.pos.distance_to(tile.pos) <= reach for tile in center_tiles)):
+                            total += resource.amount * FUEL_RATE[resource.type]
+                return total
+
+            features.append((city.cityid, horizon, deficit, value(city.citytiles),
+                             [value([citytile]) for citytile in city.citytiles]))
+    return features
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+@pytest.mark.parametrize("size,seed", [(12, 4), (16, 2)])
+def test_city_features_match_reference(native_game, map_class, size, seed):
+    for engine, game, updates in native_game(size, seed, turns=360, map_class=map_class):
+        for reach in (0, 1, 3):
+            features = game.city_features(reach)
+            reference = reference_features(game, reach)
+            assert features.city_ids == [city[0] for city in reference]
+            assert features.city_horizon.tolist() == [city[1] for city in reference], (game.turn, reach)
+            assert np.allclose(features.city_deficit, [city[2] for city in reference]), (game.turn, reach)
+            assert np.allclose(features.city_reach_value, [city[3] for city in reference]), (game.turn, reach)
+            assert np.allclose(features.citytile_reach_value,
+                               [value for city in reference for value in city[4]]), (game.turn, reach)
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+def test_hand_built_cities(hand_game, map_class):
+    game = hand_game(12, 12, [
+        "rp 1 50",
+        "r wood 3 2 500", "r coal 2 4 300", "r coal 11 3 300",
+        # out of fuel, one night short, and fuel for the whole game
+        "c 0 c_1 0 23", "ct 0 c_1 2 2 0",
+        "c 0 c_2 100 23", "ct 0 c_2 8 8 0",
+        "c 1 c_3 100000 23", "ct 1 c_3 10 2 0", "ct 1 c_3 10 3 0",
+    ], map_class=map_class)
+    night = PARAMETERS["DAY_LENGTH"] + 2
+    game.turn = night
+    outlives = PARAMETERS["MAX_DAYS"] - night
+    features = game.city_features(reach=1)
+    assert features.city_ids == ["c_1", "c_2", "c_3"]
+    # c_1 dies on this night turn, c_2 after four, c_3 outlives the game
+    assert features.city_horizon.tolist() == [0, 4, outlives]
+    assert features.city_deficit.tolist() == [23 * 8, 23 * 8 - 100, 0]
+    assert features.city_survives_night.tolist() == [False, False, True]
+    # wood next to c_1, coal next to one tile of c_3 (only team 1 mines coal)
+    assert features.city_reach_value.tolist() == [500, 0, 3000]
+    assert features.citytile_reach_value.tolist() == [500, 0, 0, 3000]
+    assert features.citytile_horizon.tolist() == [0, 4, outlives, outlives]
+    # the coal two tiles away from c_1 stays out of reach without research
+    assert game.city_features(reach=2).city_reach_value.tolist()[0] == 500
+    assert not game.city_features(reach=0).city_reach_value.any()
+
+    # during the day the fuel lasts until the first night turn
+    game.turn = 10
+    features = game.city_features()
+    assert features.city_horizon.tolist()[:2] == [PARAMETERS["DAY_LENGTH"] - 10, PARAMETERS["DAY_LENGTH"] - 10 + 4]
+    assert features.city_deficit.tolist() == [23 * 10, 23 * 10 - 100, 0]
+
+
+def test_no_cities(hand_game):
+    features = hand_game(12, 12, ["r wood 3 2 500"]).city_features()
+    assert features.city_ids == [] and features.city_horizon.shape == (0,)
+    assert features.citytile_reach_value.shape == (0,)
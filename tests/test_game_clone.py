@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.game_map import GameMap
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+def test_clone_is_independent(native_game, game_state, map_class, incremental):
+    clones = []
+    for engine, game, updates in native_game(12, 4, turns=360, map_class=map_class, incremental=incremental):
+        # earlier clones keep their state while the game goes on
+        for clone, expected in clones:
+            assert game_state(clone) == expected
+        if game.turn % 40 == 0:
+            clone = game.clone()
+            assert game_state(clone) == game_state(game)
+            clones.append((clone, game_state(game)))
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+def test_updating_a_clone_leaves_the_source(native_game, game_state, map_class):
+    games = native_game(16, 6, turns=200, map_class=map_class)
+    _, game, _ = next(games)
+    source = game.clone()
+    expected = game_state(source)
+    clone = source.clone()
+    for engine, game, updates in games:
+        clone._update(updates)
+        assert game_state(clone) == game_state(game)
+    assert game_state(source) == expected
+
+
+def test_array_map_planes_are_copied_on_write(native_game):
+    _, game, _ = next(native_game(12, 4, map_class=ArrayGameMap))
+    clone = game.clone()
+    assert np.shares_memory(clone.map.resource_amount, game.map.resource_amount)
+    x, y = map(int, np.argwhere(game.map.resource_amount > 0)[0][::-1])
+    amount = int(game.map.resource_amount[y, x])
+    clone.map._setResource("wood", x, y, amount + 1)
+    assert int(game.map.resource_amount[y, x]) == amount
+    assert int(clone.map.resource_amount[y, x]) == amount + 1
+    assert game.map.get_cell(x, y).resource.amount == amount
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+def test_restore_snapshot_repeatedly(native_game, game_state, map_class):
+    snapshot = expected = None
+    for engine, game, updates in native_game(12, 3, turns=120, map_class=map_class):
+        if game.turn == 20:
+            snapshot, expected = game.snapshot(), game_state(game)
+    for _ in range(2):
+        game.restore(snapshot)
+        assert game_state(game) == expected
+        # restoring must not tie the game to the snapshot
+        game.map._setResource("wood", 0, 0, 999)
+        game.players[0].units.clear()
+    assert game_state(snapshot) == expected
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+def test_mutating_a_clone_leaves_the_source(hand_game, game_state, map_class, incremental):
+    game = hand_game(12, 12, [
+        "rp 0 20", "r wood 3 4 300", "ccd 5 5 1.5",
+        "c 0 c_1 50 23", "ct 0 c_1 5 5 0", "u 0 0 u_1 5 5 0 10 20 30",
+    ], map_class=map_class, incremental=incremental)
+    expected = game_state(game)
+    clone = game.clone()
+    unit = clone.players[0].units[0]
+    unit.cargo.wood, unit.cooldown = 0, 2
+    # positions are shared, immutable objects: a move replaces them
+    unit.pos = clone.map.get_cell(6, 5).pos
+    city = clone.players[0].cities["c_1"]
+    city.fuel = 0
+    city.citytiles[0].cooldown = 9
+    clone.players[0].research_points = 200
+    clone.players[1].units.append(unit)
+    clone.map.get_cell(5, 5).road = 0
+    clone.map._setResource("wood", 3, 4, 1)
+    assert game_state(game) == expected
+    assert game.map.get_cell(5, 5).citytile is game.players[0].cities["c_1"].citytiles[0]
+    assert clone.map.get_cell(5, 5).citytile is city.citytiles[0]
@@ -0,0 +1,48 @@
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.game import Game
+from lux.game_map import GameMap
+
+
+def _tiles(game):
+    return {(tile.pos.x, tile.pos.y, player.team) for player in game.players
+            for city in player.cities.values() for tile in city.citytiles}
+
+
+def _resources(game):
+    return {(x, y) for y in range(game.map_height) for x in range(game.map_width)
+            if game.map.get_cell(x, y).has_resource()}
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+@pytest.mark.parametrize("size,seed", [(12, 4), (16, 6)])
+def test_incremental_update_matches_full_update(native_game, game_state, map_class, size, seed):
+    incremental = None
+    for engine, game, updates in native_game(size, seed, turns=360, map_class=map_class):
+        if incremental is None:
+            incremental = Game(map_class=map_class, incremental=True)
+            incremental._initialize(engine.observation(0, updates)["updates"])
+        incremental._update(updates)
+        assert game_state(incremental) == game_state(game)
+
+
+@pytest.mark.parametrize("size,seed", [(12, 3), (24, 1)])
+def test_incremental_delta_reports_changes(native_game, size, seed):
+    incremental = previous = None
+    for engine, game, updates in native_game(size, seed, turns=360):
+        if incremental is None:
+            incremental = Game(incremental=True)
+            incremental._initialize(engine.observation(0, updates)["updates"])
+        incremental._update(updates)
+        delta = incremental.delta
+        current = ({unit.id for player in game.players for unit in player.units}, _tiles(game), _resources(game))
+        if previous is not None:
+            units, tiles, resources = current
+            old_units, old_tiles, old_resources = previous
+            assert {unit.id for unit in delta.units_spawned} == units - old_units
+            assert {unit.id for unit in delta.units_died} == old_units - units
+            assert {(t.pos.x, t.pos.y, t.team) for t in delta.citytiles_built} == tiles - old_tiles
+            assert {(t.pos.x, t.pos.y, t.team) for t in delta.citytiles_lost} == old_tiles - tiles
+            assert {(p.x, p.y) for p in delta.resources_depleted} == old_resources - resources
+        previous = current
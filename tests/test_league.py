@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from multilux.league import Elo, League, TrueSkill, round_robin, sampled_matchups
+
+
+def test_elo_is_zero_sum_and_symmetric():
+    elo = Elo()
+    elo.update("a", "b", 1.0)
+    elo.update("c", "a", 0.5)
+    elo.update("b", "c", 0.0)
+    assert sum(elo[player] for player in "abc") == pytest.approx(3 * elo.initial)
+    assert elo.expected("a", "b") + elo.expected("b", "a") == pytest.approx(1.0)
+
+    mirrored = Elo()
+    mirrored.update("b", "a", 0.0)
+    first = Elo()
+    first.update("a", "b", 1.0)
+    assert (mirrored["a"], mirrored["b"]) == pytest.approx((first["a"], first["b"]))
+
+
+def test_elo_draw_pulls_ratings_together():
+    elo = Elo()
+    elo.ratings = {"strong": 1700.0, "weak": 1300.0}
+    elo.update("strong", "weak", 0.5)
+    assert 1300.0 < elo["weak"] < elo["strong"] < 1700.0
+    # an even draw changes nothing
+    elo.update("x", "y", 0.5)
+    assert elo["x"] == elo["y"] == elo.initial
+
+
+def test_trueskill_winner_up_loser_down():
+    trueskill = TrueSkill()
+    trueskill.update("a", "b", 1.0)
+    (mu_a, sigma_a), (mu_b, sigma_b) = trueskill["a"], trueskill["b"]
+    assert mu_a > trueskill.mu > mu_b
+    assert sigma_a < trueskill.sigma and sigma_b < trueskill.sigma
+    assert trueskill.conservative("a") > trueskill.conservative("b")
+
+    mirrored = TrueSkill()
+    mirrored.update("b", "a", 0.0)
+    assert mirrored["a"] == pytest.approx(trueskill["a"]) and mirrored["b"] == pytest.approx(trueskill["b"])
+
+
+def test_trueskill_draw_pulls_ratings_together():
+    trueskill = TrueSkill()
+    trueskill.ratings = {"strong": (30.0, 4.0), "weak": (20.0, 4.0)}
+    trueskill.update("strong", "weak", 0.5)
+    (mu_strong, sigma_strong), (mu_weak, _) = trueskill["strong"], trueskill["weak"]
+    assert 20.0 < mu_weak < mu_strong < 30.0
+    assert sigma_strong < 4.0
+    trueskill.update("x", "y", 0.5)
+    assert trueskill["x"][0] == pytest.approx(trueskill["y"][0]) == pytest.approx(trueskill.mu)
+
+
+def test_round_robin_alternates_seats():
+    matchups = round_robin(["a", "b", "c"], games_per_pair=4)
+    assert len(matchups) == 3 * 4
+    for pair in (("a", "b"), ("a", "c"), ("b", "c")):
+        games = [matchup for matchup in matchups if set(matchup) == set(pair)]
+        assert len(games) == 4
+        assert sum(matchup[0] == pair[0] for matchup in games) == 2
+    # odd counts: the first player of the pair takes the extra game
+    assert round_robin(["a", "b"], games_per_pair=3) == [("a", "b"), ("b", "a"), ("a", "b")]
+
+
+def test_sampled_matchups_pair_different_players():
+    matchups = sampled_matchups(["a", "b", "c"], 50, rng=random.Random(0))
+    assert len(matchups) == 50
+    assert all(a != b and {a, b} <= {"a", "b", "c"} for a, b in matchups)
+
+
+def test_unknown_players_are_rejected():
+    league = League(agents={"idle": "idle"}, processes=0)
+    with pytest.raises(ValueError):
+        league.play([("idle", "nobody")])
+
+
+def test_league_plays_and_rates_scripted_agents():
+    matchups = round_robin(["simple", "idle"], games_per_pair=4)
+    results = {}
+    for processes in (0, 1):
+        league = League(agents={"simple": "simple_agent", "idle": "idle"},
+                        configuration={"width": 12, "height": 12}, processes=processes,
+                        concurrent_games=2, games_per_task=2, seed=3)
+        finished = []
+        results[processes] = league.play(matchups, callback=finished.append)
+        assert finished == results[processes]
+        assert league.games == len(matchups)
+        standings = league.standings()
+        assert [row["player"] for row in standings] == ["simple", "idle"]
+        assert standings[0]["wins"] == 4 and standings[1]["losses"] == 4
+        assert league.elo["simple"] > league.elo["idle"]
+    # the same games in this process and in a pool
+    assert sorted(results[0]) == sorted(results[1])
+    for result in results[0]:
+        winner = result.players[0] if result.score == 1.0 else result.players[1]
+        assert winner == "simple"
+        assert result.rewards[result.players.index("simple")] > result.rewards[result.players.index("idle")]
@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("kaggle_environments")
+
+from multilux.parity import check_episode  # noqa: E402
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3, 4, 5, 31, 32])
+def test_native_engine_matches_kaggle(seed):
+    assert check_episode(seed, steps=360) is None
+
+
+@pytest.mark.parametrize("size", [12, 16, 24, 32])
+def test_native_engine_matches_kaggle_per_map_size(size):
+    assert check_episode(7, steps=360, configuration={"width": size, "height": size}) is None
@@ -0,0 +1,71 @@
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.game import Game
+from lux.game_map import GameMap
+from lux.parser import parse_updates
+
+
+def test_parse_updates_fields():
+    updates = parse_updates([
+        "rp 0 12", "rp 1 0",
+        "r coal 3 4 350", "r wood 0 1 123.7",
+        "u 0 1 u_17 5 6 1.5 10 20 30",
+        "c 1 c_3 48.5 23",
+        "ct 1 c_3 7 8 0.5",
+        "ccd 7 8 6",
+        "D_DONE",
+        "u 0 0 u_99 0 0 0 0 0 0",
+    ])
+    assert updates.research.tolist() == [(0, 12), (1, 0)]
+    assert updates.resources.tolist() == [(1, 3, 4, 350), (0, 0, 1, 123)]
+    assert updates.units.tolist() == [(0, 1, 17, 5, 6, 1.5, 10, 20, 30)]
+    assert updates.cities.tolist() == [(1, 3, 48.5, 23.0)]
+    assert updates.citytiles.tolist() == [(1, 3, 7, 8, 0.5)]
+    assert updates.roads.tolist() == [(7, 8, 6.0)]
+
+
+def test_parse_updates_empty_groups():
+    updates = parse_updates(["rp 0 0", "rp 1 0", "D_DONE"])
+    assert len(updates.units) == 0 and updates.units.dtype.names[0] == "type"
+    assert len(updates.roads) == 0
+
+
+def test_parse_updates_without_messages():
+    for messages in ([], ["D_DONE"], ["D_DONE", "rp 0 3"]):
+        updates = parse_updates(messages)
+        assert all(len(group) == 0 for group in updates)
+    # without D_DONE every message is parsed
+    assert parse_updates(["rp 1 3"]).research.tolist() == [(1, 3)]
+
+
+@pytest.mark.parametrize("message", [
+    "u 0 1 u_17 5 6",           # missing fields
+    "rp 0 12 4",                # one field too many
+    "r gold 3 4 350",           # unknown resource
+    "ct 1 c_3 7 eight 0.5",     # not a number
+])
+def test_parse_updates_rejects_malformed_messages(message):
+    with pytest.raises(ValueError, match="Malformed"):
+        parse_updates(["rp 0 0", message, "ccd 1 1 0", "D_DONE"])
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+@pytest.mark.parametrize("size,seed", [(12, 4), (24, 1)])
+def test_bulk_parse_matches_line_parser(native_game, game_state, map_class, size, seed):
+    lines = None
+    for engine, game, updates in native_game(size, seed, turns=360, map_class=map_class, bulk_parse=True):
+        if lines is None:
+            lines = Game(map_class=map_class, bulk_parse=False)
+            lines._initialize(engine.observation(0, updates)["updates"])
+        lines._update(updates)
+        assert game_state(game) == game_state(lines)
+
+
+def test_update_reuses_parsed_updates(native_game, game_state):
+    for engine, game, updates in native_game(12, 3, turns=60, map_class=ArrayGameMap):
+        reused = Game(map_class=ArrayGameMap)
+        reused._initialize(["0", "%d %d" % (engine.width, engine.height)])
+        reused._update(updates, parse_updates(updates))
+        # the same state, apart from the turn count
+        assert game_state(reused)[1:] == game_state(game)[1:]
@@ -0,0 +1,154 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.city_features import nights_left
+from lux.game_map import GameMap
+from lux.pathfinding import FIELDS, UNREACHABLE, PathFinder
+
+
+def reference_fields(game, team, avoid_opponent_units):
+    """Per-field single-source-set BFS over the Cell/City objects"""
+    sources = {name: set() for name in FIELDS}
+    for row in game.map.map:
+        for cell in row:
+            if cell.has_resource():
+                sources[cell.resource.type].add((cell.pos.x, cell.pos.y))
+    for player in game.players:
+        for city in player.cities.values():
+            at_risk = city.fuel < city.light_upkeep * nights_left(game.turn)
+            for citytile in city.citytiles:
+                xy = (citytile.pos.x, citytile.pos.y)
+                sources["own_citytile" if player.team == team else "opponent_citytile"].add(xy)
+                if player.team == team and at_risk:
+                    sources["city_at_risk"].add(xy)
+    blocked = set(sources["opponent_citytile"])
+    if avoid_opponent_units:
+        blocked |= {(unit.pos.x, unit.pos.y) for unit in game.players[1 - team].units}
+    fields = {}
+    for name in FIELDS:
+        dist = np.full((game.map_height, game.map_width), UNREACHABLE, dtype=np.int64)
+        queue = deque(sources[name])
+        for x, y in queue:
+            dist[y, x] = 0
+        while queue:
+            x, y = queue.popleft()
+            for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0)):
+                a, b = x + dx, y + dy
+                if (0 <= a < game.map_width and 0 <= b < game.map_height
+                        and (a, b) not in blocked and dist[b, a] == UNREACHABLE):
+                    dist[b, a] = dist[y, x] + 1
+                    queue.append((a, b))
+        fields[name] = dist
+    return fields
+
+
+@pytest.mark.parametrize("map_class,incremental", [(GameMap, False), (GameMap, True), (ArrayGameMap, False)])
+@pytest.mark.parametrize("size,seed", [(12, 4), (24, 1)])
+def test_fields_match_reference(native_game, map_class, incremental, size, seed):
+    finders = [PathFinder(0), PathFinder(1, avoid_opponent_units=True)]
+    for engine, game, updates in native_game(size, seed, map_class=map_class, incremental=incremental):
+        for finder in finders:
+            fields = finder.fields(game)
+            reference = reference_fields(game, finder.team, finder.avoid_opponent_units)
+            for name in FIELDS:
+                assert np.array_equal(fields[name], reference[name]), (game.turn, finder.team, name)
+
+            units = game.players[finder.team].units
+            blocked = finder_blocked(game, finder)
+            for name in FIELDS:
+                distances = finder.distances(game, name)
+                assert distances.tolist() == [reference[name][unit.pos.y, unit.pos.x] for unit in units]
+                for unit, dist, direction in zip(units, distances, finder.directions(game, name)):
+                    if direction != "c":
+                        target = unit.pos.translate(direction, 1)
+                        assert reference[name][target.y, target.x] == dist - 1, (game.turn, unit.id, name)
+                    else:
+                        assert dist == 0 or dist == UNREACHABLE or all(
+                            reference[name][target.y, target.x] >= dist
+                            for target in (unit.pos.translate(d, 1) for d in "nesw")
+                            if 0 <= target.x < size and 0 <= target.y < size
+                            and (target.x, target.y) not in blocked), (game.turn, unit.id, name)
+
+
+def finder_blocked(game, finder):
+    """Tiles the finder's paths do not go through"""
+    blocked = {(citytile.pos.x, citytile.pos.y) for city in game.players[1 - finder.team].cities.values()
+               for citytile in city.citytiles}
+    if finder.avoid_opponent_units:
+        blocked |= {(unit.pos.x, unit.pos.y) for unit in game.players[1 - finder.team].units}
+    return blocked
+
+
+def test_fields_are_reused_when_sources_do_not_change(native_game):
+    finder = PathFinder(0)
+    for engine, game, updates in native_game(12, 4, turns=0):
+        finder.fields(game)
+        computed = finder.computed
+        assert computed == len(FIELDS)
+        finder.fields(game)
+        assert finder.computed == computed
+
+
+@pytest.mark.parametrize("map_class,incremental", [(GameMap, False), (GameMap, True), (ArrayGameMap, False)])
+def test_fields_follow_restore_at_the_same_turn(native_game, map_class, incremental):
+    finder = PathFinder(0)
+    games = zip(native_game(12, 4, turns=20, map_class=map_class, incremental=incremental),
+                native_game(12, 6, turns=20, map_class=map_class, incremental=incremental))
+    for (_, game, _), (_, other, _) in games:
+        finder.fields(game)
+        # same object, same turn, another state
+        game.restore(other.snapshot())
+        fields = finder.fields(game)
+        reference = reference_fields(game, 0, False)
+        for name in FIELDS:
+            assert np.array_equal(fields[name], reference[name]), (game.turn, name)
+
+
+@pytest.mark.parametrize("map_class,incremental", [(GameMap, False), (GameMap, True), (ArrayGameMap, False)])
+def test_fields_of_short_lived_clones(native_game, map_class, incremental):
+    finder = PathFinder(0)
+    for engine, game, updates in native_game(12, 4, turns=40, map_class=map_class, incremental=incremental):
+        clone = game.clone()
+        # a searched branch: the clone loses its resources
+        for row in clone.map.map:
+            for cell in row:
+                if cell.has_resource():
+                    clone.map._clear_resource(cell.pos.x, cell.pos.y)
+        for state in (clone, game):
+            fields = finder.fields(state)
+            reference = reference_fields(state, 0, False)
+            for name in FIELDS:
+                assert np.array_equal(fields[name], reference[name]), (game.turn, name)
+        # freed, so that the next clone may get its id()
+        del clone
+
+
+@pytest.mark.parametrize("map_class", [GameMap, ArrayGameMap])
+def test_hand_built_obstacles(hand_game, map_class):
+    game = hand_game(12, 12, [
+        "r wood 2 8 400", "r wood 10 5 400",
+        "c 1 c_1 0 23", "ct 1 c_1 1 0 0", "ct 1 c_1 0 1 0",
+        # boxed in by the opponent citytiles
+        "u 0 0 u_1 0 0 0 0 0 0",
+        # on a wood tile
+        "u 0 0 u_2 2 8 0 0 0 0",
+        # an opponent unit between it and the wood
+        "u 0 0 u_3 8 5 0 0 0 0", "u 0 1 u_4 9 5 0 0 0 0",
+    ], map_class=map_class)
+    finder = PathFinder(0)
+    assert finder.distances(game, "wood").tolist() == [UNREACHABLE, 0, 2]
+    assert finder.directions(game, "wood") == ["c", "c", "e"]
+    # no coal on the map, and no own citytile
+    assert (finder.field(game, "coal") == UNREACHABLE).all()
+    assert finder.distances(game, "own_citytile").tolist() == [UNREACHABLE] * 3
+
+    # around the opponent unit
+    avoiding = PathFinder(0, avoid_opponent_units=True)
+    assert avoiding.distances(game, "wood").tolist() == [UNREACHABLE, 0, 4]
+    assert avoiding.directions(game, "wood")[2] in ("n", "s")
+    # its own citytiles do not block the opponent, and u_3 only blocks one of its shortest paths
+    opponent = PathFinder(1, avoid_opponent_units=True)
+    assert opponent.distances(game, "own_citytile").tolist() == [9 + 4]
@@ -0,0 +1,150 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from multilux.lux_engine import LuxEngine
+from multilux.lux_game import LuxGame
+from multilux.observation import SpatialObservation
+from multilux.parity import random_actions
+from multilux.recorder import EpisodeDataset, EpisodeRecorder, ShardWriter
+
+
+def _write_shard(path, turns, chunk_turns, seed):
+    """Shard of synthetic turns with a varying number of actors, returns the turns"""
+    rng = np.random.default_rng(seed)
+    writer = ShardWriter(path, chunk_turns)
+    written = []
+    for turn in range(turns):
+        n = int(rng.integers(0, 4))
+        turn_values = {"turn": np.int16(turn), "state": rng.random((2, 3, 3)).astype(np.float16)}
+        actor_values = {"x": rng.integers(0, 12, n).astype(np.int16), "reward": rng.random(n).astype(np.float32)}
+        writer.append(turn_values, actor_values)
+        written.append((turn_values, actor_values))
+    writer.close(source=os.path.basename(path))
+    return written
+
+
+def _assert_turn(item, turn_values, actor_values):
+    assert item["turn"] == turn_values["turn"]
+    assert np.array_equal(item["state"], turn_values["state"])
+    assert item["actors"] == len(actor_values["x"])
+    assert np.array_equal(item["x"], actor_values["x"])
+    assert np.array_equal(item["reward"], actor_values["reward"])
+
+
+def test_getitem_across_chunk_boundaries(tmp_path):
+    # 10 turns in chunks of 3: the last chunk holds a single turn
+    first = _write_shard(str(tmp_path / "a"), 10, 3, seed=0)
+    second = _write_shard(str(tmp_path / "b"), 4, 3, seed=1)
+    # few cached chunks, so that chunks are decompressed again
+    dataset = EpisodeDataset(str(tmp_path), cache_chunks=2, max_open=1)
+    assert len(dataset) == 14 and dataset.episodes == 2
+    turns = first + second
+    for i in list(range(len(turns))) + list(range(len(turns)))[::-1]:
+        _assert_turn(dataset[i], *turns[i])
+    _assert_turn(dataset[-1], *turns[-1])
+    with pytest.raises(IndexError):
+        dataset[len(turns)]
+    episode = dataset.episode(0)
+    assert np.array_equal(episode["turn"], np.arange(10))
+    assert np.array_equal(episode["x"], np.concatenate([actors["x"] for _, actors in first]))
+    dataset.close()
+
+
+def test_sample_matches_getitem(tmp_path):
+    _write_shard(str(tmp_path / "a"), 20, 4, seed=2)
+    dataset = EpisodeDataset(str(tmp_path), cache_chunks=1)
+    indices = np.random.default_rng(7).integers(len(dataset), size=50)
+    for item, i in zip(dataset.sample(50, rng=7), indices):
+        assert item["turn"] == i
+        assert np.array_equal(item["state"], dataset[int(i)]["state"])
+
+
+def test_incomplete_and_empty_shards_are_skipped(tmp_path):
+    _write_shard(str(tmp_path / "complete"), 5, 2, seed=3)
+    # no index: still being written, or its writer died
+    incomplete = ShardWriter(str(tmp_path / "incomplete"), 2)
+    for turn in range(5):
+        incomplete.append({"turn": np.int16(turn)})
+    incomplete.flush()
+    ShardWriter(str(tmp_path / "empty")).close()
+    dataset = EpisodeDataset(str(tmp_path))
+    assert dataset.episodes == 1 and len(dataset) == 5
+    assert os.path.basename(dataset.shards[0][0]) == "complete"
+
+
+def test_column_change_is_rejected(tmp_path):
+    writer = ShardWriter(str(tmp_path / "a"), 1)
+    writer.append({"state": np.zeros(3)})
+    with pytest.raises(ValueError):
+        writer.append({"state": np.zeros(4)})
+
+
+def test_recorder_round_trip(tmp_path):
+    engine = LuxEngine({"width": 12, "height": 12, "seed": 4})
+    updates = engine.reset()
+    game = LuxGame(engine.observation(0, updates))
+    game.update(engine.observation(0, updates))
+    recorder = EpisodeRecorder(str(tmp_path), chunk_turns=16)
+    recorder.begin(game)
+    spatial = SpatialObservation(radius=0, dtype=np.float16)
+    rngs = [random.Random(4), random.Random(5)]
+    expected = []
+    while not engine.is_done():
+        actors = game.registry.units((0,)) + game.registry.citytiles((0,))
+        actions = {actor.id: index % 5 for index, actor in enumerate(actors)}
+        expected.append([game.game_state.turn, spatial.render(game.game_state, 0).copy(),
+                         [(actor.pos.x, actor.pos.y) for actor in actors], [actions[actor.id] for actor in actors]])
+        updates = engine.step([random_actions(game.game_state, team, rngs[team]) for team in (0, 1)])
+        game.update(engine.observation(0, updates))
+        # a reward for the actors that survived the step
+        alive = {actor.id for actor in game.registry.units((0,)) + game.registry.citytiles((0,))}
+        rewards = {actor.id: float(index) for index, actor in enumerate(actors) if actor.id in alive}
+        expected[-1].append([rewards.get(actor.id, 0.0) for actor in actors])
+        recorder.record(actions, rewards, {"__all__": engine.is_done()}, game)
+    assert recorder.episodes == 1
+
+    dataset = EpisodeDataset(str(tmp_path))
+    assert dataset.episodes == 1 and len(dataset) == len(expected) > 16
+    assert dataset.shards[0][1]["metadata"]["complete"] is True
+    for i, (turn, state, positions, actions, rewards) in enumerate(expected):
+        item = dataset[i]
+        assert item["turn"] == turn
+        assert np.array_equal(item["state"], state)
+        assert list(zip(item["x"].tolist(), item["y"].tolist())) == positions
+        assert item["action"].tolist() == actions
+        assert item["reward"].tolist() == rewards
+
+
+def test_reset_before_any_step_discards_the_episode(tmp_path):
+    engine = LuxEngine({"width": 12, "height": 12, "seed": 4})
+    updates = engine.reset()
+    game = LuxGame(engine.observation(0, updates))
+    game.update(engine.observation(0, updates))
+    recorder = EpisodeRecorder(str(tmp_path))
+    recorder.begin(game)
+    recorder.begin(game)
+    assert len(os.listdir(tmp_path)) == 1  # only the .bin of the open episode
+    recorder.close()
+    assert recorder.episodes == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_episode_cut_off_by_a_reset_is_kept_incomplete(tmp_path):
+    engine = LuxEngine({"width": 12, "height": 12, "seed": 4})
+    updates = engine.reset()
+    game = LuxGame(engine.observation(0, updates))
+    game.update(engine.observation(0, updates))
+    recorder = EpisodeRecorder(str(tmp_path))
+    recorder.begin(game)
+    for _ in range(3):
+        game.update(engine.observation(0, engine.step([[], []])))
+        recorder.record({}, {}, {"__all__": False}, game)
+    recorder.begin(game)
+    assert recorder.episodes == 1
+    dataset = EpisodeDataset(str(tmp_path))
+    assert len(dataset) == 3
+    assert dataset.shards[0][1]["metadata"]["complete"] is False
+    assert (dataset.episode(0)["action"] == -1).all()
@@ -0,0 +1,42 @@
+import copy
+import json
+import os
+
+import pytest
+
+from multilux.replay_ingest import ingest_replay
+
+
+@pytest.fixture(scope="module")
+def replay():
+    make = pytest.importorskip("kaggle_environments").make
+    env = make("lux_ai_2021", configuration={"seed": 3, "loglevel": 0, "episodeSteps": 30})
+    env.run(["simple_agent", "simple_agent"])
+    return env.toJSON()
+
+
+def _write(path, replay):
+    with open(path, "w") as f:
+        json.dump(replay, f)
+    return str(path)
+
+
+def test_ingest_writes_one_shard_per_player(tmp_path, replay):
+    path = _write(tmp_path / "game.json", replay)
+    output = tmp_path / "shards"
+    output.mkdir()
+    assert ingest_replay(path, str(output)) == len(replay["steps"]) - 1
+    assert sorted(os.listdir(output)) == ["game_p0.bin", "game_p0.json", "game_p1.bin", "game_p1.json"]
+    # complete shards are skipped
+    assert ingest_replay(path, str(output)) == 0
+
+
+def test_broken_replay_leaves_no_partial_shards(tmp_path, replay):
+    broken = copy.deepcopy(replay)
+    broken["steps"][12][0]["observation"]["updates"] = None
+    path = _write(tmp_path / "broken.json", broken)
+    output = tmp_path / "shards"
+    output.mkdir()
+    with pytest.raises(TypeError):
+        ingest_replay(path, str(output))
+    assert os.listdir(output) == []
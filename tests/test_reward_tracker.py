@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.game_map import GameMap
+from multilux.actor_registry import ActorRegistry
+from multilux.reward_tracker import ACTOR_DELTAS, DEFAULT_WEIGHTS, TEAM_DELTAS, RewardTracker
+
+FUEL_RATE = (1, 10, 40)
+CITY_BUILD_COST = 100
+ACTOR_WEIGHTS = [DEFAULT_WEIGHTS[name] for name in ACTOR_DELTAS]
+TEAM_WEIGHTS = [DEFAULT_WEIGHTS[name] for name in TEAM_DELTAS]
+
+
+def _snapshot(game):
+    units = {unit.id: (unit.team, (unit.pos.x, unit.pos.y), (unit.cargo.wood, unit.cargo.coal, unit.cargo.uranium))
+             for player in game.players for unit in player.units}
+    citytiles = {(citytile.pos.x, citytile.pos.y): player.team for player in game.players
+                 for city in player.cities.values() for citytile in city.citytiles}
+    return units, citytiles, [player.research_points for player in game.players]
+
+
+def reference_deltas(previous, current):
+    """(team deltas, {unit id: actor deltas}) from two snapshots, unit by unit"""
+    previous_units, previous_citytiles, previous_research = previous
+    units, citytiles, research = current
+    built = {xy: team for xy, team in citytiles.items() if previous_citytiles.get(xy) != team}
+    lost = {xy: team for xy, team in previous_citytiles.items() if citytiles.get(xy) != team}
+    team_deltas = np.zeros((2, 4))
+    for team in built.values():
+        team_deltas[team, 0] += 1
+    for team in lost.values():
+        team_deltas[team, 1] += 1
+    for unit_id, (team, _, _) in previous_units.items():
+        if unit_id not in units:
+            team_deltas[team, 2] += 1
+    team_deltas[:, 3] = np.subtract(research, previous_research)
+
+    actor_deltas = {}
+    for unit_id, (team, xy, cargo) in units.items():
+        if unit_id not in previous_units:
+            actor_deltas[unit_id] = (0, 0, 0)
+            continue
+        before = list(previous_units[unit_id][2])
+        builder = built.get(xy) == team
+        if builder:
+            cost = CITY_BUILD_COST
+            for resource in range(3):
+                spent = min(cost, before[resource])
+                before[resource] -= spent
+                cost -= spent
+        gathered = sum(max(cargo[r] - before[r], 0) * FUEL_RATE[r] for r in range(3))
+        deposited = sum(max(before[r] - cargo[r], 0) * FUEL_RATE[r] for r in range(3)) \
+            if citytiles.get(xy) == team else 0
+        actor_deltas[unit_id] = (gathered, deposited, builder)
+    return team_deltas, actor_deltas
+
+
+@pytest.mark.parametrize("map_class,incremental", [(GameMap, False), (GameMap, True), (ArrayGameMap, False)])
+@pytest.mark.parametrize("size,seed", [(12, 4), (24, 1)])
+def test_deltas_match_reference(native_game, map_class, incremental, size, seed):
+    registry = ActorRegistry(capacity=4)
+    tracker = RewardTracker()
+    previous = None
+    for engine, game, updates in native_game(size, seed, turns=360, map_class=map_class, incremental=incremental):
+        registry.update(game)
+        tracker.update(registry, game)
+        current = _snapshot(game)
+        if previous is None:
+            assert not tracker.team_deltas.any() and not tracker.actor_deltas.any()
+        else:
+            team_deltas, actor_deltas = reference_deltas(previous, current)
+            assert np.allclose(tracker.team_deltas, team_deltas), game.turn
+            for unit_id, deltas in actor_deltas.items():
+                assert np.allclose(tracker.actor_deltas[registry.slot(unit_id)], deltas), (game.turn, unit_id)
+
+        actors = registry.units() + registry.citytiles()
+        rewards = tracker.rewards(actors)
+        assert len(rewards) == len(registry)
+        for actor in actors:
+            slot = registry.slot(actor.id)
+            team = registry.team[slot]
+            expected = tracker.actor_deltas[slot] @ ACTOR_WEIGHTS + tracker.team_deltas[team] @ TEAM_WEIGHTS
+            assert rewards[actor.id] == pytest.approx(expected)
+        previous = current
+
+
+def test_unknown_weights_are_rejected():
+    with pytest.raises(ValueError):
+        RewardTracker(weights={"gold": 1.0})
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_hand_built_turns(hand_game, incremental):
+    city = ["c 0 c_1 0 23", "ct 0 c_1 6 6 0"]
+    game = hand_game(12, 12, city + [
+        # enough cargo for a citytile, of every resource
+        "u 0 0 u_1 3 3 0 40 50 30",
+        # next to its city, with wood
+        "u 0 0 u_2 6 5 0 50 0 0",
+        "u 0 1 u_3 9 9 0 0 0 0",
+    ], incremental=incremental)
+    registry = ActorRegistry(capacity=2)
+    tracker = RewardTracker()
+    registry.update(game)
+    tracker.update(registry, game)
+    assert not tracker.actor_deltas.any() and not tracker.team_deltas.any()
+
+    game._update(city + [
+        "rp 0 5",
+        # u_1 built a citytile with 40 wood, 50 coal and 10 uranium
+        "c 0 c_2 0 23", "ct 0 c_2 3 3 0", "u 0 0 u_1 3 3 2 0 0 20",
+        # u_2 handed its wood in, u_3 died
+        "u 0 0 u_2 6 6 2 0 0 0",
+        "D_DONE",
+    ])
+    registry.update(game)
+    tracker.update(registry, game)
+    deltas = {actor_id: tracker.actor_deltas[registry.slot(actor_id)].tolist() for actor_id in ("u_1", "u_2")}
+    assert deltas == {"u_1": [0, 0, 1], "u_2": [0, 50, 0]}
+    assert tracker.team_deltas.tolist() == [[1, 0, 0, 5], [0, 0, 1, 0]]
+    rewards = tracker.rewards(registry.units() + registry.citytiles())
+    team_reward = DEFAULT_WEIGHTS["tiles_built"] + 5 * DEFAULT_WEIGHTS["research"]
+    assert rewards["u_1"] == pytest.approx(DEFAULT_WEIGHTS["built"] + team_reward)
+    assert rewards["u_2"] == pytest.approx(50 * DEFAULT_WEIGHTS["deposited"] + team_reward)
+    assert rewards["ct_3_3"] == pytest.approx(team_reward)
+
+    # a new game starts over, whatever the cargo of its units
+    game = hand_game(12, 12, ["u 0 0 u_1 3 3 0 100 0 0"], incremental=incremental)
+    registry = ActorRegistry()
+    registry.update(game)
+    tracker.update(registry, game)
+    assert not tracker.actor_deltas.any() and not tracker.team_deltas.any()
+    assert tracker.rewards(registry.units()) == {"u_1": 0.0}
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from lux.array_map import ArrayGameMap
+from lux.game import Game
+from lux.game_map import GameMap
+from multilux.lux_engine import LuxEngine
+from multilux.state_cache import InitialState, InitialStateCache
+
+
+class _Entry:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = InitialStateCache(maxsize=2)
+    cache.put("a", _Entry(1))
+    cache.put("b", _Entry(2))
+    assert cache.get("a").nbytes == 1  # a is now the most recent
+    cache.put("c", _Entry(4))
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.get("b") is None
+    # putting an existing key refreshes it too
+    cache.put("a", _Entry(8))
+    cache.put("d", _Entry(16))
+    assert sorted(cache._entries) == ["a", "d"]
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 2, "maxsize": 2, "nbytes": 24}
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 2, "nbytes": 0}
+
+
+def test_initial_state_is_read_only_and_sized():
+    messages = LuxEngine({"width": 12, "height": 12, "seed": 4}).reset()
+    messages = ["0", "12 12"] + messages
+    state = InitialState(messages)
+    assert state.messages == tuple(messages)
+    assert state.nbytes == sum(array.nbytes for array in state.updates) + sum(map(len, messages))
+    with pytest.raises(ValueError):
+        state.updates.resources["amount"][0] = 0
+    cache = InitialStateCache()
+    cache.put((4, 12, 12), state)
+    assert cache.nbytes == state.nbytes
+
+
+def test_cached_engine_reset_matches_fresh_reset():
+    configuration = {"width": 16, "height": 16, "seed": 2}
+    cached = LuxEngine(configuration, reset_cache_size=2)
+    first = cached.reset()
+    # change the map, a cached reset must not see it
+    for _ in range(40):
+        cached.step([[], []])
+    assert cached.reset() == first == LuxEngine(configuration).reset()
+    assert cached.initial_maps.stats()["hits"] == 1
+    # another seed misses, and gets its own map
+    assert cached.reset(seed=3) == LuxEngine(dict(configuration, seed=3)).reset()
+
+
+@pytest.mark.parametrize("map_class,incremental", [(GameMap, False), (GameMap, True), (ArrayGameMap, False)])
+def test_game_restored_from_initial_state_matches_parsed(game_state, map_class, incremental):
+    engine = LuxEngine({"width": 12, "height": 12, "seed": 4})
+    messages = ["0", "12 12"] + engine.reset()
+    state = InitialState(messages)
+    parsed, restored = Game(map_class=map_class), Game(map_class=map_class, incremental=incremental)
+    for game in (parsed, restored):
+        game._initialize(messages)
+    parsed._update(messages[2:])
+    restored._update(messages[2:], state.updates)
+    assert game_state(restored) == game_state(parsed)
+    # the shared arrays are not written by later turns
+    before = [np.copy(array) for array in state.updates]
+    updates = engine.step([[], []])
+    restored._update(updates)
+    assert all(np.array_equal(a, b) for a, b in zip(before, state.updates))
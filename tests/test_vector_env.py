@@ -0,0 +1,178 @@
+import numpy as np
+import pytest
+
+spaces = pytest.importorskip("gym").spaces
+pytest.importorskip("ray")
+
+from multilux.lux_interface import LuxDefaultInterface
+from multilux.lux_subproc_env import LuxSubprocVectorEnv
+from multilux.lux_vector_env import LuxVectorEnv
+
+CONFIGURATION = {"width": 12, "height": 12, "seed": 4, "episodeSteps": 8}
+
+
+class PositionInterface(LuxDefaultInterface):
+    """Observes the actor positions, moves the units by action index"""
+    obs_spaces = {'default': spaces.Box(low=0, high=32, shape=(2,), dtype=np.float32)}
+    act_spaces = {'default': spaces.Discrete(5)}
+
+    def observation(self, joint_obs, actors=None):
+        if actors is None:
+            actors = self.game.get_team_actors(teams=(self.game.player_id,), flat=True)
+        return {a.id: np.array([a.pos.x, a.pos.y], dtype=np.float32) for a in actors}
+
+    def reward(self, joint_reward, actors):
+        return {a.id: float(self.game_state.turn) for a in actors}
+
+    def done(self, joint_done, actors):
+        d = {a.id: bool(joint_done) for a in actors}
+        d['__all__'] = bool(joint_done)
+        return d
+
+    def actions(self, action_dict):
+        units = {unit.id: unit for unit in self.game_state.players[self.game.player_id].units}
+        return [units[actor_id].move("nesw"[action]) for actor_id, action in action_dict.items()
+                if actor_id in units and action < 4]
+
+
+class MixedDtypeInterface(PositionInterface):
+    """Unit positions as int64, citytile positions as float32"""
+    obs_spaces = {'unit': spaces.Box(low=0, high=32, shape=(2,), dtype=np.int64),
+                  'citytile': spaces.Box(low=0, high=32, shape=(2,), dtype=np.float32)}
+
+    def observation(self, joint_obs, actors=None):
+        obs = super().observation(joint_obs, actors)
+        return {actor_id: o.astype(np.int64) if actor_id.startswith('u_') else o for actor_id, o in obs.items()}
+
+
+class FailingInterface(PositionInterface):
+    def reward(self, joint_reward, actors):
+        if self.game_state.turn == 3:
+            raise KeyError("no reward on turn 3")
+        return super().reward(joint_reward, actors)
+
+
+def _make(num_envs=2, auto_reset=True, vector_env=LuxVectorEnv, interface=PositionInterface, **kwargs):
+    return vector_env(CONFIGURATION, False, interface=interface, agents=(None, "idle"),
+                      num_envs=num_envs, auto_reset=auto_reset, engine='native', **kwargs)
+
+
+@pytest.fixture
+def subproc_env():
+    envs = []
+
+    def make(max_actors=16, **kwargs):
+        envs.append(_make(vector_env=LuxSubprocVectorEnv, max_actors=max_actors, **kwargs))
+        return envs[-1]
+    yield make
+    for env in envs:
+        env.stop()
+
+
+def _play_episode(env, obs):
+    """send_actions/poll until the games of the polled obs are done, returns the last poll"""
+    env_ids = sorted(obs)
+    while True:
+        env.send_actions({env_id: {actor_id: 4 for actor_id in obs[env_id]} for env_id in env_ids})
+        obs, rewards, dones, infos, _ = env.poll()
+        assert sorted(obs) == env_ids
+        if all(dones[env_id]['__all__'] for env_id in env_ids):
+            return obs, rewards, dones, infos
+
+
+def test_auto_reset_keeps_the_reset_obs_for_try_reset():
+    env = _make()
+    obs, rewards, dones, _, _ = env.poll()
+    assert sorted(obs) == [0, 1]
+    assert all(reward is None for reward in rewards[0].values())
+    first = obs[0]
+    # polling again before acting returns nothing new
+    assert env.poll()[0] == {}
+
+    obs, rewards, dones, _ = _play_episode(env, obs)
+    # the last step of the episode is polled, with its rewards
+    assert all(reward == CONFIGURATION["episodeSteps"] - 1 for reward in rewards[0].values())
+    for game in env.games:
+        assert game.reset_obs is not None and game.pending is None
+    reset_obs = env.games[0].reset_obs
+    assert env.try_reset(0) is reset_obs
+    assert sorted(reset_obs) == sorted(first)
+    assert all(np.array_equal(reset_obs[a], first[a]) for a in first)
+    assert env.games[0].reset_obs is None
+    # the reset obs is handed over by try_reset, not polled again
+    assert env.poll()[0] == {}
+    env.try_reset(1)
+    env.send_actions({0: {actor_id: 0 for actor_id in reset_obs}})
+    obs, rewards, dones, _, _ = env.poll()
+    assert list(obs) == [0] and not dones[0]['__all__']
+
+
+def test_try_reset_without_auto_reset_resets_the_game():
+    env = _make(num_envs=1, auto_reset=False)
+    obs = env.poll()[0]
+    first = obs[0]
+    _play_episode(env, obs)
+    assert env.games[0].reset_obs is None
+    obs = env.try_reset(0)
+    assert all(np.array_equal(obs[a], first[a]) for a in first)
+    assert env.envs[0].interface.game_state.turn == 0
+
+
+def test_vector_step_returns_the_next_episode_at_a_boundary():
+    env = _make()
+    first = env.vector_reset()
+    obs = first
+    for turn in range(1, CONFIGURATION["episodeSteps"]):
+        actions = [{actor_id: turn % 4 for actor_id in o} for o in obs]
+        obs, rewards, dones, _ = env.vector_step(actions)
+        assert all(d['__all__'] == (turn == CONFIGURATION["episodeSteps"] - 1) for d in dones)
+        assert all(reward == turn for r in rewards for reward in r.values())
+    # the obs of the last step is the first obs of the next episode
+    for o, f in zip(obs, first):
+        assert sorted(o) == sorted(f) and all(np.array_equal(o[a], f[a]) for a in f)
+    assert all(game.reset_obs is None and game.pending is None for game in env.games)
+    assert env.poll()[0] == {}
+
+
+def _assert_same(results, expected):
+    assert sorted(results) == sorted(expected)
+    for actor_id, value in expected.items():
+        if isinstance(value, np.ndarray):
+            assert results[actor_id].dtype == value.dtype
+            assert np.array_equal(results[actor_id], value)
+        else:
+            assert results[actor_id] == value
+
+
+@pytest.mark.parametrize("interface", [PositionInterface, MixedDtypeInterface])
+def test_subproc_env_matches_in_process_env(subproc_env, interface):
+    env, expected_env = subproc_env(interface=interface), _make(interface=interface)
+    obs, expected_obs = env.vector_reset(), expected_env.vector_reset()
+    for turn in range(2 * CONFIGURATION["episodeSteps"]):
+        for o, expected in zip(obs, expected_obs):
+            _assert_same(o, expected)
+        actions = [{actor_id: (turn + i) % 5 for i, actor_id in enumerate(o)} for o in obs]
+        obs, rewards, dones, _ = env.vector_step(actions)
+        expected_obs, expected_rewards, expected_dones, _ = expected_env.vector_step(actions)
+        for results, expected in zip(rewards + dones, expected_rewards + expected_dones):
+            _assert_same(results, expected)
+    if interface is MixedDtypeInterface:
+        assert {o.dtype for o in obs[0].values()} == {np.dtype(np.int64), np.dtype(np.float32)}
+
+
+def test_subproc_env_raises_child_errors(subproc_env):
+    env = subproc_env(interface=FailingInterface)
+    obs = env.vector_reset()
+    with pytest.raises(RuntimeError, match="no reward on turn 3"):
+        for _ in range(CONFIGURATION["episodeSteps"]):
+            obs = env.vector_step([{actor_id: 4 for actor_id in o} for o in obs])[0]
+    # no reply is left unread: the games can be reset
+    assert len(env.vector_reset()) == 2
+
+
+def test_subproc_env_checks_its_arguments(subproc_env):
+    env = subproc_env(max_actors=1)
+    with pytest.raises(RuntimeError, match="max_actors=1"):
+        env.vector_reset()
+    with pytest.raises(ValueError):
+        subproc_env(opponent_pool=object())